@@ -0,0 +1,10 @@
+import os
+import sys
+
+# The app's modules import each other by plain name, as they do under
+# `streamlit run app.py`, so make this directory importable first
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cli import main
+
+sys.exit(main())
@@ -1,10 +1,47 @@
+import sys
+
+if __name__ == "__main__" and '--profile-startup' in sys.argv:
+    # `python app.py --profile-startup` prints the import-time breakdown
+    from startup import print_startup_profile
+    sys.exit(print_startup_profile())
+
 import streamlit as st
-import pandas as pd
 import os
 from datetime import datetime, timedelta
-from sales_manager import SalesManager
-from utils import format_currency, get_week_dates
-from auth import authenticate_user, is_admin, create_user, get_users, initialize_users_file
+from sale_outbox import get_sale_outbox, replay_pending_outboxes
+from inventory import INVENTORY_PRODUCTS, PRODUCT_UNITS
+from utils import format_currency, get_week_dates, PRODUCT_PRICES, tortilla_price
+from auth import login, change_password, verify_session_token, create_user, get_users, initialize_users_file
+
+# pandas and the sales modules are imported on first use, so the login
+# screen does not pay for them
+
+def create_sales_manager(username, session_token=None):
+    """Create a SalesManager, loading the sales modules on first use.
+    
+    With TORTILLA_STORE_SOCKET set, the sales live in a store server shared
+    by every app process (see store_server.py) and a client to it is used,
+    authenticated with the session token (a service token without one).
+    """
+    if os.environ.get("TORTILLA_STORE_SOCKET"):
+        from store_server import StoreClient
+        return StoreClient(username, os.environ["TORTILLA_STORE_SOCKET"], session_token)
+    from sales_manager import SalesManager
+    return SalesManager(username)
+
+def session_sales_manager(username):
+    """create_sales_manager acting as the signed-in user"""
+    return create_sales_manager(username, st.session_state.session_token)
+
+@st.cache_resource
+def initialize_storage():
+    """File setup that runs once per server process, not on every rerun"""
+    # Initialize users file
+    initialize_users_file()
+    
+    # Write any sales left queued by a previous run into the sales files
+    replay_pending_outboxes(create_sales_manager)
+    return True
 
 # Initialize session state
 if 'authenticated' not in st.session_state:
@@ -13,13 +50,25 @@ if 'username' not in st.session_state:
     st.session_state.username = ""
 if 'current_screen' not in st.session_state:
     st.session_state.current_screen = "login"
+if 'sales_manager' not in st.session_state:
+    st.session_state.sales_manager = None
+if 'session_token' not in st.session_state:
+    st.session_state.session_token = None
 
-# Initialize users file
-initialize_users_file()
+initialize_storage()
 
 # Initialize sales manager (will be updated with username after login)
 sales_manager = None
 
+def current_session():
+    """Identity and role from the signed session token, or None if missing or expired"""
+    return verify_session_token(st.session_state.session_token)
+
+def session_is_admin():
+    """Admin check from the session token; never hashes a password, and reads users.xlsx only after it changes"""
+    session = current_session()
+    return bool(session and session['is_admin'])
+
 def login_screen():
     st.title("🔐 Secure Login")
     st.markdown("Welcome to the Tortilla Business Sales Management System")
@@ -34,13 +83,15 @@ def login_screen():
         
         if submitted:
             if username and password:
-                if authenticate_user(username, password):
+                # The only password hash of the session; reruns check the token
+                token = login(username, password)
+                if token:
+                    st.session_state.session_token = token
                     st.session_state.authenticated = True
                     st.session_state.username = username
                     st.session_state.current_screen = "main_menu"
-                    # Initialize sales manager with username
-                    global sales_manager
-                    sales_manager = SalesManager(username)
+                    # Sales manager is created for this user on the next run
+                    st.session_state.sales_manager = None
                     st.success("Login successful!")
                     st.rerun()
                 else:
@@ -68,7 +119,7 @@ def user_management_screen():
     st.title("👥 User Management")
     st.markdown("Manage user accounts and permissions (Admin Only)")
     
-    if not is_admin(st.session_state.username):
+    if not session_is_admin():
         st.error("❌ Access denied. Admin privileges required.")
         if st.button("🔙 Return to Main Menu"):
             st.session_state.current_screen = "main_menu"
@@ -148,16 +199,20 @@ def user_management_screen():
         
         if change_submitted:
             if current_password and new_user_password and confirm_new_password:
-                if authenticate_user(st.session_state.username, current_password):
-                    if new_user_password == confirm_new_password:
-                        if create_user(st.session_state.username, new_user_password, is_admin(st.session_state.username)):
-                            st.success("✅ Password changed successfully!")
-                        else:
-                            st.error("❌ Failed to change password")
-                    else:
-                        st.error("❌ New passwords do not match")
+                if new_user_password != confirm_new_password:
+                    st.error("❌ New passwords do not match")
                 else:
-                    st.error("❌ Current password is incorrect")
+                    token = change_password(st.session_state.username, current_password, new_user_password)
+                    if token:
+                        # The old token stops working with the old password
+                        st.session_state.session_token = token
+                        # A store client still carries the old token
+                        st.session_state.sales_manager = None
+                        st.success("✅ Password changed successfully!")
+                    elif token is None:
+                        st.error("❌ Current password is incorrect")
+                    else:
+                        st.error("❌ Failed to change password")
             else:
                 st.warning("⚠️ Please fill in all fields")
     
@@ -167,7 +222,7 @@ def user_management_screen():
 
 def main_menu():
     st.title("🌮 Sales Management System")
-    st.markdown(f"Welcome back, **{st.session_state.username}**! {'(Administrator)' if is_admin(st.session_state.username) else '(User)'}")
+    st.markdown(f"Welcome back, **{st.session_state.username}**! {'(Administrator)' if session_is_admin() else '(User)'}")
     
     col1, col2 = st.columns(2)
     
@@ -202,8 +257,52 @@ def main_menu():
             st.session_state.current_screen = "download_reports"
             st.rerun()
     
+    with col1:
+        if st.button("💵 Shift Close", use_container_width=True):
+            st.session_state.current_screen = "shift_close"
+            st.rerun()
+    
+    with col2:
+        if st.button("👤 Customers", use_container_width=True):
+            st.session_state.current_screen = "customers"
+            st.rerun()
+    
+    st.markdown("---")
+    st.markdown("**🏭 Production Planning**")
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        if st.button("🕒 Demand by Hour", use_container_width=True):
+            st.session_state.current_screen = "demand_profile"
+            st.rerun()
+    
+    with col2:
+        if st.button("🔮 Demand Forecast", use_container_width=True):
+            st.session_state.current_screen = "demand_forecast"
+            st.rerun()
+    
+    with col1:
+        if st.button("📡 Live Today", use_container_width=True):
+            st.session_state.current_screen = "live_dashboard"
+            st.rerun()
+    
+    with col2:
+        if st.button("📉 Sales Trends", use_container_width=True):
+            st.session_state.current_screen = "trends"
+            st.rerun()
+    
+    with col1:
+        if st.button("📦 Inventory", use_container_width=True):
+            st.session_state.current_screen = "inventory"
+            st.rerun()
+    
+    with col2:
+        if st.button("🏆 Rankings", use_container_width=True):
+            st.session_state.current_screen = "rankings"
+            st.rerun()
+    
     # Admin-only features
-    if is_admin(st.session_state.username):
+    if session_is_admin():
         st.markdown("---")
         st.markdown("**🔧 Administrator Tools**")
         col1, col2 = st.columns(2)
@@ -212,6 +311,31 @@ def main_menu():
             if st.button("👥 User Management", use_container_width=True):
                 st.session_state.current_screen = "user_management"
                 st.rerun()
+        
+        with col2:
+            if st.button("🗄️ Archive Old Sales", use_container_width=True):
+                st.session_state.current_screen = "archive"
+                st.rerun()
+        
+        with col1:
+            if st.button("🔍 Sales Audit", use_container_width=True):
+                st.session_state.current_screen = "audit"
+                st.rerun()
+        
+        with col2:
+            if st.button("🔄 Sync Registers", use_container_width=True):
+                st.session_state.current_screen = "sync"
+                st.rerun()
+        
+        with col1:
+            if st.button("💾 Backups", use_container_width=True):
+                st.session_state.current_screen = "backups"
+                st.rerun()
+        
+        with col2:
+            if st.button("💲 Price What-If", use_container_width=True):
+                st.session_state.current_screen = "price_what_if"
+                st.rerun()
     
     # Logout section
     st.markdown("---")
@@ -221,45 +345,94 @@ def main_menu():
         if st.button("🚪 Logout", use_container_width=True):
             st.session_state.authenticated = False
             st.session_state.username = ""
+            st.session_state.session_token = None
             st.session_state.current_screen = "login"
             # Reset sales manager
             global sales_manager
             sales_manager = None
+            st.session_state.sales_manager = None
             st.success("Logged out successfully!")
             st.rerun()
     
     with col2:
         st.info(f"Logged in as: {st.session_state.username}")
 
+EMPTY_SALE_PRODUCTS = {
+    'Tortilla': 0,
+    'Totopos': 0,
+    'Cacahuates': 0,
+    'Mix': 0,
+    'Salted Chips': 0,
+    'Special': 0
+}
+
+# Product prices, from the shop's price list
+BASE_PRICES = dict(PRODUCT_PRICES, Special=0.0)
+
+def reset_sale():
+    """Clear the cart after a sale is registered"""
+    st.session_state.sale_products = dict(EMPTY_SALE_PRODUCTS)
+    st.session_state.special_price = 0.0
+    st.session_state.frequent_customer = False
+    st.session_state.supplier = False
+    st.session_state.customer_search = ""
+    st.session_state.customer_id = ""
+    st.session_state.customer_lookup = {}
+
+def cached_customer_lookup(kind, key, lookup):
+    """Look a customer search or profile up only when its key changes.
+    
+    The cart fragment reruns on every ➕/➖ tap; results are kept in
+    session_state until the search text or selected customer changes.
+    """
+    cache = st.session_state.customer_lookup
+    if kind not in cache or cache[kind][0] != key:
+        cache[kind] = (key, lookup(key))
+    return cache[kind][1]
+
+def change_quantity(product, direction):
+    """Button callback: tortilla moves in 0.5 kg steps, other products by one"""
+    step = 0.5 if product == 'Tortilla' else 1
+    quantity = st.session_state.sale_products[product] + direction * step
+    st.session_state.sale_products[product] = max(0, quantity)
+
 def register_sale_screen():
     st.title("📝 Register Sale")
     
     # Initialize session state for sale
     if 'sale_products' not in st.session_state:
-        st.session_state.sale_products = {
-            'Tortilla': 0,
-            'Totopos': 0,
-            'Cacahuates': 0,
-            'Mix': 0,
-            'Salted Chips': 0,
-            'Special': 0
-        }
+        st.session_state.sale_products = dict(EMPTY_SALE_PRODUCTS)
     if 'special_price' not in st.session_state:
         st.session_state.special_price = 0.0
     if 'frequent_customer' not in st.session_state:
         st.session_state.frequent_customer = False
     if 'supplier' not in st.session_state:
         st.session_state.supplier = False
+    if 'customer_id' not in st.session_state:
+        st.session_state.customer_search = ""
+        st.session_state.customer_id = ""
+    if 'customer_lookup' not in st.session_state:
+        st.session_state.customer_lookup = {}
+    
+    low_stock = sales_manager.get_low_stock()
+    if low_stock:
+        st.warning("⚠️ Low stock: " + ", ".join(
+            f"{product} ({item['level']:g} {PRODUCT_UNITS[product]} left)" for product, item in low_stock.items()))
     
-    # Product prices
-    base_prices = {
-        'Tortilla': 25.0,
-        'Totopos': 25.0,
-        'Cacahuates': 10.0,
-        'Mix': 10.0,
-        'Salted Chips': 15.0,
-        'Special': 0.0
-    }
+    sale_cart()
+    
+    if st.button("🔙 Return to Main Menu"):
+        st.session_state.current_screen = "main_menu"
+        st.rerun()
+    
+    pending_sales = get_sale_outbox(st.session_state.username, create_sales_manager).pending_count()
+    if pending_sales:
+        st.caption(f"💾 {pending_sales} sale(s) being saved to the sales file...")
+
+@st.fragment
+def sale_cart():
+    # Runs as a fragment: tapping ➕/➖ reruns only this cart, not the whole
+    # app, and nothing here touches storage until the sale is registered
     
     # Product selection and quantity
     st.subheader("Product Selection")
@@ -270,28 +443,18 @@ def register_sale_screen():
         with col1:
             st.write(f"**{product}**")
             if product == 'Tortilla':
-                price = 22.0 if st.session_state.supplier else 25.0
+                price = tortilla_price(st.session_state.supplier)
                 st.write(f"Price: ${price}/kg")
             elif product == 'Special':
                 st.write("Manual price input")
             else:
-                st.write(f"Price: ${base_prices[product]}")
+                st.write(f"Price: ${BASE_PRICES[product]}")
         
         with col2:
-            if st.button(f"➖", key=f"minus_{product}"):
-                if product == 'Tortilla':
-                    st.session_state.sale_products[product] = max(0, st.session_state.sale_products[product] - 0.5)
-                else:
-                    st.session_state.sale_products[product] = max(0, st.session_state.sale_products[product] - 1)
-                st.rerun()
+            st.button(f"➖", key=f"minus_{product}", on_click=change_quantity, args=(product, -1))
         
         with col3:
-            if st.button(f"➕", key=f"plus_{product}"):
-                if product == 'Tortilla':
-                    st.session_state.sale_products[product] += 0.5
-                else:
-                    st.session_state.sale_products[product] += 1
-                st.rerun()
+            st.button(f"➕", key=f"plus_{product}", on_click=change_quantity, args=(product, 1))
         
         with col4:
             if product == 'Tortilla':
@@ -307,17 +470,32 @@ def register_sale_screen():
     st.session_state.frequent_customer = st.checkbox("Frequent Customer", value=st.session_state.frequent_customer)
     st.session_state.supplier = st.checkbox("Supplier", value=st.session_state.supplier)
     
+    # Optional registered customer: one prefix lookup per change of the search text
+    st.session_state.customer_search = st.text_input("Customer (ID, name or phone)", value=st.session_state.customer_search)
+    matches = cached_customer_lookup('matches', st.session_state.customer_search, sales_manager.find_customers)
+    options = [""] + [customer['id'] for customer in matches]
+    if st.session_state.customer_id and st.session_state.customer_id not in options:
+        options.append(st.session_state.customer_id)
+    names = {customer['id']: customer['name'] for customer in matches}
+    st.session_state.customer_id = st.selectbox(
+        "Select customer", options, index=options.index(st.session_state.customer_id),
+        format_func=lambda customer_id: f"{customer_id} - {names.get(customer_id, '')}" if customer_id else "No customer")
+    if st.session_state.customer_id:
+        customer = cached_customer_lookup('profile', st.session_state.customer_id, sales_manager.get_customer)
+        if customer:
+            st.caption(f"{customer['visits']} visits, {customer['kg']:g} kg bought, last visit {customer['last_visit'] or 'never'}")
+    
     # Calculate total
     total = 0
     for product, quantity in st.session_state.sale_products.items():
         if quantity > 0:
             if product == 'Tortilla':
-                price = 22.0 if st.session_state.supplier else 25.0
+                price = tortilla_price(st.session_state.supplier)
                 total += quantity * price
             elif product == 'Special':
                 total += quantity * st.session_state.special_price
             else:
-                total += quantity * base_prices[product]
+                total += quantity * BASE_PRICES[product]
     
     st.subheader("Sale Summary")
     st.write(f"**Total: {format_currency(total)}**")
@@ -333,53 +511,41 @@ def register_sale_screen():
             st.error(f"Insufficient payment. Missing: {format_currency(abs(change))}")
     
     # Register sale button
-    col1, col2 = st.columns(2)
-    with col1:
-        if st.button("✅ Register Sale", type="primary"):
-            if total > 0 and customer_payment >= total:
-                # Create sale record
-                sale_data = {
-                    'date': datetime.now().strftime('%Y-%m-%d'),
-                    'time': datetime.now().strftime('%H:%M:%S'),
-                    'username': st.session_state.username,
-                    'tortilla_qty': st.session_state.sale_products['Tortilla'],
-                    'totopos_qty': st.session_state.sale_products['Totopos'],
-                    'cacahuates_qty': st.session_state.sale_products['Cacahuates'],
-                    'mix_qty': st.session_state.sale_products['Mix'],
-                    'salted_chips_qty': st.session_state.sale_products['Salted Chips'],
-                    'special_qty': st.session_state.sale_products['Special'],
-                    'special_price': st.session_state.special_price,
-                    'frequent_customer': st.session_state.frequent_customer,
-                    'supplier': st.session_state.supplier,
-                    'total': total,
-                    'payment': customer_payment,
-                    'change': customer_payment - total
-                }
-                
-                if sales_manager.add_sale(sale_data):
-                    st.success("Sale registered successfully!")
-                    # Reset form
-                    st.session_state.sale_products = {
-                        'Tortilla': 0,
-                        'Totopos': 0,
-                        'Cacahuates': 0,
-                        'Mix': 0,
-                        'Salted Chips': 0,
-                        'Special': 0
-                    }
-                    st.session_state.special_price = 0.0
-                    st.session_state.frequent_customer = False
-                    st.session_state.supplier = False
-                    st.rerun()
-                else:
-                    st.error("Failed to register sale")
+    if st.button("✅ Register Sale", type="primary"):
+        if total > 0 and customer_payment >= total:
+            # Create sale record
+            sale_data = {
+                'date': datetime.now().strftime('%Y-%m-%d'),
+                'time': datetime.now().strftime('%H:%M:%S'),
+                'username': st.session_state.username,
+                'tortilla_qty': st.session_state.sale_products['Tortilla'],
+                'totopos_qty': st.session_state.sale_products['Totopos'],
+                'cacahuates_qty': st.session_state.sale_products['Cacahuates'],
+                'mix_qty': st.session_state.sale_products['Mix'],
+                'salted_chips_qty': st.session_state.sale_products['Salted Chips'],
+                'special_qty': st.session_state.sale_products['Special'],
+                'special_price': st.session_state.special_price,
+                'frequent_customer': st.session_state.frequent_customer,
+                'supplier': st.session_state.supplier,
+                'total': total,
+                'payment': customer_payment,
+                'change': customer_payment - total,
+                'customer_id': st.session_state.customer_id
+            }
+            
+            # Queue the sale durably; the workbook is updated in the background
+            sale_outbox = get_sale_outbox(st.session_state.username, create_sales_manager)
+            if sale_outbox.append(sale_data):
+                st.session_state.last_sale_message = "Sale registered successfully!"
+                reset_sale()
+                st.rerun(scope="fragment")
             else:
-                st.error("Please ensure all products have valid quantities and payment is sufficient")
+                st.error("Failed to register sale")
+        else:
+            st.error("Please ensure all products have valid quantities and payment is sufficient")
     
-    with col2:
-        if st.button("🔙 Return to Main Menu"):
-            st.session_state.current_screen = "main_menu"
-            st.rerun()
+    if st.session_state.get('last_sale_message'):
+        st.success(st.session_state.pop('last_sale_message'))
 
 def daily_summary_screen():
     st.title("📊 Daily Summary")
@@ -422,24 +588,8 @@ def daily_summary_screen():
         st.markdown("### Financial Summary")
         
         # Calculate subtotals
-        tortilla_subtotal = 0
-        supplier_tortilla_subtotal = 0
-        other_subtotal = 0
-        
-        for _, sale in daily_sales.iterrows():
-            if sale['tortilla_qty'] > 0:
-                if sale['supplier']:
-                    supplier_tortilla_subtotal += sale['tortilla_qty'] * 22.0
-                else:
-                    tortilla_subtotal += sale['tortilla_qty'] * 25.0
-            
-            other_subtotal += (
-                sale['totopos_qty'] * 25.0 +
-                sale['cacahuates_qty'] * 10.0 +
-                sale['mix_qty'] * 10.0 +
-                sale['salted_chips_qty'] * 15.0 +
-                sale['special_qty'] * sale['special_price']
-            )
+        from reports import calculate_subtotals
+        tortilla_subtotal, supplier_tortilla_subtotal, other_subtotal = calculate_subtotals(daily_sales)
         
         col1, col2 = st.columns(2)
         
@@ -470,25 +620,24 @@ def weekly_summary_screen():
     
     st.subheader(f"Week of {week_dates[0].strftime('%B %d')} - {week_dates[6].strftime('%B %d, %Y')}")
     
-    # Get weekly sales
+    # One read of the daily rollups instead of a sales file read per day
+    from reports import period_breakdown
+    daily_totals = sales_manager.get_daily_totals(week_dates[0], week_dates[-1])
     weekly_data = []
     total_weekly_earnings = 0
     
-    for date in week_dates:
-        date_str = date.strftime('%Y-%m-%d')
-        daily_sales = sales_manager.get_daily_sales(date_str)
-        daily_total = daily_sales['total'].sum() if not daily_sales.empty else 0
-        
+    for day in period_breakdown(week_dates, daily_totals):
         weekly_data.append({
-            'Day': date.strftime('%A'),
-            'Date': date.strftime('%B %d'),
-            'Sales': len(daily_sales),
-            'Total': daily_total
+            'Day': day['day'],
+            'Date': datetime.strptime(day['date'], '%Y-%m-%d').strftime('%B %d'),
+            'Sales': day['sales_count'],
+            'Total': day['total']
         })
         
-        total_weekly_earnings += daily_total
+        total_weekly_earnings += day['total']
     
     # Display weekly breakdown
+    import pandas as pd
     df_weekly = pd.DataFrame(weekly_data)
     
     for _, row in df_weekly.iterrows():
@@ -503,6 +652,58 @@ def weekly_summary_screen():
     st.markdown("---")
     st.metric("Total Weekly Earnings", format_currency(total_weekly_earnings))
     
+    if st.button("⚖️ Compare with Other Periods"):
+        st.session_state.current_screen = "compare_periods"
+        st.rerun()
+    
+    if st.button("🔙 Return to Main Menu"):
+        st.session_state.current_screen = "main_menu"
+        st.rerun()
+
+COMPARISON_PRESETS = {
+    'week_vs_last_week': "This week vs last week",
+    'week_vs_last_year': "This week vs same week last year",
+    'month_vs_last_month': "This month vs last month",
+    'custom': "Custom periods"
+}
+
+def compare_periods_screen():
+    st.title("⚖️ Compare Periods")
+    
+    from reports import comparison_periods
+    preset = st.selectbox("Comparison:", list(COMPARISON_PRESETS), format_func=COMPARISON_PRESETS.get)
+    if preset == 'custom':
+        col1, col2 = st.columns(2)
+        today = datetime.now().date()
+        with col1:
+            st.markdown("**Period**")
+            current = (st.date_input("From", value=today - timedelta(days=6), key="current_start"),
+                       st.date_input("To", value=today, key="current_end"))
+        with col2:
+            st.markdown("**Compared with**")
+            previous = (st.date_input("From", value=today - timedelta(days=13), key="previous_start"),
+                        st.date_input("To", value=today - timedelta(days=7), key="previous_end"))
+    else:
+        selected_date = st.date_input("Select a date in the period", value=datetime.now().date())
+        current, previous = comparison_periods(preset, selected_date)
+    
+    if current[0] > current[1] or previous[0] > previous[1]:
+        st.error("Each period's start date must be before its end date")
+    else:
+        rows = sales_manager.compare_periods(current, previous)
+        st.subheader(f"{current[0]:%b %d, %Y} - {current[1]:%b %d, %Y} vs {previous[0]:%b %d, %Y} - {previous[1]:%b %d, %Y}")
+        cols = st.columns(4)
+        for i, row in enumerate(rows):
+            with cols[i % 4]:
+                value = format_currency(row['current']) if row['metric'] == 'total' else f"{row['current']:g}"
+                delta = f"{row['pct_change']:+.1f}%" if row['pct_change'] is not None else (f"{row['change']:+g}" if row['change'] else None)
+                st.metric(row['label'], value, delta)
+        
+        import pandas as pd
+        df = pd.DataFrame(rows)[['label', 'current', 'previous', 'change', 'pct_change']]
+        df.columns = ['Metric', 'Period', 'Compared With', 'Change', 'Change (%)']
+        st.dataframe(df, use_container_width=True, hide_index=True)
+    
     if st.button("🔙 Return to Main Menu"):
         st.session_state.current_screen = "main_menu"
         st.rerun()
@@ -510,8 +711,10 @@ def weekly_summary_screen():
 def view_records_screen():
     st.title("📋 View Records")
     
-    # Get all sales
-    all_sales = sales_manager.get_all_sales()
+    # Get all sales (archived sales are read-only and not listed here)
+    all_sales = sales_manager.get_all_sales(recent_only=True)
+    if sales_manager.archive.segments:
+        st.caption(f"Sales up to {sales_manager.archive.max_date} are archived and included in reports and exports.")
     
     if all_sales.empty:
         st.info("No sales records found")
@@ -576,6 +779,751 @@ def view_records_screen():
         st.session_state.current_screen = "main_menu"
         st.rerun()
 
+def demand_profile_screen():
+    from demand_profile import WEEKDAYS
+    st.title("🕒 Demand by Hour")
+    st.markdown("Tortilla kilos and sales per weekday and time of day, to plan how much masa to run.")
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        start_date = st.date_input("From", value=datetime.now().date() - timedelta(days=56))
+    with col2:
+        end_date = st.date_input("To", value=datetime.now().date())
+    with col3:
+        resolution = st.radio("Resolution", ["Hour", "15 minutes"], horizontal=True)
+    
+    metric = st.radio("Show", ["Tortilla kg per day", "Sales per day", "Total tortilla kg"], horizontal=True)
+    
+    profile = sales_manager.get_demand_profile(start_date, end_date, hourly=(resolution == "Hour"))
+    
+    if profile.empty:
+        st.info("No sales recorded for this period")
+    else:
+        # Average over the number of days each weekday actually had sales
+        profile['kg_per_day'] = (profile['kg'] / profile['days']).round(2)
+        profile['sales_per_day'] = (profile['sales'] / profile['days']).round(2)
+        value_column = {
+            "Tortilla kg per day": 'kg_per_day',
+            "Sales per day": 'sales_per_day',
+            "Total tortilla kg": 'kg'
+        }[metric]
+        
+        import altair as alt
+        heatmap = alt.Chart(profile).mark_rect().encode(
+            x=alt.X('bucket:O', title='Time of day'),
+            y=alt.Y('weekday:O', title='Weekday', sort=WEEKDAYS),
+            color=alt.Color(f'{value_column}:Q', title=metric, scale=alt.Scale(scheme='oranges')),
+            tooltip=['weekday', 'bucket', 'kg', 'sales', 'kg_per_day', 'sales_per_day']
+        )
+        st.altair_chart(heatmap, use_container_width=True)
+        
+        # Table view for printing the production plan
+        table = profile.pivot(index='weekday', columns='bucket', values=value_column).reindex(WEEKDAYS).dropna(how='all').fillna(0)
+        st.dataframe(table)
+    
+    if st.button("🔙 Return to Main Menu"):
+        st.session_state.current_screen = "main_menu"
+        st.rerun()
+
+def demand_forecast_screen():
+    st.title("🔮 Demand Forecast")
+    st.markdown("Expected sales per weekday, learned from the daily totals of closed days.")
+    
+    method_label = st.radio("Method", ["Exponential smoothing", "Average of last 4 same weekdays"], horizontal=True)
+    method = 'smoothing' if method_label == "Exponential smoothing" else 'rolling'
+    
+    tomorrow = datetime.now().date() + timedelta(days=1)
+    forecast_df = sales_manager.get_demand_forecast(tomorrow, days=7, method=method)
+    
+    if forecast_df.empty or forecast_df['sales'].sum() == 0:
+        st.info("Not enough closed days yet to make a forecast")
+    else:
+        tomorrow_row = forecast_df.iloc[0]
+        st.subheader(f"Tomorrow ({tomorrow_row['day']}, {tomorrow.strftime('%B %d')})")
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Tortillas", f"{tomorrow_row['tortilla_qty']:.1f} kg")
+            st.metric("Expected Sales", f"{tomorrow_row['sales']:.0f}")
+        with col2:
+            st.metric("Totopos", f"{tomorrow_row['totopos_qty']:.0f} units")
+            st.metric("Cacahuates", f"{tomorrow_row['cacahuates_qty']:.0f} units")
+        with col3:
+            st.metric("Mix", f"{tomorrow_row['mix_qty']:.0f} units")
+            st.metric("Salted Chips", f"{tomorrow_row['salted_chips_qty']:.0f} units")
+        
+        st.subheader("Next 7 Days")
+        st.bar_chart(forecast_df.set_index('date')['tortilla_qty'])
+        st.dataframe(forecast_df.rename(columns={
+            'date': 'Date', 'day': 'Day', 'sales': 'Sales', 'tortilla_qty': 'Tortillas (kg)',
+            'totopos_qty': 'Totopos', 'cacahuates_qty': 'Cacahuates', 'mix_qty': 'Mix',
+            'salted_chips_qty': 'Salted Chips', 'special_qty': 'Special'
+        }), hide_index=True)
+        st.metric("Tortillas Next 7 Days", f"{forecast_df['tortilla_qty'].sum():.1f} kg")
+    
+    if st.button("🔙 Return to Main Menu"):
+        st.session_state.current_screen = "main_menu"
+        st.rerun()
+
+def live_dashboard_screen():
+    st.title("📡 Live Today")
+    st.markdown("Today's running totals, refreshed every few seconds.")
+    
+    usernames = (st.session_state.username,)
+    if session_is_admin():
+        if st.checkbox("All cashiers", value=True):
+            from sales_manager import list_sales_users
+            usernames = tuple(list_sales_users())
+    
+    live_totals_panel(usernames)
+    
+    if st.button("🔙 Return to Main Menu"):
+        st.session_state.current_screen = "main_menu"
+        st.rerun()
+
+@st.fragment(run_every=5)
+def live_totals_panel(usernames):
+    # Each refresh applies only the changes since the last one to the
+    # running totals kept in session state; the sales files are never read
+    from sales_manager import get_live_totals
+    from change_feed import ChangeFeed
+    
+    today = datetime.now().strftime('%Y-%m-%d')
+    feeds = st.session_state.setdefault('live_feeds', {})
+    live_totals = st.session_state.setdefault('live_totals', {})
+    
+    rows = []
+    for username in usernames:
+        if username not in feeds:
+            feeds[username] = ChangeFeed(username)
+        totals = live_totals.get(username)
+        if totals is None or totals.date != today:
+            totals = get_live_totals(username, today, feeds[username])
+        else:
+            seq, changes = feeds[username].changes_since(totals.seq)
+            totals.apply(seq, changes)
+        live_totals[username] = totals
+        rows.append(dict(cashier=username, **totals.totals))
+    
+    if not rows:
+        st.info("No sales files found")
+        return
+    
+    revenue = sum(row['total'] for row in rows)
+    sales_count = sum(row['sales'] for row in rows)
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Revenue Today", format_currency(revenue))
+    with col2:
+        st.metric("Sales Today", sales_count)
+    with col3:
+        st.metric("Tortillas Today", f"{sum(row['tortilla_qty'] for row in rows):.1f} kg")
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Totopos", f"{int(sum(row['totopos_qty'] for row in rows))} units")
+        st.metric("Cacahuates", f"{int(sum(row['cacahuates_qty'] for row in rows))} units")
+    with col2:
+        st.metric("Mix", f"{int(sum(row['mix_qty'] for row in rows))} units")
+        st.metric("Salted Chips", f"{int(sum(row['salted_chips_qty'] for row in rows))} units")
+    with col3:
+        st.metric("Average Sale", format_currency(revenue / sales_count if sales_count else 0))
+        st.metric("Supplier Sales", sum(row['supplier_sales'] for row in rows))
+    
+    if len(rows) > 1:
+        st.subheader("By Cashier")
+        for row in rows:
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.write(f"**{row['cashier']}**")
+            with col2:
+                st.write(f"{row['sales']} sales")
+            with col3:
+                st.write(f"{format_currency(row['total'])} - {row['tortilla_qty']:.1f} kg")
+    
+    st.caption(f"Updated {datetime.now().strftime('%H:%M:%S')}")
+
+def archive_screen():
+    st.title("🗄️ Archive Old Sales")
+    st.markdown("Move old sales out of the active file into compressed yearly archives. "
+                "Archived sales still appear in summaries, reports and exports, but the everyday screens stay fast.")
+    
+    if not session_is_admin():
+        st.error("❌ Access denied. Admin privileges required.")
+        if st.button("🔙 Return to Main Menu"):
+            st.session_state.current_screen = "main_menu"
+            st.rerun()
+        return
+    
+    horizon_days = st.number_input("Keep this many days in the active file", min_value=30, value=365, step=30)
+    cutoff = (datetime.now() - timedelta(days=int(horizon_days))).strftime('%Y-%m-%d')
+    st.write(f"Sales before **{cutoff}** will be archived.")
+    
+    if st.button("🗄️ Archive Now", type="primary"):
+        try:
+            archived = sales_manager.archive_old_sales(int(horizon_days))
+        except Exception as e:
+            # Finished or undone the next time the sales are opened
+            st.error(f"❌ Archiving stopped part way: {e}")
+        else:
+            if archived:
+                st.success(f"Archived {archived} sales records")
+            else:
+                st.info("No sales older than the horizon")
+    
+    st.markdown("---")
+    st.subheader("Archive Contents")
+    segments = sales_manager.archive.segments
+    if not segments:
+        st.info("Nothing archived yet")
+    else:
+        checks = sales_manager.archive.verify()
+        for segment in segments:
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.write(f"**{segment['file']}**")
+            with col2:
+                st.write(f"{segment['min_date']} to {segment['max_date']}")
+            with col3:
+                status = "✅" if checks.get(segment['file']) else "❌ checksum mismatch"
+                st.write(f"{segment['rows']} sales - {format_currency(segment['revenue'])} {status}")
+    
+    if st.button("🔙 Return to Main Menu"):
+        st.session_state.current_screen = "main_menu"
+        st.rerun()
+
+def shift_close_screen():
+    from shifts import shift_report_text
+    st.title("💵 Shift Close (Corte de Caja)")
+    
+    shift = sales_manager.get_open_shift()
+    
+    if shift is None:
+        st.info("No shift is open")
+        opening_cash = st.number_input("Opening cash in drawer:", min_value=0.0, value=0.0, step=50.0)
+        if st.button("▶️ Open Shift", type="primary"):
+            if sales_manager.open_shift(opening_cash):
+                st.success("Shift opened")
+                st.rerun()
+            else:
+                st.error("Could not open the shift")
+    else:
+        tallies = shift['tallies']
+        st.write(f"Shift opened at **{shift['opened_at']}** with {format_currency(shift['opening_cash'])}")
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Sales", tallies['sales'])
+            st.metric("Revenue", format_currency(tallies['revenue']))
+        with col2:
+            st.metric("Regular", f"{tallies['regular_sales']} - {format_currency(tallies['regular_revenue'])}")
+            st.metric("Supplier", f"{tallies['supplier_sales']} - {format_currency(tallies['supplier_revenue'])}")
+        with col3:
+            st.metric("Tortillas", f"{tallies['tortilla_qty']:.2f} kg")
+            st.metric("Expected in Drawer", format_currency(sales_manager.shifts.expected_cash(shift)))
+        
+        st.markdown("---")
+        counted_cash = st.number_input("Counted cash in drawer:", min_value=0.0, value=0.0, step=10.0)
+        notes = st.text_input("Notes (optional):")
+        if st.button("⏹️ Close Shift", type="primary"):
+            closed = sales_manager.close_shift(counted_cash, notes)
+            if closed:
+                st.session_state.closed_shift = closed
+                st.rerun()
+            else:
+                st.error("Could not close the shift")
+    
+    closed = st.session_state.get('closed_shift')
+    if closed:
+        st.markdown("---")
+        st.subheader("Last Closed Shift")
+        report_text = shift_report_text(closed)
+        st.text(report_text)
+        st.download_button(
+            label="💾 Download Shift Report",
+            data=report_text,
+            file_name=f"shift_close_{closed['username']}_{closed['id']}.txt",
+            mime="text/plain"
+        )
+    
+    st.markdown("---")
+    st.subheader("Shift History")
+    history = sales_manager.get_shift_history(limit=20)
+    if not history:
+        st.info("No closed shifts yet")
+    else:
+        for past in history:
+            with st.expander(f"{past['opened_at']} to {past['closed_at']} - difference {format_currency(past['difference'])}"):
+                st.text(shift_report_text(past))
+    
+    if st.button("🔙 Return to Main Menu"):
+        st.session_state.current_screen = "main_menu"
+        st.rerun()
+
+def inventory_screen():
+    st.title("📦 Inventory")
+    
+    levels = sales_manager.get_stock_levels()
+    low_stock = sales_manager.get_low_stock()
+    
+    if sales_manager.inventory.needs_rebuild():
+        st.warning("⚠️ Some sales could not be taken off the stock; the levels are corrected the next time the app starts")
+    
+    st.subheader("Current Stock")
+    cols = st.columns(3)
+    for i, product in enumerate(INVENTORY_PRODUCTS):
+        with cols[i % 3]:
+            label = f"⚠️ {product}" if product in low_stock else product
+            st.metric(label, f"{levels[product]:g} {PRODUCT_UNITS[product]}")
+    if low_stock:
+        st.warning("Low stock: " + ", ".join(low_stock))
+    
+    st.markdown("---")
+    st.subheader("Receive Stock")
+    col1, col2 = st.columns(2)
+    with col1:
+        product = st.selectbox("Product:", list(INVENTORY_PRODUCTS))
+    with col2:
+        quantity = st.number_input(f"Quantity received ({PRODUCT_UNITS[product]}):", min_value=0.0, value=0.0, step=1.0)
+    note = st.text_input("Note (supplier, invoice...):")
+    if st.button("📥 Record Receipt", type="primary"):
+        if quantity <= 0:
+            st.error("Enter a quantity greater than zero")
+        else:
+            try:
+                sales_manager.receive_stock(product, quantity, note)
+            except Exception as e:
+                st.error(f"Failed to record the receipt: {e}")
+            else:
+                st.success(f"Added {quantity:g} {PRODUCT_UNITS[product]} of {product}")
+                st.rerun()
+    
+    if session_is_admin():
+        st.markdown("---")
+        st.subheader("Physical Count and Alerts")
+        count_product = st.selectbox("Product to adjust:", list(INVENTORY_PRODUCTS), key="count_product")
+        col1, col2 = st.columns(2)
+        with col1:
+            counted = st.number_input("Counted level:", min_value=0.0, value=float(max(levels[count_product], 0)), step=1.0)
+            if st.button("🔢 Set Counted Level"):
+                try:
+                    sales_manager.count_stock({count_product: counted}, "physical count")
+                except Exception as e:
+                    st.error(f"Failed to record the count: {e}")
+                else:
+                    st.success(f"{count_product} set to {counted:g}")
+                    st.rerun()
+        with col2:
+            threshold = st.number_input("Alert when at or below:", min_value=0.0,
+                                        value=float(sales_manager.inventory.thresholds.get(count_product, 0)), step=1.0)
+            if st.button("🔔 Save Alert Level"):
+                try:
+                    sales_manager.inventory.set_threshold(count_product, threshold)
+                except Exception as e:
+                    st.error(f"Failed to save the alert level: {e}")
+                else:
+                    st.success(f"Low-stock alert for {count_product} set to {threshold:g}")
+                    st.rerun()
+    
+    st.markdown("---")
+    st.subheader("Recent Movements")
+    movements = sales_manager.inventory.recent_movements(limit=20)
+    if not movements:
+        st.info("No stock movements recorded yet")
+    else:
+        for movement in movements:
+            if movement['op'] == 'threshold':
+                continue
+            changes = movement.get('deltas') or movement.get('levels', {})
+            detail = ", ".join(f"{product} {qty:+g}" if movement['op'] != 'count' else f"{product} = {qty:g}"
+                               for product, qty in changes.items())
+            st.write(f"{movement['at']} - **{movement['op']}** by {movement['user']}: {detail} {movement.get('note', '')}")
+    
+    if st.button("🔙 Return to Main Menu"):
+        st.session_state.current_screen = "main_menu"
+        st.rerun()
+
+def customers_screen():
+    st.title("👤 Customers")
+    
+    
+    search = st.text_input("Search by ID, name or phone:")
+    matches = sales_manager.find_customers(search, limit=20) if search else []
+    if search and not matches:
+        st.info("No customers match")
+    
+    if matches:
+        customer_id = st.selectbox("Customer:", [customer['id'] for customer in matches],
+                                   format_func=lambda cid: f"{cid} - {next(c['name'] for c in matches if c['id'] == cid)}")
+        customer = sales_manager.get_customer(customer_id)
+        st.subheader(customer['name'])
+        if customer['phone']:
+            st.write(f"📞 {customer['phone']}")
+        if customer['notes']:
+            st.write(customer['notes'])
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Visits", customer['visits'])
+        with col2:
+            st.metric("Tortilla Bought", f"{customer['kg']:g} kg")
+        with col3:
+            st.metric("Total Spend", format_currency(customer['spend']))
+        with col4:
+            st.metric("Last Visit", customer['last_visit'][:10] or "-")
+        
+        history = sales_manager.get_customer_history(customer_id)
+        if history:
+            import pandas as pd
+            st.subheader("Purchase History")
+            history_df = pd.DataFrame(history)[['date', 'time', 'username', 'kg', 'total']]
+            history_df.columns = ['Date', 'Time', 'Cashier', 'Tortilla (kg)', 'Total']
+            st.dataframe(history_df, use_container_width=True, hide_index=True)
+        else:
+            st.info("No purchases recorded for this customer yet")
+    
+    st.markdown("---")
+    st.subheader("Register New Customer")
+    name = st.text_input("Name:")
+    phone = st.text_input("Phone:")
+    notes = st.text_input("Notes:")
+    if st.button("➕ Register Customer", type="primary"):
+        if not name.strip():
+            st.error("Enter the customer's name")
+        else:
+            customer = sales_manager.register_customer(name, phone, notes)
+            if customer:
+                st.success(f"Registered {customer['name']} as {customer['id']}")
+            else:
+                st.error("Failed to register the customer")
+    
+    if st.button("🔙 Return to Main Menu"):
+        st.session_state.current_screen = "main_menu"
+        st.rerun()
+
+def audit_screen():
+    import pandas as pd
+    from audit import AUDIT_ISSUES, audit_report
+    from sales_manager import list_sales_users
+    st.title("🔍 Sales Audit")
+    st.markdown("Recomputes each sale's total from its quantities and prices, checks that change = payment - total, "
+                "and flags negative change and impossible quantities.")
+    
+    if not session_is_admin():
+        st.error("❌ Access denied. Admin privileges required.")
+        if st.button("🔙 Return to Main Menu"):
+            st.session_state.current_screen = "main_menu"
+            st.rerun()
+        return
+    
+    usernames = list_sales_users()
+    if not usernames:
+        st.info("No sales files found")
+    else:
+        username = st.selectbox("Cashier:", usernames,
+                                index=usernames.index(st.session_state.username) if st.session_state.username in usernames else 0)
+        manager = sales_manager if username == st.session_state.username else session_sales_manager(username)
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("🔍 Check New Sales", type="primary"):
+                result = manager.run_audit()
+                if result:
+                    st.success(f"Checked {result['checked']} new sales")
+        with col2:
+            if st.button("🔁 Full Re-audit"):
+                result = manager.run_audit(full=True)
+                if result:
+                    st.success(f"Checked all {result['checked']} sales")
+        
+        if manager.audit.watermark is None:
+            st.info("This cashier's sales have not been audited yet")
+        else:
+            st.caption(f"Last audit: {manager.audit.data.get('audited_at')} (change #{manager.audit.watermark})")
+            issues = manager.audit.issues
+            if not issues:
+                st.success("✅ No problems found")
+            else:
+                st.warning(f"{len(issues)} sales need review")
+                counts = audit_report(issues)
+                cols = st.columns(3)
+                for i, (issue, description) in enumerate(AUDIT_ISSUES.items()):
+                    with cols[i % 3]:
+                        st.metric(description, counts[issue])
+                
+                issues_df = pd.DataFrame(issues)
+                columns = ['date', 'time', 'username', 'issues', 'total', 'expected_total',
+                           'payment', 'change', 'expected_change', 'supplier']
+                st.dataframe(issues_df[[column for column in columns if column in issues_df]], use_container_width=True)
+                st.download_button(
+                    label="💾 Download Findings (CSV)",
+                    data=issues_df.to_csv(index=False),
+                    file_name=f"sales_audit_{username}_{datetime.now().strftime('%Y-%m-%d')}.csv",
+                    mime="text/csv"
+                )
+    
+    if st.button("🔙 Return to Main Menu"):
+        st.session_state.current_screen = "main_menu"
+        st.rerun()
+
+def sync_screen():
+    from sales_manager import list_sales_users
+    from sync import sync_with_folder
+    from utils import load_json_file, save_json_file
+    st.title("🔄 Sync Registers")
+    st.markdown("Exchange sales with the other registers through a shared folder (USB stick or network share). "
+                "Only days that differ are read or written; after every register syncs, all hold the same sales. "
+                "Deleted sales are not removed from the other registers.")
+    
+    if not session_is_admin():
+        st.error("❌ Access denied. Admin privileges required.")
+        if st.button("🔙 Return to Main Menu"):
+            st.session_state.current_screen = "main_menu"
+            st.rerun()
+        return
+    
+    settings = load_json_file("sync_settings.json", {})
+    folder = st.text_input("Sync folder:", value=settings.get('folder', ''))
+    
+    if st.button("🔄 Sync Now", type="primary"):
+        if not folder:
+            st.error("Enter the path of the shared sync folder")
+        else:
+            save_json_file("sync_settings.json", {'folder': folder})
+            with st.spinner("Syncing..."):
+                results = sync_with_folder(folder, session_sales_manager, list_sales_users())
+            for username, result in results.items():
+                if 'error' in result:
+                    st.error(f"{username}: {result['error']}")
+                else:
+                    st.write(f"**{username}**: received {result['received']}, sent {result['sent']} "
+                             f"({result['days_differing']} of {result['days_compared']} days differed, "
+                             f"{(result['bytes_read'] + result['bytes_written']) / 1024:.1f} KB transferred)")
+            st.success("Sync finished")
+    
+    if st.button("🔙 Return to Main Menu"):
+        st.session_state.current_screen = "main_menu"
+        st.rerun()
+
+def backups_screen():
+    from backup import BackupStore
+    from sales_manager import list_sales_users
+    st.title("💾 Backups")
+    st.markdown("Each snapshot stores only what changed since the previous one: "
+                "sales are kept as one piece per day, so a nightly backup costs about one day of sales.")
+    
+    if not session_is_admin():
+        st.error("❌ Access denied. Admin privileges required.")
+        if st.button("🔙 Return to Main Menu"):
+            st.session_state.current_screen = "main_menu"
+            st.rerun()
+        return
+    
+    store = BackupStore()
+    note = st.text_input("Note for the snapshot (optional):")
+    if st.button("💾 Back Up Now", type="primary"):
+        with st.spinner("Backing up..."):
+            manifest = store.create_snapshot(session_sales_manager, list_sales_users(), note)
+        stats = manifest['stats']
+        st.success(f"Snapshot {manifest['id']} saved: {stats['new_objects']} new pieces "
+                   f"({stats['new_bytes'] / 1024:.1f} KB), {stats['reused_objects']} unchanged")
+    
+    st.markdown("---")
+    st.subheader("Snapshots")
+    snapshots = store.list_snapshots()
+    if not snapshots:
+        st.info("No snapshots yet")
+    else:
+        for manifest in reversed(snapshots[-30:]):
+            sales_count = sum(entry['rows'] for entry in manifest['sales'].values())
+            st.write(f"**{manifest['id']}** - {manifest['created']} - {sales_count} sales - "
+                     f"+{manifest['stats']['new_bytes'] / 1024:.1f} KB {manifest.get('note', '')}")
+        
+        if st.button("🔍 Verify All Snapshots"):
+            problems = store.verify()
+            if problems:
+                for problem in problems:
+                    st.error(problem)
+            else:
+                st.success("✅ Every stored piece matches its checksum")
+        
+        st.markdown("---")
+        st.subheader("Restore")
+        snapshot_id = st.selectbox("Snapshot to restore:", [manifest['id'] for manifest in reversed(snapshots)])
+        confirm = st.checkbox("I understand this replaces the current sales files (a snapshot of the current state is taken first)")
+        if st.button("⏪ Restore Snapshot", disabled=not confirm):
+            try:
+                restored = store.restore(snapshot_id, session_sales_manager)
+                st.success(f"Restored {snapshot_id} for {', '.join(restored)}")
+            except Exception as e:
+                st.error(f"Restore failed: {e}")
+    
+    if st.button("🔙 Return to Main Menu"):
+        st.session_state.current_screen = "main_menu"
+        st.rerun()
+
+def trends_screen():
+    st.title("📉 Sales Trends")
+    st.markdown("Revenue, tortilla kilos and number of sales per day over any period.")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        start_date = st.date_input("From", value=datetime.now().date() - timedelta(days=365))
+    with col2:
+        end_date = st.date_input("To", value=datetime.now().date())
+    
+    if start_date > end_date:
+        st.error("The start date must be before the end date")
+    else:
+        # Long ranges are downsampled so each chart gets at most a few hundred points
+        series = sales_manager.get_trend_series(start_date, end_date, max_points=300)
+        if not series or all(values.sum() == 0 for values in series.values()):
+            st.info("No sales recorded for this period")
+        else:
+            days = (end_date - start_date).days + 1
+            for name, values in series.items():
+                st.subheader(name)
+                st.line_chart(values.rename(name))
+            if days > 300:
+                st.caption(f"{days} days shown with at most 300 points per chart; peaks and dips are preserved.")
+    
+    if st.button("🔙 Return to Main Menu"):
+        st.session_state.current_screen = "main_menu"
+        st.rerun()
+
+def rankings_screen():
+    st.title("🏆 Rankings")
+    st.markdown("Best days, busiest hours, top cashiers and largest sales for any period.")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        start_date = st.date_input("From", value=datetime.now().date() - timedelta(days=30))
+    with col2:
+        end_date = st.date_input("To", value=datetime.now().date())
+    
+    if start_date > end_date:
+        st.error("The start date must be before the end date")
+    else:
+        if session_is_admin():
+            # Administrators rank the whole shop, every cashier's sales file
+            from sales_manager import list_sales_users
+            from leaderboards import leaderboards
+            managers = [session_sales_manager(username) for username in list_sales_users()]
+            boards = leaderboards(managers, start_date, end_date)
+        else:
+            boards = sales_manager.get_leaderboards(start_date, end_date)
+        
+        if not boards or not boards['best_days']:
+            st.info("No sales recorded for this period")
+        else:
+            import pandas as pd
+            col1, col2 = st.columns(2)
+            with col1:
+                st.subheader("💰 Best Days")
+                df = pd.DataFrame(boards['best_days'])
+                df['revenue'] = df['revenue'].apply(format_currency)
+                df.columns = ['Date', 'Revenue', 'Sales']
+                st.dataframe(df, use_container_width=True, hide_index=True)
+            with col2:
+                st.subheader("⏰ Busiest Hours")
+                df = pd.DataFrame(boards['busiest_hours'])
+                df.columns = ['Date', 'Hour', 'Sales', 'Tortilla (kg)']
+                st.dataframe(df, use_container_width=True, hide_index=True)
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                st.subheader("🧑‍🍳 Top Cashiers")
+                df = pd.DataFrame(boards['top_cashiers'])
+                df.columns = ['Cashier', 'Tortilla (kg)', 'Sales']
+                st.dataframe(df, use_container_width=True, hide_index=True)
+            with col2:
+                st.subheader("🧾 Largest Sales")
+                df = pd.DataFrame(boards['largest_sales'])
+                df['total'] = df['total'].apply(format_currency)
+                df.columns = ['Date', 'Time', 'Cashier', 'Total', 'Tortilla (kg)']
+                st.dataframe(df, use_container_width=True, hide_index=True)
+    
+    if st.button("🔙 Return to Main Menu"):
+        st.session_state.current_screen = "main_menu"
+        st.rerun()
+
+def price_what_if_screen():
+    st.title("💲 Price What-If")
+    st.markdown("Reprice past sales with a proposed price table to see the revenue impact before changing prices.")
+    
+    if not session_is_admin():
+        st.error("❌ Access denied. Admin privileges required.")
+        if st.button("🔙 Return to Main Menu"):
+            st.session_state.current_screen = "main_menu"
+            st.rerun()
+        return
+    
+    from pricing import PRICE_GROUPS, CURRENT_PRICES, SIMULATION_PERIODS, simulate_prices
+    col1, col2 = st.columns(2)
+    with col1:
+        start_date = st.date_input("From", value=datetime.now().date() - timedelta(days=3 * 365))
+    with col2:
+        end_date = st.date_input("To", value=datetime.now().date())
+    
+    st.subheader("Proposed Prices")
+    prices = {}
+    cols = st.columns(3)
+    for i, name in enumerate(PRICE_GROUPS):
+        with cols[i % 3]:
+            unit = "kg" if "Tortilla" in name else "unit"
+            prices[name] = st.number_input(f"{name} (per {unit}, now {format_currency(CURRENT_PRICES[name])})",
+                                           min_value=0.0, value=CURRENT_PRICES[name], step=0.5)
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        elasticity = st.slider("Price elasticity", min_value=-2.0, max_value=0.0, value=0.0, step=0.1,
+                               help="How quantities react to price: -0.5 means a 10% price rise sells about 5% less. 0 keeps quantities as they were.")
+    with col2:
+        period = st.selectbox("Show per:", SIMULATION_PERIODS, index=2, format_func=str.title)
+    
+    free = [name for name, price in prices.items() if price <= 0]
+    if start_date > end_date:
+        st.error("The start date must be before the end date")
+    elif elasticity and free:
+        st.error(f"With a price elasticity, prices must be above zero: {', '.join(free)}")
+    else:
+        # Pricing is a shop-wide decision: reprice every cashier's sales
+        import pandas as pd
+        from sales_manager import list_sales_users
+        daily_totals = pd.concat([session_sales_manager(username).get_daily_totals(start_date, end_date)
+                                  for username in list_sales_users()] or [pd.DataFrame()], ignore_index=True)
+        result = simulate_prices(daily_totals, prices, elasticity, period) if not daily_totals.empty else pd.DataFrame()
+        
+        if result.empty:
+            st.info("No sales recorded for this period")
+        else:
+            revenue = result['revenue'].sum()
+            simulated_revenue = result['simulated_revenue'].sum()
+            change = simulated_revenue - revenue
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Recorded Revenue", format_currency(revenue))
+            with col2:
+                st.metric("Simulated Revenue", format_currency(simulated_revenue),
+                          f"{change / revenue * 100:+.1f}%" if revenue else None)
+            with col3:
+                st.metric("Tortilla (kg)", f"{result['simulated_tortilla_kg'].sum():,.1f}",
+                          f"{result['simulated_tortilla_kg'].sum() - result['tortilla_kg'].sum():+,.1f}")
+            
+            st.subheader(f"Revenue Change per {period.title()}")
+            st.bar_chart(result.set_index('period')['delta'])
+            df = result.copy()
+            for column in ['revenue', 'simulated_revenue', 'delta']:
+                df[column] = df[column].apply(format_currency)
+            df.columns = [period.title(), 'Sales', 'Recorded', 'Simulated', 'Change', 'Change (%)',
+                          'Tortilla (kg)', 'Simulated Tortilla (kg)']
+            st.dataframe(df, use_container_width=True, hide_index=True)
+            st.caption("Special products and amounts charged off the price list keep their recorded revenue.")
+    
+    if st.button("🔙 Return to Main Menu"):
+        st.session_state.current_screen = "main_menu"
+        st.rerun()
+
 def manage_excel_data_screen():
     st.title("📊 Manage Excel Data")
     
@@ -593,18 +1541,16 @@ def manage_excel_data_screen():
         
         if uploaded_file is not None:
             try:
-                # Read the uploaded Excel file
-                df = pd.read_excel(uploaded_file, engine='openpyxl')
+                # Read the uploaded Excel file as written; rows are checked before conversion
+                from schema import read_raw_sales, check_import_rows, REQUIRED_COLUMNS
+                df = read_raw_sales(uploaded_file)
                 
                 # Display preview
                 st.subheader("Preview of uploaded data:")
                 st.dataframe(df.head())
                 
                 # Validate columns
-                required_columns = ['date', 'time', 'username', 'tortilla_qty', 'totopos_qty', 
-                                  'cacahuates_qty', 'mix_qty', 'salted_chips_qty', 'special_qty',
-                                  'special_price', 'frequent_customer', 'supplier', 'total', 
-                                  'payment', 'change']
+                required_columns = REQUIRED_COLUMNS
                 
                 missing_columns = [col for col in required_columns if col not in df.columns]
                 
@@ -617,33 +1563,24 @@ def manage_excel_data_screen():
                     col1, col2 = st.columns(2)
                     
                     with col1:
+                        include_conflicting = st.checkbox("Also import conflicting rows", value=False,
+                                                          help="Rows with the same date, time and cashier as a stored sale but different quantities or total")
                         if st.button("✅ Import Data", type="primary"):
-                            # Import each row
-                            import_count = 0
-                            for _, row in df.iterrows():
-                                sale_data = {
-                                    'date': str(row['date']),
-                                    'time': str(row['time']),
-                                    'username': str(row['username']),
-                                    'tortilla_qty': float(row['tortilla_qty']),
-                                    'totopos_qty': float(row['totopos_qty']),
-                                    'cacahuates_qty': float(row['cacahuates_qty']),
-                                    'mix_qty': float(row['mix_qty']),
-                                    'salted_chips_qty': float(row['salted_chips_qty']),
-                                    'special_qty': float(row['special_qty']),
-                                    'special_price': float(row['special_price']),
-                                    'frequent_customer': bool(row['frequent_customer']),
-                                    'supplier': bool(row['supplier']),
-                                    'total': float(row['total']),
-                                    'payment': float(row['payment']),
-                                    'change': float(row['change'])
-                                }
-                                
-                                if sales_manager.add_sale(sale_data):
-                                    import_count += 1
+                            sales_to_import, rejected = check_import_rows(df)
+                            if rejected:
+                                import pandas as pd
+                                st.warning(f"{len(rejected)} rows were not imported:")
+                                st.dataframe(pd.DataFrame(rejected, columns=['Row', 'Problem']), hide_index=True)
                             
-                            st.success(f"Successfully imported {import_count} sales records!")
-                            st.balloons()
+                            # Rows already in the store are skipped, so re-uploading a file is harmless
+                            result = sales_manager.import_sales(sales_to_import, include_conflicting)
+                            if result['success']:
+                                st.success(f"Successfully imported {result['imported']} sales records!")
+                                st.info(f"New: {result['new']} · Already present: {result['duplicate']} · Conflicting: {result['conflicting']}")
+                                if result['imported']:
+                                    st.balloons()
+                            else:
+                                st.error("Failed to import sales records")
                     
                     with col2:
                         st.info(f"Ready to import {len(df)} records")
@@ -656,26 +1593,35 @@ def manage_excel_data_screen():
     with tab2:
         st.markdown("Export all current sales data to an Excel file.")
         
-        # Get current sales data
-        all_sales = sales_manager.get_all_sales()
+        # Count from the daily rollups; the sales themselves are streamed
+        daily_totals = sales_manager.get_daily_totals()
+        record_count = int(daily_totals['sales'].sum()) if not daily_totals.empty else 0
         
-        if all_sales.empty:
+        if not record_count:
             st.info("No sales data available to export.")
         else:
-            st.success(f"Ready to export {len(all_sales)} sales records")
+            st.success(f"Ready to export {record_count} sales records")
             
             # Show preview of data
             st.subheader("Preview of current sales data:")
-            st.dataframe(all_sales.head())
+            preview = next(sales_manager.iter_sales(chunk_rows=5), None)
+            if preview is not None:
+                st.dataframe(preview)
             
             if st.button("📥 Generate Excel File", type="primary"):
                 try:
-                    # Create Excel file in memory
+                    # Stream the sales into a write-only workbook a chunk at a time
                     import io
+                    from openpyxl import Workbook
+                    from schema import SALE_COLUMNS
+                    workbook = Workbook(write_only=True)
+                    sheet = workbook.create_sheet()
+                    sheet.append(SALE_COLUMNS)
+                    for chunk in sales_manager.iter_sales(columns=SALE_COLUMNS):
+                        for row in chunk.astype(object).itertuples(index=False, name=None):
+                            sheet.append(list(row))
                     output = io.BytesIO()
-                    
-                    # Write data to Excel
-                    all_sales.to_excel(output, index=False, engine='openpyxl')
+                    workbook.save(output)
                     output.seek(0)
                     
                     # Generate filename with current date
@@ -709,86 +1655,11 @@ def download_reports_screen():
     
     if st.button("📥 Generate Daily Report (TXT)"):
         try:
+            from reports import daily_report_text
             daily_sales = sales_manager.get_daily_sales(daily_date.strftime('%Y-%m-%d'))
             
             # Generate TXT content
-            report_lines = []
-            report_lines.append("=" * 50)
-            report_lines.append("TORTILLA BUSINESS - DAILY SALES REPORT")
-            report_lines.append("=" * 50)
-            report_lines.append(f"Date: {daily_date.strftime('%Y-%m-%d')}")
-            report_lines.append(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-            report_lines.append("=" * 50)
-            
-            if daily_sales.empty:
-                report_lines.append("No sales recorded for this date.")
-            else:
-                # Product summary
-                report_lines.append("PRODUCT SUMMARY:")
-                report_lines.append("-" * 30)
-                report_lines.append(f"Tortillas: {daily_sales['tortilla_qty'].sum()} kg")
-                report_lines.append(f"Totopos: {int(daily_sales['totopos_qty'].sum())} units")
-                report_lines.append(f"Cacahuates: {int(daily_sales['cacahuates_qty'].sum())} units")
-                report_lines.append(f"Mix: {int(daily_sales['mix_qty'].sum())} units")
-                report_lines.append(f"Salted Chips: {int(daily_sales['salted_chips_qty'].sum())} units")
-                report_lines.append(f"Special: {int(daily_sales['special_qty'].sum())} units")
-                
-                # Financial summary
-                tortilla_subtotal = 0
-                supplier_tortilla_subtotal = 0
-                other_subtotal = 0
-                
-                for _, sale in daily_sales.iterrows():
-                    if sale['tortilla_qty'] > 0:
-                        if sale['supplier']:
-                            supplier_tortilla_subtotal += sale['tortilla_qty'] * 22.0
-                        else:
-                            tortilla_subtotal += sale['tortilla_qty'] * 25.0
-                    
-                    other_subtotal += (
-                        sale['totopos_qty'] * 25.0 +
-                        sale['cacahuates_qty'] * 10.0 +
-                        sale['mix_qty'] * 10.0 +
-                        sale['salted_chips_qty'] * 15.0 +
-                        sale['special_qty'] * sale['special_price']
-                    )
-                
-                report_lines.append("")
-                report_lines.append("FINANCIAL SUMMARY:")
-                report_lines.append("-" * 30)
-                report_lines.append(f"Regular Tortilla Subtotal: ${tortilla_subtotal:.2f}")
-                report_lines.append(f"Supplier Tortilla Subtotal: ${supplier_tortilla_subtotal:.2f}")
-                report_lines.append(f"Other Products Subtotal: ${other_subtotal:.2f}")
-                report_lines.append(f"GRAND TOTAL: ${tortilla_subtotal + supplier_tortilla_subtotal + other_subtotal:.2f}")
-                report_lines.append(f"Total Sales Count: {len(daily_sales)}")
-                
-                # Individual sales
-                report_lines.append("")
-                report_lines.append("INDIVIDUAL SALES:")
-                report_lines.append("-" * 30)
-                for idx, sale in daily_sales.iterrows():
-                    report_lines.append(f"Sale {idx + 1} - {sale['time']} - ${sale['total']:.2f}")
-                    if sale['tortilla_qty'] > 0:
-                        report_lines.append(f"  Tortillas: {sale['tortilla_qty']} kg")
-                    if sale['totopos_qty'] > 0:
-                        report_lines.append(f"  Totopos: {int(sale['totopos_qty'])} units")
-                    if sale['cacahuates_qty'] > 0:
-                        report_lines.append(f"  Cacahuates: {int(sale['cacahuates_qty'])} units")
-                    if sale['mix_qty'] > 0:
-                        report_lines.append(f"  Mix: {int(sale['mix_qty'])} units")
-                    if sale['salted_chips_qty'] > 0:
-                        report_lines.append(f"  Salted Chips: {int(sale['salted_chips_qty'])} units")
-                    if sale['special_qty'] > 0:
-                        report_lines.append(f"  Special: {int(sale['special_qty'])} units @ ${sale['special_price']:.2f}")
-                    if sale['frequent_customer']:
-                        report_lines.append("  * Frequent Customer")
-                    if sale['supplier']:
-                        report_lines.append("  * Supplier Discount")
-                    report_lines.append("")
-            
-            report_lines.append("=" * 50)
-            
-            report_content = "\n".join(report_lines)
+            report_content = daily_report_text(daily_date.strftime('%Y-%m-%d'), daily_sales)
             
             st.download_button(
                 label="📥 Download Daily Report",
@@ -810,50 +1681,15 @@ def download_reports_screen():
     
     if st.button("📥 Generate Weekly Report (TXT)"):
         try:
+            from reports import period_breakdown, period_report_text
             week_dates = get_week_dates(weekly_date)
             
-            # Generate TXT content
-            report_lines = []
-            report_lines.append("=" * 50)
-            report_lines.append("TORTILLA BUSINESS - WEEKLY SALES REPORT")
-            report_lines.append("=" * 50)
-            report_lines.append(f"Week: {week_dates[0].strftime('%Y-%m-%d')} to {week_dates[6].strftime('%Y-%m-%d')}")
-            report_lines.append(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-            report_lines.append("=" * 50)
-            
-            total_weekly_earnings = 0
-            weekly_data = []
-            
-            for date in week_dates:
-                date_str = date.strftime('%Y-%m-%d')
-                daily_sales = sales_manager.get_daily_sales(date_str)
-                daily_total = daily_sales['total'].sum() if not daily_sales.empty else 0
-                
-                weekly_data.append({
-                    'day': date.strftime('%A'),
-                    'date': date.strftime('%Y-%m-%d'),
-                    'sales_count': len(daily_sales),
-                    'total': daily_total
-                })
-                
-                total_weekly_earnings += daily_total
-            
-            # Daily breakdown
-            report_lines.append("DAILY BREAKDOWN:")
-            report_lines.append("-" * 30)
-            for data in weekly_data:
-                report_lines.append(f"{data['day']:<10} {data['date']:<12} {data['sales_count']:>3} sales  ${data['total']:>8.2f}")
-            
-            report_lines.append("-" * 30)
-            report_lines.append(f"TOTAL WEEKLY EARNINGS: ${total_weekly_earnings:.2f}")
-            total_sales_count = sum(data['sales_count'] for data in weekly_data)
-            report_lines.append(f"Total Sales Count: {total_sales_count}")
-            days_with_sales = sum(1 for data in weekly_data if data['sales_count'] > 0)
-            report_lines.append(f"Days with Sales: {days_with_sales}/7")
+            # One read of the pre-aggregated daily totals instead of a file read per day
+            daily_totals = sales_manager.get_daily_totals(week_dates[0], week_dates[6])
+            weekly_data = period_breakdown(week_dates, daily_totals)
             
-            report_lines.append("=" * 50)
-            
-            report_content = "\n".join(report_lines)
+            # Generate TXT content
+            report_content = period_report_text("WEEKLY", week_dates, weekly_data)
             
             st.download_button(
                 label="📥 Download Weekly Report",
@@ -879,9 +1715,25 @@ def main():
         login_screen()
         return
     
-    # Initialize sales manager if not already initialized
-    if sales_manager is None and st.session_state.username:
-        sales_manager = SalesManager(st.session_state.username)
+    session = current_session()
+    if session is None or session['username'] != st.session_state.username:
+        st.session_state.authenticated = False
+        st.session_state.session_token = None
+        st.session_state.sales_manager = None
+        st.warning("Your session has expired. Please log in again.")
+        login_screen()
+        return
+    
+    # Reuse this session's sales manager across reruns
+    cached_manager = st.session_state.sales_manager
+    if cached_manager is None or cached_manager.username != st.session_state.username:
+        st.session_state.sales_manager = session_sales_manager(st.session_state.username)
+    sales_manager = st.session_state.sales_manager
+    
+    # Queued sales reach the store before any screen reads it; the register
+    # screen only queues sales, so it never waits on a flush
+    if st.session_state.current_screen != "register_sale":
+        get_sale_outbox(st.session_state.username, create_sales_manager).flush()
     
     # Handle authenticated screens
     if st.session_state.current_screen == "main_menu":
@@ -900,6 +1752,34 @@ def main():
         download_reports_screen()
     elif st.session_state.current_screen == "user_management":
         user_management_screen()
+    elif st.session_state.current_screen == "demand_profile":
+        demand_profile_screen()
+    elif st.session_state.current_screen == "demand_forecast":
+        demand_forecast_screen()
+    elif st.session_state.current_screen == "live_dashboard":
+        live_dashboard_screen()
+    elif st.session_state.current_screen == "archive":
+        archive_screen()
+    elif st.session_state.current_screen == "trends":
+        trends_screen()
+    elif st.session_state.current_screen == "shift_close":
+        shift_close_screen()
+    elif st.session_state.current_screen == "inventory":
+        inventory_screen()
+    elif st.session_state.current_screen == "customers":
+        customers_screen()
+    elif st.session_state.current_screen == "rankings":
+        rankings_screen()
+    elif st.session_state.current_screen == "compare_periods":
+        compare_periods_screen()
+    elif st.session_state.current_screen == "audit":
+        audit_screen()
+    elif st.session_state.current_screen == "sync":
+        sync_screen()
+    elif st.session_state.current_screen == "backups":
+        backups_screen()
+    elif st.session_state.current_screen == "price_what_if":
+        price_what_if_screen()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,199 @@
+import hashlib
+import os
+import shutil
+import pandas as pd
+from datetime import datetime
+from utils import load_json_file, save_json_file
+from schema import read_sales_csv, iter_sales_csv
+
+class SalesArchive:
+    """Compressed, write-once yearly archives of old sales.
+
+    Each archiving run writes one gzip CSV segment per year it touches
+    (archive_{username}/sales_{year}_{n}.csv.gz); segments are never
+    rewritten. A small index.json lists every segment with its date range,
+    row count, revenue and checksum, so range queries open only the
+    segments that overlap the requested dates.
+
+    Moving sales out of the active file is staged: the segments and a
+    pending.json marker are written first, the active file is rewritten,
+    and only then are the segments listed in the index. A crash in between
+    leaves the marker, and SalesManager completes or undoes the move.
+    """
+
+    def __init__(self, username="default"):
+        self.username = username
+        self.archive_dir = f"archive_{username}"
+        self.index_file = os.path.join(self.archive_dir, "index.json")
+        self.pending_file = os.path.join(self.archive_dir, "pending.json")
+        self.index = load_json_file(self.index_file, {'segments': []})
+
+    @property
+    def segments(self):
+        return self.index['segments']
+
+    @property
+    def max_date(self):
+        """Newest archived date, or None if nothing is archived"""
+        if not self.segments:
+            return None
+        return max(segment['max_date'] for segment in self.segments)
+
+    def covers(self, start_date=None):
+        """True if sales on or after start_date might be in the archive"""
+        max_date = self.max_date
+        return max_date is not None and (start_date is None or start_date <= max_date)
+
+    def _segment_path(self, segment):
+        return os.path.join(self.archive_dir, segment['file'])
+
+    def add(self, old_sales):
+        """Write old sales as new immutable segments, one per year.
+
+        Returns the number of rows archived.
+        """
+        rows = self.stage(old_sales)
+        if rows:
+            self.commit_pending()
+        return rows
+
+    def stage(self, old_sales, cutoff=None):
+        """Write old sales as unlisted segments and record them in the pending marker.
+
+        cutoff is the date the sales were selected by (every one is older);
+        with it the marker also says how to tell whether the active file was
+        rewritten. Returns the number of rows staged.
+        """
+        if old_sales.empty:
+            return 0
+        os.makedirs(self.archive_dir, exist_ok=True)
+        dates = old_sales['date'].astype(str).str[:10]
+        staged = []
+        for year, year_sales in old_sales.groupby(dates.str[:4]):
+            number = sum(1 for segment in self.segments + staged if segment['year'] == year) + 1
+            file_name = f"sales_{year}_{number}.csv.gz"
+            path = os.path.join(self.archive_dir, file_name)
+            year_sales = year_sales.sort_values(['date', 'time'])
+            year_sales.to_csv(path, index=False, compression='gzip')
+            with open(path, 'rb') as f:
+                checksum = hashlib.sha256(f.read()).hexdigest()
+            year_dates = dates.loc[year_sales.index]
+            staged.append({
+                'file': file_name,
+                'year': year,
+                'min_date': year_dates.min(),
+                'max_date': year_dates.max(),
+                'rows': len(year_sales),
+                'revenue': round(float(year_sales['total'].sum()), 2),
+                'sha256': checksum,
+                'created': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            })
+        newest = old_sales.loc[(dates + ' ' + old_sales['time'].astype(str)).idxmax()]
+        save_json_file(self.pending_file, {
+            'cutoff': cutoff,
+            'rows': len(old_sales),
+            'newest': [str(newest['date'])[:10], str(newest['time'])],
+            'segments': staged
+        })
+        return len(old_sales)
+
+    def pending(self):
+        """The marker of a staged move not yet listed in the index, or None"""
+        if not os.path.exists(self.pending_file):
+            return None
+        return load_json_file(self.pending_file, None)
+
+    def commit_pending(self):
+        """List the staged segments in the index and drop the marker"""
+        pending = self.pending()
+        if pending is None:
+            return
+        listed = {segment['file'] for segment in self.segments}
+        self.segments.extend(segment for segment in pending['segments'] if segment['file'] not in listed)
+        save_json_file(self.index_file, self.index)
+        os.remove(self.pending_file)
+
+    def discard_pending(self):
+        """Delete the staged segments and the marker; the sales are still in the active file"""
+        pending = self.pending()
+        if pending is None:
+            return
+        for segment in pending['segments']:
+            path = self._segment_path(segment)
+            if os.path.exists(path):
+                os.remove(path)
+        os.remove(self.pending_file)
+
+    def read_range(self, start_date=None, end_date=None):
+        """Read archived sales between two 'YYYY-MM-DD' dates (inclusive)"""
+        frames = []
+        for segment in self.segments:
+            if start_date and segment['max_date'] < start_date:
+                continue
+            if end_date and segment['min_date'] > end_date:
+                continue
+            df = read_sales_csv(self._segment_path(segment), compression='gzip')
+            dates = df['date'].astype(str).str[:10]
+            mask = pd.Series(True, index=df.index)
+            if start_date:
+                mask &= dates >= start_date
+            if end_date:
+                mask &= dates <= end_date
+            frames.append(df[mask])
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True)
+
+    def iter_range(self, start_date=None, end_date=None, columns=None, chunk_rows=5000):
+        """Yield archived sales between two dates in date order, a chunk at a time.
+
+        Segments are written sorted, so a segment whose dates overlap no
+        other is streamed chunk by chunk; segments that overlap (late sales
+        archived by a later run) are read together and sorted, which holds
+        at most a year's sales.
+        """
+        segments = sorted((segment for segment in self.segments
+                           if not (start_date and segment['max_date'] < start_date)
+                           and not (end_date and segment['min_date'] > end_date)),
+                          key=lambda segment: segment['min_date'])
+        groups = []
+        for segment in segments:
+            if groups and segment['min_date'] <= max(other['max_date'] for other in groups[-1]):
+                groups[-1].append(segment)
+            else:
+                groups.append([segment])
+
+        for group in groups:
+            if len(group) == 1:
+                chunks = iter_sales_csv(self._segment_path(group[0]), chunk_rows, 'gzip', columns)
+            else:
+                frames = [read_sales_csv(self._segment_path(segment), 'gzip', columns) for segment in group]
+                df = pd.concat(frames, ignore_index=True).sort_values(['date', 'time'], kind='stable')
+                chunks = (df.iloc[i:i + chunk_rows] for i in range(0, len(df), chunk_rows))
+            for chunk in chunks:
+                dates = chunk['date'].astype(str).str[:10]
+                mask = pd.Series(True, index=chunk.index)
+                if start_date:
+                    mask &= dates >= start_date
+                if end_date:
+                    mask &= dates <= end_date
+                if mask.any():
+                    yield chunk[mask]
+
+    def verify(self):
+        """Check every segment against its recorded checksum"""
+        results = {}
+        for segment in self.segments:
+            path = self._segment_path(segment)
+            if not os.path.exists(path):
+                results[segment['file']] = False
+                continue
+            with open(path, 'rb') as f:
+                results[segment['file']] = hashlib.sha256(f.read()).hexdigest() == segment['sha256']
+        return results
+
+    def clear(self):
+        """Remove the whole archive (used when all sales are deleted)"""
+        if os.path.exists(self.archive_dir):
+            shutil.rmtree(self.archive_dir)
+        self.index = {'segments': []}
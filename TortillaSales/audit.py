@@ -0,0 +1,157 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from daily_rollup import PRODUCT_COLUMNS
+from fingerprints import sale_fingerprint
+from utils import load_json_file, save_json_file, plain_record, PRODUCT_PRICES, PRODUCT_QUANTITY_COLUMNS, SUPPLIER_TORTILLA_PRICE
+from schema import COLUMN_UNITS
+
+# Prices the Register Sale cart charges per unit (tortilla per kg), by column
+UNIT_PRICES = {PRODUCT_QUANTITY_COLUMNS[product]: price for product, price in PRODUCT_PRICES.items()}
+
+# Products sold by the piece; a fractional count cannot be right
+UNIT_COLUMNS = [column for column, unit in COLUMN_UNITS.items() if unit == 'units']
+
+AUDIT_ISSUES = {
+    'total_mismatch': "Total differs from quantities × prices",
+    'change_mismatch': "Change differs from payment - total",
+    'negative_change': "Payment was less than the total",
+    'negative_quantity': "A quantity is negative",
+    'fractional_units': "A product sold by the piece has a fractional count",
+    'empty_sale': "No products on the sale"
+}
+
+def _numbers(df, column):
+    if column not in df:
+        return pd.Series(0.0, index=df.index)
+    return pd.to_numeric(df[column], errors='coerce').fillna(0.0).astype(float)
+
+def _flags(df, column):
+    if column not in df:
+        return pd.Series(False, index=df.index)
+    values = df[column]
+    if values.dtype == bool:
+        return values
+    return values.astype(str).str.strip().str.lower().isin(['true', '1', '1.0', 'yes'])
+
+def audit_frame(df, tolerance=0.01):
+    """Recompute every sale's total and change in one vectorized pass.
+
+    Returns the flagged rows with expected_total, expected_change and an
+    'issues' column listing the failed checks (see AUDIT_ISSUES).
+    """
+    if df.empty:
+        return pd.DataFrame()
+    quantities = {column: _numbers(df, column) for column in PRODUCT_COLUMNS}
+    total = _numbers(df, 'total')
+    payment = _numbers(df, 'payment')
+    change = _numbers(df, 'change')
+
+    tortilla_price = np.where(_flags(df, 'supplier'), SUPPLIER_TORTILLA_PRICE, UNIT_PRICES['tortilla_qty'])
+    expected_total = quantities['tortilla_qty'] * tortilla_price
+    for column in ['totopos_qty', 'cacahuates_qty', 'mix_qty', 'salted_chips_qty']:
+        expected_total = expected_total + quantities[column] * UNIT_PRICES[column]
+    expected_total = expected_total + quantities['special_qty'] * _numbers(df, 'special_price')
+    expected_change = payment - total
+
+    quantity_frame = pd.DataFrame(quantities)
+    checks = {
+        'total_mismatch': (total - expected_total).abs() > tolerance,
+        'change_mismatch': (change - expected_change).abs() > tolerance,
+        'negative_change': change < -tolerance,
+        'negative_quantity': (quantity_frame < 0).any(axis=1),
+        'fractional_units': (quantity_frame[UNIT_COLUMNS] % 1 != 0).any(axis=1),
+        'empty_sale': (quantity_frame == 0).all(axis=1)
+    }
+    check_frame = pd.DataFrame(checks)
+    flagged = check_frame.any(axis=1)
+    if not flagged.any():
+        return pd.DataFrame()
+
+    issues = check_frame[flagged].apply(lambda row: ", ".join(row.index[row.values]), axis=1)
+    result = df[flagged].copy()
+    result['expected_total'] = expected_total[flagged].round(2)
+    result['expected_change'] = expected_change[flagged].round(2)
+    result['issues'] = issues
+    return result
+
+class SalesAudit:
+    """Audit findings for one cashier, kept current from a watermark.
+
+    The watermark is the change-feed sequence the findings cover, so an
+    incremental run only checks sales added since the last audit and drops
+    findings for sales that were deleted. Findings are stored in
+    audit_{username}.json.
+    """
+
+    def __init__(self, username="default"):
+        self.username = username
+        self.audit_file = f"audit_{username}.json"
+        self.data = load_json_file(self.audit_file, {'watermark': None, 'issues': {}})
+
+    @property
+    def watermark(self):
+        return self.data['watermark']
+
+    @property
+    def issues(self):
+        """Flagged sales, oldest first"""
+        records = list(self.data['issues'].values())
+        return sorted(records, key=lambda record: (str(record.get('date')), str(record.get('time'))))
+
+    def _record_findings(self, flagged):
+        for record in flagged.to_dict('records'):
+            self.data['issues'][sale_fingerprint(record)] = plain_record(record)
+
+    def _finish(self, watermark, feed_inode, checked):
+        self.data['watermark'] = watermark
+        self.data['feed_inode'] = feed_inode
+        self.data['rows_checked'] = checked
+        self.data['audited_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        save_json_file(self.audit_file, self.data)
+        return {'checked': checked, 'flagged': len(self.data['issues']), 'watermark': watermark}
+
+    def is_current_for(self, feed_inode, last_seq):
+        """True if the watermark belongs to this change feed and can be resumed"""
+        return (self.watermark is not None
+                and self.data.get('feed_inode') == feed_inode
+                and self.watermark <= last_seq)
+
+    def run_full(self, chunks, watermark, feed_inode):
+        """Audit the whole history, given as a DataFrame or an iterable of chunks"""
+        if isinstance(chunks, pd.DataFrame):
+            chunks = [chunks]
+        self.data['issues'] = {}
+        checked = 0
+        for chunk in chunks:
+            self._record_findings(audit_frame(chunk))
+            checked += len(chunk)
+        return self._finish(watermark, feed_inode, checked)
+
+    def run_incremental(self, watermark, feed_inode, changes):
+        """Audit only the changes made after the current watermark"""
+        added = []
+        for change in changes:
+            if change['op'] == 'cleared':
+                self.data['issues'] = {}
+                added = []
+            elif change['op'] == 'removed':
+                fingerprint = sale_fingerprint(change['sale'])
+                self.data['issues'].pop(fingerprint, None)
+                matches = [i for i, sale in enumerate(added) if sale_fingerprint(sale) == fingerprint]
+                if matches:
+                    added.pop(matches[0])
+            else:
+                added.append(change['sale'])
+        if added:
+            self._record_findings(audit_frame(pd.DataFrame(added)))
+        return self._finish(watermark, feed_inode, len(added))
+
+def audit_report(issues):
+    """Count findings per check"""
+    counts = {issue: 0 for issue in AUDIT_ISSUES}
+    for record in issues:
+        for issue in str(record.get('issues', '')).split(", "):
+            if issue in counts:
+                counts[issue] += 1
+    return counts
@@ -1,16 +1,56 @@
-import pandas as pd
 import os
+import base64
 import hashlib
+import hmac
+import json
+import time
+from utils import file_version, temp_path_for
+
+# pandas/openpyxl are imported inside the functions that need them so the
+# login screen can be drawn without paying for them
 
 USERS_FILE = "users.xlsx"
+SESSION_SECRET_FILE = "session_secret.key"
+
+# Deliberately slow: run once per login or password change, never per rerun
+PASSWORD_ITERATIONS = 600000
+PASSWORD_SCHEME = "pbkdf2_sha256"
+SESSION_TTL_SECONDS = 12 * 60 * 60
+# Service tokens are minted per store request, so they only need to outlive one
+SERVICE_TOKEN_TTL_SECONDS = 60
+
+_users_cache = {'version': None, 'users': None, 'sessions': None}
+_session_secret = None
 
 def hash_password(password):
-    """Hash a password using SHA-256"""
-    return hashlib.sha256(password.encode()).hexdigest()
+    """Hash a password with salted PBKDF2-SHA256: 'pbkdf2_sha256$iterations$salt$hash'"""
+    salt = os.urandom(16)
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode(), salt, PASSWORD_ITERATIONS)
+    return f"{PASSWORD_SCHEME}${PASSWORD_ITERATIONS}${salt.hex()}${digest.hex()}"
+
+def verify_password(password, stored_password):
+    """Check a password against a stored hash; returns (matches, needs_rehash).
+
+    Hashes from before PBKDF2 (unsalted SHA-256) and PBKDF2 hashes with
+    fewer iterations still verify, but report that they should be upgraded.
+    """
+    stored_password = str(stored_password)
+    if stored_password.startswith(PASSWORD_SCHEME + "$"):
+        try:
+            _, iterations, salt, expected = stored_password.split("$")
+            digest = hashlib.pbkdf2_hmac('sha256', password.encode(), bytes.fromhex(salt), int(iterations))
+        except ValueError:
+            return False, False
+        matches = hmac.compare_digest(digest.hex(), expected)
+        return matches, matches and int(iterations) < PASSWORD_ITERATIONS
+    legacy = hashlib.sha256(password.encode()).hexdigest()
+    matches = hmac.compare_digest(legacy, stored_password)
+    return matches, matches
 
 def initialize_users_file():
     """Initialize the users file with default admin user"""
     if not os.path.exists(USERS_FILE):
+        import pandas as pd
         # Create default admin user
         default_users = pd.DataFrame({
             'username': ['admin'],
@@ -21,45 +61,82 @@ def initialize_users_file():
         return True
     return False
 
+def _load_users():
+    """The cached users DataFrame, re-read only after the file changes; None on error"""
+    import pandas as pd
+    initialize_users_file()
+    version = file_version(USERS_FILE)
+    if version is not None and version == _users_cache['version']:
+        return _users_cache['users']
+    try:
+        users = pd.read_excel(USERS_FILE, engine='openpyxl')
+    except Exception as e:
+        print(f"Error reading users file: {e}")
+        return None
+    _users_cache['version'] = version
+    _users_cache['users'] = users
+    _users_cache['sessions'] = None
+    return users
+
 def get_users():
-    """Get all users from the Excel file"""
+    """Get all users from the Excel file, re-reading it only after it changes"""
+    import pandas as pd
+    users = _load_users()
+    return users.copy() if users is not None else pd.DataFrame()
+
+def get_user_record(username):
+    """Get one user's row as a dict without loading pandas"""
+    from openpyxl import load_workbook
     initialize_users_file()
     try:
-        return pd.read_excel(USERS_FILE, engine='openpyxl')
+        workbook = load_workbook(USERS_FILE, read_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = next(rows, None) or []
+            for values in rows:
+                record = dict(zip(header, values))
+                if record.get('username') == username:
+                    return record
+        finally:
+            workbook.close()
     except Exception as e:
         print(f"Error reading users file: {e}")
-        return pd.DataFrame()
+    return None
+
+def _authenticate(username, password):
+    """The user's record if the password matches, upgrading an old hash; else None"""
+    user = get_user_record(username)
+    if user is None:
+        return None
+    
+    matches, needs_rehash = verify_password(password, user['password'])
+    if not matches:
+        return None
+    if needs_rehash:
+        user['password'] = hash_password(password)
+        _save_user(username, user['password'], bool(user['is_admin']))
+    return user
 
 def authenticate_user(username, password):
     """Authenticate a user"""
-    users_df = get_users()
-    if users_df.empty:
-        return False
-    
-    user = users_df[users_df['username'] == username]
-    if user.empty:
-        return False
-    
-    stored_password = user.iloc[0]['password']
-    return stored_password == hash_password(password)
+    return _authenticate(username, password) is not None
 
 def is_admin(username):
     """Check if a user is an admin"""
-    users_df = get_users()
-    if users_df.empty:
-        return False
-    
-    user = users_df[users_df['username'] == username]
-    if user.empty:
+    user = get_user_record(username)
+    if user is None:
         return False
     
-    return user.iloc[0]['is_admin']
+    return bool(user['is_admin'])
 
 def create_user(username, password, is_admin=False):
     """Create a new user or update existing user's password and admin status"""
-    users_df = get_users()
+    return _save_user(username, hash_password(password), is_admin)
 
-    hashed_pw = hash_password(password)
+def _save_user(username, hashed_pw, is_admin):
+    """Write one user's password hash and admin status to the users file"""
+    import pandas as pd
+    users_df = get_users()
 
     if username in users_df['username'].values:
         # 🔁 Actualizar contraseña y rol si el usuario ya existe
@@ -79,4 +156,126 @@ def create_user(username, password, is_admin=False):
         return True
     except Exception as e:
         print(f"Error saving user data: {e}")
-        return False
\ No newline at end of file
+        return False
+
+def _get_session_secret():
+    """The key session tokens are signed with, created on first use"""
+    global _session_secret
+    if _session_secret is None:
+        secret = os.getenv('SESSION_SECRET')
+        if secret:
+            _session_secret = secret.encode()
+        else:
+            if not os.path.exists(SESSION_SECRET_FILE):
+                # Written aside and linked into place, so processes starting
+                # together (app, store server) all end up with the same key
+                temp_file = temp_path_for(SESSION_SECRET_FILE)
+                fd = os.open(temp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(os.urandom(32))
+                try:
+                    os.link(temp_file, SESSION_SECRET_FILE)
+                except FileExistsError:
+                    pass
+                finally:
+                    os.remove(temp_file)
+            with open(SESSION_SECRET_FILE, 'rb') as f:
+                _session_secret = f.read()
+    return _session_secret
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+def password_fingerprint(stored_password):
+    """A short digest of a stored password hash, so tokens die with the password"""
+    return hashlib.sha256(str(stored_password).encode()).hexdigest()[:16]
+
+def _session_users():
+    """username -> (password fingerprint, is_admin), rebuilt only when users.xlsx changes"""
+    users = _load_users()
+    if users is None:
+        return {}
+    if _users_cache['sessions'] is None:
+        _users_cache['sessions'] = {
+            str(user['username']): (password_fingerprint(user['password']), bool(user['is_admin']))
+            for user in users.to_dict('records')
+        }
+    return _users_cache['sessions']
+
+def _sign(claims):
+    payload = _b64encode(json.dumps(claims).encode())
+    signature = _b64encode(hmac.new(_get_session_secret(), payload.encode(), hashlib.sha256).digest())
+    return f"{payload}.{signature}"
+
+def _verified_claims(token):
+    """The claims of a token with a valid signature that has not expired, or None"""
+    if not token or token.count(".") != 1:
+        return None
+    payload, signature = token.split(".")
+    expected = _b64encode(hmac.new(_get_session_secret(), payload.encode(), hashlib.sha256).digest())
+    if not hmac.compare_digest(signature, expected):
+        return None
+    try:
+        claims = json.loads(_b64decode(payload))
+    except ValueError:
+        return None
+    if not isinstance(claims, dict) or claims.get('exp', 0) < time.time():
+        return None
+    return claims
+
+def issue_session_token(username, stored_password, ttl=SESSION_TTL_SECONDS):
+    """A signed token carrying the user's identity and password fingerprint until it expires"""
+    return _sign({'u': username, 'p': password_fingerprint(stored_password), 'exp': int(time.time() + ttl)})
+
+def issue_service_token(ttl=SERVICE_TOKEN_TTL_SECONDS):
+    """A signed token for the app's own work without a logged-in user (outbox flushes, tools).
+
+    Only a process that can read the session secret can mint one.
+    """
+    return _sign({'svc': True, 'exp': int(time.time() + ttl)})
+
+def verify_service_token(token):
+    """True for a valid, unexpired service token"""
+    claims = _verified_claims(token)
+    return bool(claims and claims.get('svc') is True)
+
+def verify_session_token(token):
+    """Get {'username', 'is_admin', 'expires'} from a valid token, or None.
+
+    An HMAC, a JSON decode and a lookup in the cached users: cheap enough
+    to run on every rerun. The role comes from the users file, not the
+    token, and a token stops working once its user is deleted or changes
+    password.
+    """
+    claims = _verified_claims(token)
+    if claims is None:
+        return None
+    user = _session_users().get(claims.get('u'))
+    if user is None or not hmac.compare_digest(user[0], str(claims.get('p'))):
+        return None
+    return {'username': claims['u'], 'is_admin': user[1], 'expires': claims['exp']}
+
+def change_password(username, current_password, new_password):
+    """Replace a user's password and return a session token for the new one.
+
+    The current password is checked once and the token is issued from the
+    newly stored hash, so only two PBKDF2 runs are paid. Returns None if
+    the current password is wrong, False if the users file cannot be saved.
+    """
+    user = get_user_record(username)
+    if user is None or not verify_password(current_password, user['password'])[0]:
+        return None
+    hashed_pw = hash_password(new_password)
+    if not _save_user(username, hashed_pw, bool(user['is_admin'])):
+        return False
+    return issue_session_token(username, hashed_pw)
+
+def login(username, password):
+    """Check a password once and return a session token, or None"""
+    user = _authenticate(username, password)
+    if user is None:
+        return None
+    return issue_session_token(username, user['password'])
@@ -0,0 +1,225 @@
+import glob
+import hashlib
+import json
+import os
+from datetime import datetime
+from utils import file_version, load_json_file, save_json_file, plain_record, temp_path_for
+
+CHUNK_SIZE = 1024 * 1024
+
+# Files backed up byte for byte, in fixed-size chunks. Append-only logs keep
+# their old chunks, so only the new tail is stored again.
+CHUNKED_PATTERNS = [
+    "users.xlsx",
+    "inventory.log",
+    "customers.json",
+    "customer_sales.log",
+    "shift_*.json",
+    "shift_history_*.jsonl",
+    "archive_*/*"
+]
+
+class BackupStore:
+    """Incremental, content-addressed snapshots of the sales store.
+
+    Every piece of data is stored once in backup_dir/objects under its
+    sha256. Sales workbooks are split into one partition per day (the day's
+    rows as JSON lines); the fingerprint index's per-day digests tell which
+    days changed since the last snapshot, and only those are serialized
+    and stored again. Other files are split into fixed-size chunks. A snapshot is a
+    small manifest in backup_dir/snapshots listing the objects of every
+    file. Files whose version has not changed since the previous snapshot
+    are not even read.
+    """
+
+    def __init__(self, backup_dir="backups"):
+        self.backup_dir = backup_dir
+        self.objects_dir = os.path.join(backup_dir, "objects")
+        self.snapshots_dir = os.path.join(backup_dir, "snapshots")
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest[2:])
+
+    def _put(self, data, stats):
+        """Store bytes under their hash unless already present; returns the hash"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = temp_path_for(path)
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+            stats['new_objects'] += 1
+            stats['new_bytes'] += len(data)
+        else:
+            stats['reused_objects'] += 1
+        return digest
+
+    def _get(self, digest):
+        with open(self._object_path(digest), 'rb') as f:
+            return f.read()
+
+    def list_snapshots(self):
+        """Snapshot manifests, oldest first"""
+        snapshots = []
+        for path in sorted(glob.glob(os.path.join(self.snapshots_dir, "*.json"))):
+            manifest = load_json_file(path, None)
+            if manifest:
+                snapshots.append(manifest)
+        return sorted(snapshots, key=lambda manifest: manifest['sequence'])
+
+    def load_snapshot(self, snapshot_id):
+        return load_json_file(os.path.join(self.snapshots_dir, f"{snapshot_id}.json"), None)
+
+    def _backup_chunked(self, path, previous, stats):
+        version = file_version(path)
+        if previous and previous.get('version') == list(version):
+            return previous
+        chunks = []
+        whole = hashlib.sha256()
+        size = 0
+        with open(path, 'rb') as f:
+            while True:
+                data = f.read(CHUNK_SIZE)
+                if not data:
+                    break
+                whole.update(data)
+                size += len(data)
+                chunks.append(self._put(data, stats))
+        return {'version': list(version), 'size': size, 'sha256': whole.hexdigest(), 'chunks': chunks}
+
+    def _backup_sales(self, manager, previous, stats):
+        version = file_version(manager.sales_file)
+        if previous and previous.get('version') == list(version):
+            return previous
+        with manager.write_lock:
+            version = file_version(manager.sales_file)
+            # Taken before the read: a sale landing in between makes its day
+            # look changed again next time, never unchanged
+            digests = manager.fingerprint_index.day_digests()
+            archived_segments = len(manager.archive.segments)
+            df = manager.get_all_sales(recent_only=True)
+        # Days whose sales digest is unchanged keep their object; an archiving
+        # run removes days without changing digests, so it forces a full pass
+        days = {}
+        changed = None
+        if previous and 'digests' in previous and previous.get('archived_segments') == archived_segments:
+            changed = {day for day in set(digests) | set(previous['digests'])
+                       if digests.get(day) != previous['digests'].get(day)}
+            days = {day: digest for day, digest in previous['days'].items() if day not in changed}
+            stats['reused_objects'] += len(days)
+        if not df.empty:
+            # Keep the workbook's row order inside each day
+            df = df.sort_index()
+            dates = df['date'].astype(str).str[:10]
+            for date_str, day_sales in df.groupby(dates, sort=True):
+                if changed is not None and date_str not in changed:
+                    continue
+                lines = "".join(json.dumps(plain_record(sale), default=str) + "\n" for sale in day_sales.to_dict('records'))
+                days[date_str] = self._put(lines.encode('utf-8'), stats)
+        return {'version': list(version), 'rows': len(df), 'days': dict(sorted(days.items())),
+                'digests': digests, 'archived_segments': archived_segments}
+
+    def create_snapshot(self, manager_factory, usernames, note=""):
+        """Take a snapshot of every sales file and side file; returns its manifest"""
+        stats = {'new_objects': 0, 'new_bytes': 0, 'reused_objects': 0}
+        snapshots = self.list_snapshots()
+        previous = snapshots[-1] if snapshots else {'sequence': 0, 'sales': {}, 'files': {}}
+
+        sales = {}
+        for username in usernames:
+            sales[username] = self._backup_sales(manager_factory(username), previous['sales'].get(username), stats)
+
+        files = {}
+        for pattern in CHUNKED_PATTERNS:
+            for path in sorted(glob.glob(pattern)):
+                if os.path.isfile(path) and not path.endswith(".tmp"):
+                    files[path] = self._backup_chunked(path, previous['files'].get(path), stats)
+
+        now = datetime.now()
+        snapshot_id = now.strftime('%Y%m%d-%H%M%S')
+        number = 1
+        while os.path.exists(os.path.join(self.snapshots_dir, f"{snapshot_id}.json")):
+            number += 1
+            snapshot_id = f"{now.strftime('%Y%m%d-%H%M%S')}-{number}"
+        manifest = {
+            'id': snapshot_id,
+            'sequence': previous['sequence'] + 1,
+            'created': now.strftime('%Y-%m-%d %H:%M:%S'),
+            'note': note,
+            'sales': sales,
+            'files': files,
+            'stats': stats
+        }
+        os.makedirs(self.snapshots_dir, exist_ok=True)
+        # The manifest is written last, so a crash leaves only unreferenced objects
+        save_json_file(os.path.join(self.snapshots_dir, f"{snapshot_id}.json"), manifest)
+        return manifest
+
+    def verify(self, snapshot_id=None):
+        """Check objects against their hashes; returns a list of problems (empty if all good)"""
+        snapshots = [self.load_snapshot(snapshot_id)] if snapshot_id else self.list_snapshots()
+        problems = []
+        checked = {}
+        for manifest in snapshots:
+            if manifest is None:
+                problems.append(f"snapshot {snapshot_id} not found")
+                continue
+            digests = [digest for entry in manifest['sales'].values() for digest in entry['days'].values()]
+            digests += [digest for entry in manifest['files'].values() for digest in entry['chunks']]
+            for digest in digests:
+                if digest not in checked:
+                    try:
+                        checked[digest] = hashlib.sha256(self._get(digest)).hexdigest() == digest
+                    except OSError:
+                        checked[digest] = False
+                if not checked[digest]:
+                    problems.append(f"{manifest['id']}: object {digest[:12]} missing or corrupt")
+            for path, entry in manifest['files'].items():
+                if all(checked.get(digest) for digest in entry['chunks']):
+                    whole = hashlib.sha256(b"".join(self._get(digest) for digest in entry['chunks'])).hexdigest()
+                    if whole != entry['sha256']:
+                        problems.append(f"{manifest['id']}: {path} does not reassemble to its checksum")
+        return problems
+
+    def restore(self, snapshot_id, manager_factory):
+        """Put the store back to a snapshot.
+
+        Sales workbooks are rebuilt from their day partitions and the other
+        files from their chunks; files created after the snapshot are left
+        alone. Aggregates are then rebuilt from the restored sales. The
+        current state is snapshotted first, so a restore can be undone.
+        Returns the restored usernames.
+        """
+        import pandas as pd
+        from schema import coerce_sales, empty_sales_frame
+        from sales_manager import list_sales_users
+
+        manifest = self.load_snapshot(snapshot_id)
+        if manifest is None:
+            raise ValueError(f"Snapshot {snapshot_id} not found")
+        problems = self.verify(snapshot_id)
+        if problems:
+            raise ValueError(f"Snapshot {snapshot_id} failed verification: {problems[0]}")
+        self.create_snapshot(manager_factory, list_sales_users(), note=f"before restoring {snapshot_id}")
+
+        for path, entry in manifest['files'].items():
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = temp_path_for(path)
+            with open(temp_path, 'wb') as f:
+                for digest in entry['chunks']:
+                    f.write(self._get(digest))
+            os.replace(temp_path, path)
+
+        for username, entry in manifest['sales'].items():
+            rows = []
+            for date_str in sorted(entry['days']):
+                rows += [json.loads(line) for line in self._get(entry['days'][date_str]).decode('utf-8').splitlines() if line]
+            df = coerce_sales(pd.DataFrame(rows)) if rows else empty_sales_frame()
+            # Archive index and segments were restored above with the other files
+            manager_factory(username).replace_sales(df)
+        return sorted(manifest['sales'])
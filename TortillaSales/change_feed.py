@@ -0,0 +1,114 @@
+import json
+import os
+from array import array
+from daily_rollup import PRODUCT_COLUMNS
+from utils import to_number, normalize_date, plain_record
+
+class ChangeFeed:
+    """Append-only log of sale changes with a monotonically increasing sequence.
+
+    Every add, delete and clear is written as one JSON line numbered from 1.
+    The byte offset of each line is kept in memory, so changes_since(seq)
+    seeks straight to the first unseen change instead of re-reading the
+    sales file or the whole log.
+    """
+
+    def __init__(self, username="default"):
+        self.username = username
+        self.feed_file = f"changes_{username}.jsonl"
+        self.offsets = array('q')
+        self.log_inode = None
+        self.log_size = 0
+        self.refresh()
+
+    @property
+    def last_seq(self):
+        return len(self.offsets)
+
+    def refresh(self):
+        """Index lines appended since the last refresh"""
+        try:
+            stat = os.stat(self.feed_file)
+        except OSError:
+            return
+        if stat.st_ino != self.log_inode or stat.st_size < self.log_size:
+            self.offsets = array('q')
+            self.log_inode = stat.st_ino
+            self.log_size = 0
+        if stat.st_size == self.log_size:
+            return
+        with open(self.feed_file, 'rb') as f:
+            f.seek(self.log_size)
+            data = f.read()
+        position = 0
+        while True:
+            end = data.find(b"\n", position)
+            if end < 0:
+                break
+            self.offsets.append(self.log_size + position)
+            position = end + 1
+        self.log_size += position
+
+    def _append(self, op, sales):
+        self.refresh()
+        lines = []
+        seq = self.last_seq
+        for sale in sales:
+            seq += 1
+            lines.append(json.dumps({'seq': seq, 'op': op, 'sale': plain_record(sale) if sale else None}, default=str))
+        with open(self.feed_file, 'a', encoding='utf-8') as f:
+            f.write("".join(line + "\n" for line in lines))
+        self.refresh()
+
+    def sales_added(self, sales):
+        self._append('added', sales)
+
+    def sale_removed(self, sale):
+        self._append('removed', [sale])
+
+    def sales_cleared(self):
+        self._append('cleared', [None])
+
+    def changes_since(self, seq):
+        """Get (latest_seq, changes) for every change numbered after seq"""
+        self.refresh()
+        seq = max(0, seq)
+        if seq >= self.last_seq:
+            return self.last_seq, []
+        with open(self.feed_file, 'rb') as f:
+            f.seek(self.offsets[seq])
+            data = f.read(self.log_size - self.offsets[seq])
+        changes = [json.loads(line) for line in data.decode('utf-8').splitlines() if line.strip()]
+        return self.last_seq, changes
+
+LIVE_COLUMNS = ['total'] + PRODUCT_COLUMNS
+
+class LiveTotals:
+    """Running totals for one day, kept current by applying change-feed deltas"""
+
+    def __init__(self, date_str, seq, day=None):
+        self.date = date_str
+        self.seq = seq
+        self.totals = {'sales': 0, 'supplier_sales': 0}
+        self.totals.update({column: 0.0 for column in LIVE_COLUMNS})
+        if day:
+            for key in self.totals:
+                self.totals[key] = day.get(key, 0)
+
+    def apply(self, seq, changes):
+        """Fold a batch of changes into the totals and advance the sequence"""
+        for change in changes:
+            if change['op'] == 'cleared':
+                for key in self.totals:
+                    self.totals[key] = 0
+                continue
+            sale = change['sale'] or {}
+            if normalize_date(sale.get('date')) != self.date:
+                continue
+            sign = 1 if change['op'] == 'added' else -1
+            self.totals['sales'] += sign
+            if bool(sale.get('supplier')):
+                self.totals['supplier_sales'] += sign
+            for column in LIVE_COLUMNS:
+                self.totals[column] += sign * to_number(sale.get(column, 0))
+        self.seq = seq
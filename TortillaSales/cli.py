@@ -0,0 +1,353 @@
+"""Command-line access to reports and maintenance, without Streamlit.
+
+Usage:
+    python -m TortillaSales [--data-dir DIR] [--json] <command> [options]
+
+Commands:
+    report daily|weekly|monthly   TXT report for the period containing --date
+    export                        all sales, oldest first, streamed to one .xlsx or .csv file
+    import FILE                   add a workbook's sales, skipping duplicates
+    summary                       totals for a date range
+    compact                       flush queued sales and shrink side logs
+    rebuild-rollups               recompute every aggregate from the sales files
+    archive                       move old sales into compressed yearly archives
+    audit                         check totals, change and quantities of stored sales
+    sync FOLDER                   exchange missing sales with other registers via a shared folder
+    backup create|list|verify|restore  incremental snapshots of the sales store
+
+Commands work on every cashier's sales file unless --user is given.
+The exit code is non-zero when a command fails, with or without --json.
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+
+def parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+def selected_users(args):
+    from sales_manager import list_sales_users
+    return args.user or list_sales_users()
+
+def write_output(text, path):
+    if path:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+def command_report(args):
+    import pandas as pd
+    from sales_manager import SalesManager
+    from reports import daily_report_text, period_dates, period_breakdown, period_report_text
+
+    report_date = args.date or datetime.now().date()
+    dates = period_dates(args.period, report_date)
+    managers = [SalesManager(username) for username in selected_users(args)]
+
+    if args.period == 'daily':
+        date_str = report_date.strftime('%Y-%m-%d')
+        frames = [manager.get_daily_sales(date_str) for manager in managers]
+        frames = [frame for frame in frames if not frame.empty]
+        daily_sales = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        text = daily_report_text(date_str, daily_sales)
+        breakdown = period_breakdown(dates, pd.DataFrame({
+            'date': [date_str], 'sales': [len(daily_sales)],
+            'total': [float(daily_sales['total'].sum()) if not daily_sales.empty else 0.0]
+        }))
+    else:
+        # Weekly and monthly reports only need the per-day rollups
+        frames = [manager.get_daily_totals(dates[0], dates[-1]) for manager in managers]
+        frames = [frame for frame in frames if not frame.empty]
+        daily_totals = pd.concat(frames).groupby('date', as_index=False).sum() if frames else pd.DataFrame()
+        breakdown = period_breakdown(dates, daily_totals)
+        text = period_report_text(args.period.upper(), dates, breakdown)
+
+    if args.json:
+        return {
+            'period': args.period,
+            'start': dates[0].strftime('%Y-%m-%d'),
+            'end': dates[-1].strftime('%Y-%m-%d'),
+            'days': breakdown,
+            'total': sum(day['total'] for day in breakdown),
+            'sales_count': sum(day['sales_count'] for day in breakdown),
+            'report': text
+        }
+    write_output(text, args.output)
+
+def command_export(args):
+    import heapq
+    from sales_manager import SalesManager
+    from schema import SALE_COLUMNS
+
+    def rows(manager):
+        for chunk in manager.iter_sales(columns=SALE_COLUMNS):
+            yield from chunk.astype(object).itertuples(index=False, name=None)
+
+    # Each cashier's sales arrive oldest first; merging them holds one chunk per cashier
+    merged = heapq.merge(*(rows(SalesManager(username)) for username in selected_users(args)),
+                         key=lambda row: (row[0], row[1]))
+
+    output = args.output or os.path.abspath(f"sales_export_{datetime.now().strftime('%Y-%m-%d')}.xlsx")
+    count = 0
+    if output.endswith('.csv'):
+        import csv
+        with open(output, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(SALE_COLUMNS)
+            for row in merged:
+                writer.writerow(row)
+                count += 1
+    else:
+        from openpyxl import Workbook
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        sheet.append(SALE_COLUMNS)
+        for row in merged:
+            sheet.append(list(row))
+            count += 1
+        workbook.save(output)
+    result = {'file': output, 'rows': count}
+    if args.json:
+        return result
+    print(f"Exported {count} sales records to {output}")
+
+def command_import(args):
+    from sales_manager import SalesManager
+    from schema import read_raw_sales, check_import_rows
+
+    if not args.user or len(args.user) != 1:
+        print("import needs exactly one --user to import into", file=sys.stderr)
+        return 2
+    df = read_raw_sales(args.file, csv=args.file.endswith('.csv'))
+    sales, rejected = check_import_rows(df)
+    result = SalesManager(args.user[0]).import_sales(sales, args.include_conflicting)
+    result['rejected'] = [{'row': row, 'problem': message} for row, message in rejected]
+    if args.json:
+        return (0 if result['success'] and not rejected else 1), result
+    for row, message in rejected:
+        print(f"Row {row} not imported: {message}", file=sys.stderr)
+    if not result['success']:
+        print("Failed to import sales records")
+        return 1
+    print(f"Imported {result['imported']} sales records "
+          f"(new: {result['new']}, already present: {result['duplicate']}, conflicting: {result['conflicting']})")
+    if rejected:
+        print(f"{len(rejected)} rows rejected")
+        return 1
+
+def command_summary(args):
+    import pandas as pd
+    from sales_manager import SalesManager
+    from reports import summarize_daily_totals
+
+    frames = [SalesManager(username).get_daily_totals(args.start, args.end) for username in selected_users(args)]
+    frames = [frame for frame in frames if not frame.empty]
+    summary = summarize_daily_totals(pd.concat(frames) if frames else pd.DataFrame())
+    if args.json:
+        return summary
+    if not summary:
+        print("No sales recorded for this period")
+        return
+    for key, value in summary.items():
+        print(f"{key.replace('_', ' ').title():<22} {value:,.2f}" if isinstance(value, float) else f"{key.replace('_', ' ').title():<22} {value}")
+
+def command_compact(args):
+    from sales_manager import SalesManager
+    from sale_outbox import SaleOutbox
+
+    results = {}
+    for username in selected_users(args):
+        flushed = SaleOutbox(username, SalesManager).flush()
+        results[username] = {'flushed_sales': flushed, 'compacted': SalesManager(username).compact()}
+    if args.json:
+        return results
+    for username, result in results.items():
+        print(f"{username}: flushed {result['flushed_sales']} queued sales, compacted {result['compacted']}")
+
+def command_rebuild_rollups(args):
+    from sales_manager import SalesManager
+
+    results = {username: SalesManager(username).rebuild_aggregates() for username in selected_users(args)}
+    if args.json:
+        return results
+    for username, rebuilt in results.items():
+        print(f"{username}: rebuilt {', '.join(rebuilt)}")
+
+def command_archive(args):
+    from sales_manager import SalesManager
+
+    results = {}
+    for username in selected_users(args):
+        manager = SalesManager(username)
+        archived = manager.archive_old_sales(args.horizon_days)
+        checks = manager.archive.verify()
+        results[username] = {
+            'archived': archived,
+            'segments': len(manager.archive.segments),
+            'corrupt_segments': [name for name, ok in checks.items() if not ok]
+        }
+    if args.json:
+        return results
+    for username, result in results.items():
+        print(f"{username}: archived {result['archived']} sales, {result['segments']} segments"
+              + (f", CORRUPT: {', '.join(result['corrupt_segments'])}" if result['corrupt_segments'] else ""))
+
+def command_audit(args):
+    from sales_manager import SalesManager
+    from audit import audit_report
+
+    results = {}
+    for username in selected_users(args):
+        manager = SalesManager(username)
+        # run_audit returns {} when there was nothing it could check
+        result = manager.run_audit(full=args.full)
+        if result:
+            result['issues'] = audit_report(manager.audit.issues)
+        results[username] = result
+    if args.json:
+        return results
+    for username, result in results.items():
+        if not result:
+            print(f"{username}: no sales")
+            continue
+        found = ", ".join(f"{issue}: {count}" for issue, count in result.get('issues', {}).items() if count)
+        print(f"{username}: checked {result.get('checked', 0)} sales, {result.get('flagged', 0)} flagged"
+              + (f" ({found})" if found else ""))
+    return 0
+
+def command_sync(args):
+    from sales_manager import SalesManager
+    from sale_outbox import SaleOutbox
+    from sync import sync_with_folder
+
+    usernames = selected_users(args)
+    for username in usernames:
+        SaleOutbox(username, SalesManager).flush()
+    results = sync_with_folder(args.folder, SalesManager, usernames, include_folder_users=not args.user)
+    failed = any('error' in result for result in results.values())
+    if args.json:
+        return (1 if failed else 0), results
+    for username, result in results.items():
+        if 'error' in result:
+            print(f"{username}: sync failed: {result['error']}")
+            continue
+        print(f"{username}: received {result['received']}, sent {result['sent']} "
+              f"({result['days_differing']}/{result['days_compared']} days differed, "
+              f"{result['bytes_read'] + result['bytes_written']} bytes transferred)")
+    if failed:
+        return 1
+
+def command_backup(args):
+    from sales_manager import SalesManager, list_sales_users
+    from backup import BackupStore
+
+    store = BackupStore(args.backup_dir or "backups")
+    if args.action == 'create':
+        result = store.create_snapshot(SalesManager, list_sales_users(), args.note or "")
+        if args.json:
+            return {'id': result['id'], 'stats': result['stats']}
+        print(f"Snapshot {result['id']}: {result['stats']['new_objects']} new objects "
+              f"({result['stats']['new_bytes']} bytes), {result['stats']['reused_objects']} reused")
+    elif args.action == 'list':
+        snapshots = [{'id': manifest['id'], 'created': manifest['created'], 'note': manifest.get('note', ''),
+                      'sales': sum(entry['rows'] for entry in manifest['sales'].values()),
+                      'new_bytes': manifest['stats']['new_bytes']} for manifest in store.list_snapshots()]
+        if args.json:
+            return snapshots
+        for snapshot in snapshots:
+            print(f"{snapshot['id']:<20} {snapshot['created']}  {snapshot['sales']:>7} sales  "
+                  f"+{snapshot['new_bytes']} bytes  {snapshot['note']}")
+    elif args.action == 'verify':
+        problems = store.verify(args.snapshot)
+        if args.json:
+            return (1 if problems else 0), {'ok': not problems, 'problems': problems}
+        for problem in problems:
+            print(problem)
+        print("All objects verified" if not problems else f"{len(problems)} problems found")
+        return 1 if problems else 0
+    else:
+        if not args.snapshot:
+            print("restore needs the snapshot id (see: backup list)", file=sys.stderr)
+            return 2
+        restored = store.restore(args.snapshot, SalesManager)
+        if args.json:
+            return {'restored': restored}
+        print(f"Restored snapshot {args.snapshot} for {', '.join(restored)}")
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m TortillaSales", description="Tortilla sales reports and maintenance")
+    parser.add_argument('--data-dir', default=os.path.dirname(os.path.abspath(__file__)),
+                        help="directory holding the sales files (default: the app directory)")
+    parser.add_argument('--json', action='store_true', help="print machine-readable JSON")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    report = commands.add_parser('report', help="daily, weekly or monthly TXT report")
+    report.add_argument('period', choices=['daily', 'weekly', 'monthly'])
+    report.add_argument('--date', type=parse_date, help="a date in the period (default: today)")
+    report.add_argument('--output', help="write the report to this file")
+    report.set_defaults(handler=command_report)
+
+    export = commands.add_parser('export', help="export sales to .xlsx or .csv")
+    export.add_argument('--output', help="output file (default: sales_export_<date>.xlsx)")
+    export.set_defaults(handler=command_export)
+
+    import_command = commands.add_parser('import', help="import sales from a workbook")
+    import_command.add_argument('file')
+    import_command.add_argument('--include-conflicting', action='store_true',
+                                help="also import rows that clash with a stored sale's date, time and cashier")
+    import_command.set_defaults(handler=command_import)
+
+    summary = commands.add_parser('summary', help="sales totals for a date range")
+    summary.add_argument('--start', type=parse_date)
+    summary.add_argument('--end', type=parse_date)
+    summary.set_defaults(handler=command_summary)
+
+    compact = commands.add_parser('compact', help="flush queued sales and compact side logs")
+    compact.set_defaults(handler=command_compact)
+
+    rebuild = commands.add_parser('rebuild-rollups', help="recompute aggregates from the sales files")
+    rebuild.set_defaults(handler=command_rebuild_rollups)
+
+    archive = commands.add_parser('archive', help="move old sales into compressed yearly archives")
+    archive.add_argument('--horizon-days', type=int, default=365, help="days of sales kept in the active file")
+    archive.set_defaults(handler=command_archive)
+
+    audit = commands.add_parser('audit', help="check totals, change and quantities of stored sales")
+    audit.add_argument('--full', action='store_true', help="re-check every sale, not only those added since the last audit")
+    audit.set_defaults(handler=command_audit)
+
+    sync = commands.add_parser('sync', help="exchange missing sales with other registers via a shared folder")
+    sync.add_argument('folder')
+    sync.set_defaults(handler=command_sync)
+
+    backup = commands.add_parser('backup', help="incremental snapshots of the sales store")
+    backup.add_argument('action', choices=['create', 'list', 'verify', 'restore'])
+    backup.add_argument('snapshot', nargs='?', help="snapshot id for verify or restore")
+    backup.add_argument('--backup-dir', help="where snapshots are kept (default: backups in the data directory)")
+    backup.add_argument('--note', help="note stored with a new snapshot")
+    backup.set_defaults(handler=command_backup)
+
+    for command in (report, export, import_command, summary, compact, rebuild, archive, audit, sync):
+        command.add_argument('--user', action='append', help="cashier to include (repeatable; default: all)")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    # Paths given on the command line are relative to where we were run from
+    for name in ('output', 'file', 'folder', 'backup_dir'):
+        if getattr(args, name, None):
+            setattr(args, name, os.path.abspath(getattr(args, name)))
+    os.chdir(args.data_dir)
+    # Handlers return an exit code, a JSON payload, or (exit code, payload)
+    result = args.handler(args)
+    if result is None or isinstance(result, int):
+        return result or 0
+    code, payload = result if isinstance(result, tuple) else (0, result)
+    print(json.dumps(payload, indent=2, default=str))
+    return code
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,277 @@
+import json
+import os
+import threading
+from datetime import datetime
+from utils import to_number, normalize_date, normalize_time, load_json_file, save_json_file, file_version, locked_file, temp_path_for
+
+CUSTOMERS_FILE = "customers.json"
+CUSTOMER_SALES_LOG = "customer_sales.log"
+
+# Customers and their sales are shared by every cashier
+_customers_lock = threading.RLock()
+
+def _search_keys(text):
+    """Every prefix of every word, so a search is a single dict lookup"""
+    keys = set()
+    for word in str(text).lower().split():
+        for end in range(1, len(word) + 1):
+            keys.add(word[:end])
+    return keys
+
+class CustomerRegistry:
+    """Registered customers, with an in-memory prefix map for autocomplete.
+
+    customers.json maps each customer ID (C0001, C0002, ...) to the
+    customer's name, phone and notes. Every prefix of every word of the
+    name, phone and ID points at the matching IDs, so looking a customer up
+    at the register is one dictionary access however many are registered.
+    """
+
+    def __init__(self, customers_file=CUSTOMERS_FILE):
+        self.customers_file = customers_file
+        self.loaded_version = None
+        self.data = {'next_number': 1, 'customers': {}}
+        self.prefixes = {}
+        self.refresh()
+
+    def refresh(self):
+        version = file_version(self.customers_file)
+        if version is not None and version != self.loaded_version:
+            self.data = load_json_file(self.customers_file, self.data)
+            self.loaded_version = version
+            self.prefixes = {}
+            for customer in self.data['customers'].values():
+                self._index(customer)
+
+    def _index(self, customer):
+        for key in _search_keys(f"{customer['id']} {customer['name']} {customer.get('phone', '')}"):
+            self.prefixes.setdefault(key, set()).add(customer['id'])
+
+    def get(self, customer_id):
+        self.refresh()
+        return self.data['customers'].get(customer_id)
+
+    def add(self, name, phone="", notes=""):
+        """Register a customer; returns the new customer record"""
+        name = str(name).strip()
+        if not name:
+            return None
+        # Other processes register customers too; the file lock keeps each
+        # read-increment-save whole, so no two customers share an ID
+        with _customers_lock, locked_file(f"{self.customers_file}.lock"):
+            self.refresh()
+            customer_id = f"C{self.data['next_number']:04d}"
+            customer = {
+                'id': customer_id,
+                'name': name,
+                'phone': str(phone).strip(),
+                'notes': notes,
+                'created': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            }
+            self.data['customers'][customer_id] = customer
+            self.data['next_number'] += 1
+            if not save_json_file(self.customers_file, self.data):
+                return None
+            self.loaded_version = file_version(self.customers_file)
+            self._index(customer)
+            return customer
+
+    def search(self, text, limit=10):
+        """Customers whose ID, name or phone has a word starting with every word of text"""
+        self.refresh()
+        words = str(text).lower().split()
+        if not words:
+            return []
+        matches = None
+        for word in words:
+            ids = self.prefixes.get(word, set())
+            matches = ids if matches is None else matches & ids
+        return [self.data['customers'][customer_id] for customer_id in sorted(matches)[:limit]]
+
+    def all(self):
+        self.refresh()
+        return list(self.data['customers'].values())
+
+class CustomerIndex:
+    """Where each customer's sales are, with running per-customer totals.
+
+    An append-only customer_sales.log (shared by all cashiers) records every
+    sale with a customer ID as it is stored or deleted: the sales file, date,
+    time, total and kilos. Replaying it gives each customer's visits, kg,
+    spend, last visit and sale list, so a customer's history page never
+    reads the sales files. A rebuild rewrites the log with one line per
+    indexed sale, so it does not grow with every rebuild.
+    """
+
+    def __init__(self, username="default", log_file=CUSTOMER_SALES_LOG):
+        self.username = username
+        self.sales_file = f"sales_data_{username}.xlsx"
+        self.log_file = log_file
+        self._reset_memory()
+        self._read_log()
+
+    def _reset_memory(self):
+        self.entries = {}
+        self.totals = {}
+        self.log_inode = None
+        self.log_offset = 0
+
+    def _apply(self, record):
+        if record['op'] == 'clear':
+            for customer_id in list(self.entries):
+                removed = [entry for entry in self.entries[customer_id] if entry['file'] == record['file']]
+                for entry in removed:
+                    self._remove(customer_id, entry)
+            return
+        entry = record['sale']
+        customer_id = record['customer_id']
+        if record['op'] == '+':
+            self.entries.setdefault(customer_id, []).append(entry)
+            totals = self.totals.setdefault(customer_id, {'visits': 0, 'kg': 0.0, 'spend': 0.0, 'last_visit': ''})
+            totals['visits'] += 1
+            totals['kg'] += entry['kg']
+            totals['spend'] += entry['total']
+            totals['last_visit'] = max(totals['last_visit'], f"{entry['date']} {entry['time']}")
+        else:
+            for existing in self.entries.get(customer_id, []):
+                if all(existing[key] == entry[key] for key in ('file', 'date', 'time', 'total')):
+                    self._remove(customer_id, existing)
+                    break
+
+    def _remove(self, customer_id, entry):
+        self.entries[customer_id].remove(entry)
+        totals = self.totals[customer_id]
+        totals['visits'] -= 1
+        totals['kg'] -= entry['kg']
+        totals['spend'] -= entry['total']
+        remaining = self.entries[customer_id]
+        totals['last_visit'] = max((f"{e['date']} {e['time']}" for e in remaining), default='')
+        if not remaining:
+            del self.entries[customer_id]
+            del self.totals[customer_id]
+
+    def _read_log(self):
+        """Apply log lines written since the last read"""
+        try:
+            stat = os.stat(self.log_file)
+        except OSError:
+            return
+        if stat.st_ino != self.log_inode or stat.st_size < self.log_offset:
+            self._reset_memory()
+            self.log_inode = stat.st_ino
+        if stat.st_size == self.log_offset:
+            return
+        with open(self.log_file, 'rb') as f:
+            f.seek(self.log_offset)
+            data = f.read()
+        # Leave a partially written last line for the next read
+        complete = data.rfind(b"\n") + 1
+        for line in data[:complete].decode('utf-8').splitlines():
+            try:
+                self._apply(json.loads(line))
+            except (ValueError, KeyError):
+                continue
+        self.log_offset += complete
+
+    def refresh(self):
+        with _customers_lock:
+            self._read_log()
+
+    def _append(self, records):
+        """Durably record index changes and apply them"""
+        if not records:
+            return True
+        with _customers_lock, locked_file(f"{self.log_file}.lock"):
+            self._read_log()
+            try:
+                with open(self.log_file, 'a+b') as f:
+                    f.seek(0, os.SEEK_END)
+                    prefix = b""
+                    if f.tell() > 0:
+                        f.seek(-1, os.SEEK_END)
+                        if f.read(1) != b"\n":
+                            prefix = b"\n"
+                    f.write(prefix + "".join(json.dumps(record) + "\n" for record in records).encode('utf-8'))
+                    f.flush()
+                    os.fsync(f.fileno())
+            except Exception as e:
+                print(f"Error writing customer sales log: {e}")
+                return False
+            self._read_log()
+            return True
+
+    def _entry(self, sale):
+        return {
+            'file': self.sales_file,
+            'date': normalize_date(sale.get('date')),
+            'time': normalize_time(sale.get('time')),
+            'username': str(sale.get('username', '')),
+            'total': to_number(sale.get('total', 0)),
+            'kg': to_number(sale.get('tortilla_qty', 0))
+        }
+
+    def _records(self, op, sales):
+        records = []
+        for sale in sales:
+            customer_id = sale.get('customer_id')
+            # Sales without a customer have '' (or NaN in old workbooks)
+            if customer_id and customer_id == customer_id:
+                records.append({'op': op, 'customer_id': str(customer_id), 'sale': self._entry(sale)})
+        return records
+
+    def sales_added(self, sales):
+        self._append(self._records('+', sales))
+
+    def sale_removed(self, sale):
+        self._append(self._records('-', [sale]))
+
+    def sales_cleared(self):
+        self._append([{'op': 'clear', 'file': self.sales_file}])
+
+    def _rewrite(self, own_records=None):
+        """Atomically replace the log with one '+' line per indexed sale.
+
+        With own_records, this cashier's sales are replaced by them; other
+        cashiers' sales are kept as they are. Returns the number of lines.
+        """
+        with _customers_lock, locked_file(f"{self.log_file}.lock"):
+            self._read_log()
+            records = [{'op': '+', 'customer_id': customer_id, 'sale': entry}
+                       for customer_id, entries in sorted(self.entries.items())
+                       for entry in entries
+                       if own_records is None or entry['file'] != self.sales_file]
+            records += own_records or []
+            temp_file = temp_path_for(self.log_file)
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                f.write("".join(json.dumps(record) + "\n" for record in records))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_file, self.log_file)
+            self._reset_memory()
+            self._read_log()
+            return len(records)
+
+    def rebuild(self, sales_df):
+        """Re-index this cashier's customer sales from a full sales DataFrame"""
+        records = []
+        if sales_df is not None and not sales_df.empty and 'customer_id' in sales_df.columns:
+            records = self._records('+', sales_df.to_dict('records'))
+        self._rewrite(records)
+
+    def compact(self):
+        """Rewrite the log without deleted sales and clears"""
+        return self._rewrite()
+
+    def summary(self, customer_id):
+        """Visits, kg bought, spend and last visit across all cashiers"""
+        self.refresh()
+        totals = self.totals.get(customer_id)
+        if not totals:
+            return {'visits': 0, 'kg': 0.0, 'spend': 0.0, 'last_visit': ''}
+        return dict(totals, kg=round(totals['kg'], 3), spend=round(totals['spend'], 2))
+
+    def history(self, customer_id):
+        """The customer's sales, newest first, with the file each lives in"""
+        self.refresh()
+        entries = self.entries.get(customer_id, [])
+        return sorted(entries, key=lambda entry: (entry['date'], entry['time']), reverse=True)
@@ -0,0 +1,109 @@
+import pandas as pd
+from datetime import datetime
+from utils import to_number, normalize_date, load_json_file, save_json_file, file_version
+from schema import QUANTITY_COLUMNS
+
+PRODUCT_COLUMNS = QUANTITY_COLUMNS
+
+ROLLUP_COLUMNS = ['sales', 'total', 'payment', 'change'] + PRODUCT_COLUMNS + [
+    'supplier_sales', 'supplier_tortilla_qty', 'frequent_customers'
+]
+
+class DailyRollup:
+    """Per-day sales totals kept next to the sales file.
+
+    Screens that only need daily figures (forecasts, trends, comparisons)
+    read these totals instead of the raw sales.
+    """
+
+    def __init__(self, username="default"):
+        self.username = username
+        self.rollup_file = f"daily_rollup_{username}.json"
+        self.loaded_version = file_version(self.rollup_file)
+        self.data = load_json_file(self.rollup_file, None)
+        self.stale = self.data is None
+        if self.stale:
+            self.data = {'days': {}, 'revision': 0}
+
+    def refresh(self):
+        """Reload the saved state if another SalesManager changed it"""
+        version = file_version(self.rollup_file)
+        if version is None or version == self.loaded_version:
+            return
+        data = load_json_file(self.rollup_file, None)
+        if data is not None:
+            self.data = data
+            self.loaded_version = version
+
+    def needs_rebuild(self):
+        return self.stale
+
+    def save(self):
+        saved = save_json_file(self.rollup_file, self.data)
+        self.loaded_version = file_version(self.rollup_file)
+        return saved
+
+    def _apply(self, sale, sign):
+        date_str = normalize_date(sale.get('date'))
+        day = self.data['days'].setdefault(date_str, {column: 0 for column in ROLLUP_COLUMNS})
+        day['sales'] += sign
+        for column in ['total', 'payment', 'change'] + PRODUCT_COLUMNS:
+            day[column] = round(day[column] + sign * to_number(sale.get(column, 0)), 4)
+        if bool(sale.get('supplier')):
+            day['supplier_sales'] += sign
+            day['supplier_tortilla_qty'] = round(day['supplier_tortilla_qty'] + sign * to_number(sale.get('tortilla_qty', 0)), 4)
+        if bool(sale.get('frequent_customer')):
+            day['frequent_customers'] += sign
+        if day['sales'] <= 0:
+            self.data['days'].pop(date_str, None)
+
+        # Changes to days that have already closed invalidate anything fitted on them
+        if date_str < datetime.now().strftime('%Y-%m-%d'):
+            self.data['revision'] += 1
+
+    def sales_added(self, sales):
+        for sale in sales:
+            self._apply(sale, 1)
+        self.save()
+
+    def sale_removed(self, sale):
+        self._apply(sale, -1)
+        self.save()
+
+    def sales_cleared(self):
+        self.data['days'] = {}
+        self.data['revision'] += 1
+        self.save()
+
+    def rebuild(self, sales_df):
+        """Recompute all daily totals from a full sales DataFrame"""
+        self.data['days'] = {}
+        if sales_df is not None and not sales_df.empty:
+            for sale in sales_df.to_dict('records'):
+                self._apply(sale, 1)
+        self.data['revision'] += 1
+        self.stale = False
+        self.save()
+
+    @property
+    def revision(self):
+        return self.data['revision']
+
+    def get_day(self, date_str):
+        """Get the totals for one date, or None if it has no sales"""
+        self.refresh()
+        return self.data['days'].get(normalize_date(date_str))
+
+    def get_daily_totals(self, start_date=None, end_date=None):
+        """Get one row of totals per date with sales, oldest first"""
+        self.refresh()
+        start = normalize_date(start_date) if start_date else None
+        end = normalize_date(end_date) if end_date else None
+        rows = []
+        for date_str in sorted(self.data['days']):
+            if (start and date_str < start) or (end and date_str > end):
+                continue
+            row = {'date': date_str}
+            row.update(self.data['days'][date_str])
+            rows.append(row)
+        return pd.DataFrame(rows, columns=['date'] + ROLLUP_COLUMNS)
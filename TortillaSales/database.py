@@ -1,6 +1,6 @@
 import os
 import logging
-from sqlalchemy import create_engine, Column, Integer, String, Float, Boolean, DateTime, text
+from sqlalchemy import create_engine, inspect, Column, Integer, String, Float, Boolean, DateTime, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
@@ -11,12 +11,36 @@ logger = logging.getLogger(__name__)
 
 # Database configuration
 DATABASE_URL = os.getenv('DATABASE_URL')
-if not DATABASE_URL:
-    raise ValueError("DATABASE_URL environment variable is not set")
 
-# Create engine
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# The engine is created on first use, so importing this module never
+# requires DATABASE_URL or opens a connection pool
+_engine = None
+_session_factory = None
+
+def get_engine():
+    """Get the shared engine, creating it on first use"""
+    global _engine
+    if _engine is None:
+        database_url = os.getenv('DATABASE_URL', DATABASE_URL)
+        if not database_url:
+            raise ValueError("DATABASE_URL environment variable is not set")
+        _engine = create_engine(database_url)
+    return _engine
+
+def get_session_factory():
+    """Get the shared session factory bound to the engine"""
+    global _session_factory
+    if _session_factory is None:
+        _session_factory = sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
+    return _session_factory
+
+def __getattr__(name):
+    # Keep `from database import engine, SessionLocal` working, lazily
+    if name == 'engine':
+        return get_engine()
+    if name == 'SessionLocal':
+        return get_session_factory()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Base class for all models
 Base = declarative_base()
@@ -40,21 +64,56 @@ class Sale(Base):
     total = Column(Float, nullable=False)
     payment = Column(Float, nullable=False)
     change = Column(Float, nullable=False)
+    customer_id = Column(String, nullable=True, index=True)
+    source_file = Column(String, nullable=True, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+class User(Base):
+    __tablename__ = "users"
+    
+    username = Column(String, primary_key=True)
+    password = Column(String, nullable=False)
+    is_admin = Column(Boolean, nullable=False, default=False)
+
+class MigrationCheckpoint(Base):
+    __tablename__ = "migration_checkpoints"
+    
+    source_file = Column(String, primary_key=True)
+    row_offset = Column(Integer, nullable=False, default=0)
+    source_revenue = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 def get_db():
     """Get database session"""
-    db = SessionLocal()
+    db = get_session_factory()()
     try:
         yield db
     finally:
         db.close()
 
+def add_missing_columns(engine, table):
+    """Add the nullable columns (and their indexes) a table created by an older version lacks.
+
+    create_all does not add columns to existing tables.
+    """
+    existing = {column['name'] for column in inspect(engine).get_columns(table.name)}
+    with engine.begin() as connection:
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=engine.dialect)
+            connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+            if column.index:
+                connection.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS ix_{table.name}_{column.name} ON {table.name} ({column.name})"))
+
 def init_database():
     """Initialize database tables"""
     try:
         # Create all tables
+        engine = get_engine()
         Base.metadata.create_all(bind=engine)
+        add_missing_columns(engine, Sale.__table__)
         logger.info("Database tables created successfully")
         return True
     except Exception as e:
@@ -64,7 +123,7 @@ def init_database():
 def test_connection():
     """Test database connection"""
     try:
-        db = SessionLocal()
+        db = get_session_factory()()
         result = db.execute(text("SELECT 1"))
         db.close()
         logger.info("Database connection test successful")
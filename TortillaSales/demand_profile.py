@@ -0,0 +1,135 @@
+import pandas as pd
+from datetime import datetime
+from utils import to_number, normalize_date, normalize_time, load_json_file, save_json_file, file_version
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+class DemandProfile:
+    """Per-day, per-time-bucket tortilla kg and sale counts.
+
+    Totals are kept per date so any date range can be answered by summing
+    the stored buckets instead of re-reading the sales file.
+    """
+
+    def __init__(self, username="default", bucket_minutes=15):
+        self.username = username
+        self.bucket_minutes = bucket_minutes
+        self.profile_file = f"demand_profile_{username}.json"
+        self.loaded_version = file_version(self.profile_file)
+        self.data = load_json_file(self.profile_file, None)
+        if self.data is None or self.data.get('bucket_minutes') != bucket_minutes:
+            self.data = {'bucket_minutes': bucket_minutes, 'days': {}}
+            self.stale = True
+        else:
+            self.stale = False
+
+    def refresh(self):
+        """Reload the saved state if another SalesManager changed it"""
+        version = file_version(self.profile_file)
+        if version is None or version == self.loaded_version:
+            return
+        data = load_json_file(self.profile_file, None)
+        if data is not None:
+            self.data = data
+            self.loaded_version = version
+
+    def needs_rebuild(self):
+        return self.stale
+
+    def save(self):
+        saved = save_json_file(self.profile_file, self.data)
+        self.loaded_version = file_version(self.profile_file)
+        return saved
+
+    def _bucket(self, time_value):
+        """Map a 'HH:MM:SS' time to its bucket number within the day"""
+        try:
+            hour, minute = normalize_time(time_value).split(':')[:2]
+            return (int(hour) * 60 + int(minute)) // self.bucket_minutes
+        except (ValueError, TypeError):
+            return None
+
+    def _apply(self, sale, sign):
+        bucket = self._bucket(sale.get('time'))
+        if bucket is None:
+            return
+        date_str = normalize_date(sale.get('date'))
+        day = self.data['days'].setdefault(date_str, {})
+        kg, count = day.get(str(bucket), [0.0, 0])
+        kg += sign * to_number(sale.get('tortilla_qty', 0))
+        count += sign
+        if count <= 0:
+            day.pop(str(bucket), None)
+            if not day:
+                self.data['days'].pop(date_str, None)
+        else:
+            day[str(bucket)] = [round(kg, 3), count]
+
+    def sales_added(self, sales):
+        """Count newly registered sales"""
+        for sale in sales:
+            self._apply(sale, 1)
+        self.save()
+
+    def sale_removed(self, sale):
+        """Take a deleted sale back out of its bucket"""
+        self._apply(sale, -1)
+        self.save()
+
+    def sales_cleared(self):
+        self.data['days'] = {}
+        self.save()
+
+    def rebuild(self, sales_df):
+        """Recompute the profile from a full sales DataFrame"""
+        self.data['days'] = {}
+        if sales_df is not None and not sales_df.empty:
+            for sale in sales_df.to_dict('records'):
+                self._apply(sale, 1)
+        self.stale = False
+        self.save()
+
+    def bucket_label(self, bucket):
+        minutes = bucket * self.bucket_minutes
+        return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+    def get_profile(self, start_date=None, end_date=None, hourly=False):
+        """Get weekday x time-bucket totals for a date range.
+
+        Returns a long DataFrame with columns weekday, bucket, kg, sales and
+        days (number of dates of that weekday in the range with any sales).
+        """
+        self.refresh()
+        start = normalize_date(start_date) if start_date else None
+        end = normalize_date(end_date) if end_date else None
+
+        totals = {}
+        weekday_dates = {}
+        for date_str, day in self.data['days'].items():
+            if (start and date_str < start) or (end and date_str > end):
+                continue
+            try:
+                weekday = datetime.strptime(date_str, '%Y-%m-%d').weekday()
+            except ValueError:
+                continue
+            weekday_dates.setdefault(weekday, set()).add(date_str)
+            for bucket, (kg, count) in day.items():
+                bucket = int(bucket)
+                if hourly:
+                    bucket = bucket * self.bucket_minutes // 60
+                key = (weekday, bucket)
+                current = totals.get(key, [0.0, 0])
+                current[0] += kg
+                current[1] += count
+                totals[key] = current
+
+        rows = []
+        for (weekday, bucket), (kg, count) in sorted(totals.items()):
+            rows.append({
+                'weekday': WEEKDAYS[weekday],
+                'bucket': f"{bucket:02d}:00" if hourly else self.bucket_label(bucket),
+                'kg': round(kg, 3),
+                'sales': count,
+                'days': len(weekday_dates[weekday])
+            })
+        return pd.DataFrame(rows, columns=['weekday', 'bucket', 'kg', 'sales', 'days'])
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+def largest_triangle_three_buckets(x, y, threshold):
+    """Pick the indices of at most threshold points that keep a line's shape.
+
+    Largest-Triangle-Three-Buckets: the first and last points are kept, the
+    rest are split into equal buckets and from each bucket the point forming
+    the largest triangle with the previously kept point and the average of
+    the next bucket is chosen. Peaks and dips survive, flat runs collapse.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (threshold - 2)
+    selected = np.empty(threshold, dtype=int)
+    selected[0] = 0
+    a = 0
+    for i in range(threshold - 2):
+        # Average point of the next bucket
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[avg_start:avg_end].mean()
+        avg_y = y[avg_start:avg_end].mean()
+
+        # Candidates in this bucket
+        range_start = int(i * every) + 1
+        range_end = int((i + 1) * every) + 1
+        areas = np.abs(
+            (x[a] - avg_x) * (y[range_start:range_end] - y[a])
+            - (x[a] - x[range_start:range_end]) * (avg_y - y[a])
+        )
+        a = range_start + int(np.argmax(areas))
+        selected[i + 1] = a
+    selected[-1] = n - 1
+    return selected
+
+def downsample_series(series, max_points):
+    """Downsample a date-indexed Series to at most max_points with LTTB"""
+    if len(series) <= max_points:
+        return series
+    x = pd.to_datetime(series.index).map(pd.Timestamp.toordinal)
+    indices = largest_triangle_three_buckets(x, series.values, max_points)
+    return series.iloc[indices]
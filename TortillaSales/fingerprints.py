@@ -0,0 +1,182 @@
+import hashlib
+import os
+from utils import to_number, normalize_date, normalize_time, temp_path_for
+from schema import QUANTITY_COLUMNS
+
+FINGERPRINT_QUANTITIES = QUANTITY_COLUMNS
+
+def sale_identity(sale):
+    """Key of the moment a sale was made: date, time and cashier"""
+    return f"{normalize_date(sale.get('date'))}|{normalize_time(sale.get('time'))}|{str(sale.get('username', '')).strip()}"
+
+def sale_fingerprint(sale):
+    """Content hash of a sale: when, who, quantities and total"""
+    parts = [sale_identity(sale)]
+    parts += [f"{to_number(sale.get(column, 0)):.3f}" for column in FINGERPRINT_QUANTITIES]
+    parts.append(f"{to_number(sale.get('total', 0)):.2f}")
+    return hashlib.sha256("|".join(parts).encode('utf-8')).hexdigest()[:32]
+
+DIGEST_MODULUS = 2 ** 128
+
+def day_digest(fingerprints):
+    """Order-independent digest of a day's sales: the sum of their fingerprints.
+
+    Adding and removing a sale are just + and - its fingerprint, so the
+    digest can be kept current per change; equal digests mean the same sales.
+    """
+    return format(sum(int(fingerprint, 16) for fingerprint in fingerprints) % DIGEST_MODULUS, '032x')
+
+class FingerprintIndex:
+    """Persistent hash index of every stored sale's fingerprint.
+
+    The index lives in an append-only log next to the sales file: one
+    "+fingerprint identity" or "-fingerprint identity" line per change, so
+    keeping it current costs one small append per sale. Other processes'
+    appends are picked up by reading only the new tail of the log.
+    """
+
+    def __init__(self, username="default"):
+        self.username = username
+        self.index_file = f"fingerprints_{username}.log"
+        self.stale = not os.path.exists(self.index_file)
+        self._reset_memory()
+        if not self.stale:
+            self._read_log()
+
+    def _reset_memory(self):
+        self.fingerprints = {}
+        self.identities = {}
+        self.day_sums = {}
+        self.log_inode = None
+        self.log_offset = 0
+
+    def _apply_line(self, line):
+        parts = line.split(' ', 1)
+        if len(parts) != 2 or parts[0][:1] not in ('+', '-'):
+            return
+        sign = 1 if parts[0][0] == '+' else -1
+        fingerprint, identity = parts[0][1:], parts[1]
+        day = identity[:10]
+        day_sum = (self.day_sums.get(day, 0) + sign * int(fingerprint, 16)) % DIGEST_MODULUS
+        if day_sum:
+            self.day_sums[day] = day_sum
+        else:
+            self.day_sums.pop(day, None)
+        for counts, key in ((self.fingerprints, fingerprint), (self.identities, identity)):
+            count = counts.get(key, 0) + sign
+            if count > 0:
+                counts[key] = count
+            else:
+                counts.pop(key, None)
+
+    def _read_log(self):
+        """Apply log lines written since the last read"""
+        try:
+            stat = os.stat(self.index_file)
+        except OSError:
+            return
+        if stat.st_ino != self.log_inode or stat.st_size < self.log_offset:
+            self._reset_memory()
+            self.log_inode = stat.st_ino
+        if stat.st_size == self.log_offset:
+            return
+        with open(self.index_file, 'rb') as f:
+            f.seek(self.log_offset)
+            data = f.read()
+        # Leave a partially written last line for the next read
+        complete = data.rfind(b"\n") + 1
+        for line in data[:complete].decode('utf-8').splitlines():
+            self._apply_line(line)
+        self.log_offset += complete
+
+    def refresh(self):
+        self._read_log()
+
+    def needs_rebuild(self):
+        return self.stale
+
+    def _append(self, lines):
+        with open(self.index_file, 'a', encoding='utf-8') as f:
+            f.write("".join(line + "\n" for line in lines))
+        self._read_log()
+
+    def sales_added(self, sales):
+        self._append([f"+{sale_fingerprint(sale)} {sale_identity(sale)}" for sale in sales])
+
+    def sale_removed(self, sale):
+        self._append([f"-{sale_fingerprint(sale)} {sale_identity(sale)}"])
+
+    def sales_cleared(self):
+        self.rebuild(None)
+
+    def rebuild(self, sales_df):
+        """Rewrite the log from a full sales DataFrame (also compacts it)"""
+        lines = []
+        if sales_df is not None and not sales_df.empty:
+            lines = [f"+{sale_fingerprint(sale)} {sale_identity(sale)}" for sale in sales_df.to_dict('records')]
+        temp_file = temp_path_for(self.index_file)
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            f.write("".join(line + "\n" for line in lines))
+        os.replace(temp_file, self.index_file)
+        self._reset_memory()
+        self._read_log()
+        self.stale = False
+
+    def compact(self):
+        """Rewrite the log with one line per stored sale, dropping add/remove pairs"""
+        self.refresh()
+        lines = []
+        remaining = dict(self.fingerprints)
+        # The identity is part of the fingerprint, so keeping one "+" line per
+        # live fingerprint count reproduces both maps exactly
+        for line in self._iter_log_lines():
+            fingerprint = line[1:].split(' ', 1)[0]
+            if line[:1] == '+' and remaining.get(fingerprint, 0) > 0:
+                lines.append(line)
+                remaining[fingerprint] -= 1
+        temp_file = temp_path_for(self.index_file)
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            f.write("".join(line + "\n" for line in lines))
+        os.replace(temp_file, self.index_file)
+        self._reset_memory()
+        self._read_log()
+        return len(lines)
+
+    def _iter_log_lines(self):
+        with open(self.index_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.rstrip("\n")
+                if line:
+                    yield line
+
+    def day_digests(self):
+        """Digest of every day's stored sales, as {date: hex digest}"""
+        self.refresh()
+        return {day: format(day_sum, '032x') for day, day_sum in self.day_sums.items()}
+
+    def contains(self, sale):
+        return sale_fingerprint(sale) in self.fingerprints
+
+    def classify(self, sales):
+        """Split sales into new, duplicate and conflicting, in O(1) per sale.
+
+        A duplicate has the same fingerprint as a stored sale (or an earlier
+        sale in the same batch). A conflict has the same date, time and
+        cashier as a stored sale but different quantities or total.
+        """
+        self.refresh()
+        result = {'new': [], 'duplicate': [], 'conflicting': []}
+        seen_fingerprints = set()
+        seen_identities = set()
+        for sale in sales:
+            fingerprint = sale_fingerprint(sale)
+            identity = sale_identity(sale)
+            if fingerprint in self.fingerprints or fingerprint in seen_fingerprints:
+                result['duplicate'].append(sale)
+            elif identity in self.identities or identity in seen_identities:
+                result['conflicting'].append(sale)
+            else:
+                result['new'].append(sale)
+            seen_fingerprints.add(fingerprint)
+            seen_identities.add(identity)
+        return result
@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta
+from daily_rollup import PRODUCT_COLUMNS
+from utils import load_json_file, save_json_file
+
+FORECAST_METRICS = ['sales'] + PRODUCT_COLUMNS
+
+class DemandForecaster:
+    """Per-weekday demand forecast fitted on closed days of the daily rollup.
+
+    For each weekday and metric it keeps an exponentially smoothed level and
+    the last few observed values (for a rolling mean). The fitted state is
+    saved, so each page load only folds in the days that closed since the
+    last fit. A change to an already-fitted day (delete, backdated import)
+    bumps the rollup revision and triggers a refit from the daily totals.
+    """
+
+    def __init__(self, username="default", alpha=0.3, window=4):
+        self.username = username
+        self.alpha = alpha
+        self.window = window
+        self.state_file = f"forecast_state_{username}.json"
+        self.state = load_json_file(self.state_file, None)
+        if (self.state is None or self.state.get('alpha') != alpha
+                or self.state.get('window') != window):
+            self.state = self._empty_state()
+
+    def _empty_state(self):
+        return {
+            'alpha': self.alpha,
+            'window': self.window,
+            'fitted_through': None,
+            'revision': None,
+            'weekdays': {}
+        }
+
+    def _observe(self, date_str, day):
+        weekday = str(datetime.strptime(date_str, '%Y-%m-%d').weekday())
+        metrics = self.state['weekdays'].setdefault(weekday, {})
+        for metric in FORECAST_METRICS:
+            value = float(day.get(metric, 0))
+            entry = metrics.get(metric)
+            if entry is None:
+                entry = {'level': value, 'recent': []}
+            else:
+                entry['level'] = self.alpha * value + (1 - self.alpha) * entry['level']
+            entry['recent'] = (entry['recent'] + [value])[-self.window:]
+            metrics[metric] = entry
+
+    def update(self, rollup, today=None):
+        """Fold every day closed since the last fit into the state.
+
+        Returns the number of days processed.
+        """
+        today = (today or datetime.now()).strftime('%Y-%m-%d')
+        if self.state['revision'] is not None and self.state['revision'] != rollup.revision:
+            self.state = self._empty_state()
+
+        fitted_through = self.state['fitted_through']
+        new_days = [
+            date_str for date_str in rollup.data['days']
+            if date_str < today and (fitted_through is None or date_str > fitted_through)
+        ]
+        for date_str in sorted(new_days):
+            self._observe(date_str, rollup.data['days'][date_str])
+            self.state['fitted_through'] = date_str
+
+        if new_days or self.state['revision'] != rollup.revision:
+            self.state['revision'] = rollup.revision
+            save_json_file(self.state_file, self.state)
+        return len(new_days)
+
+    def predict(self, target_date, method='smoothing'):
+        """Predict each metric for a date from its weekday's fitted state"""
+        metrics = self.state['weekdays'].get(str(target_date.weekday()), {})
+        prediction = {}
+        for metric in FORECAST_METRICS:
+            entry = metrics.get(metric)
+            if entry is None:
+                prediction[metric] = 0.0
+            elif method == 'rolling':
+                prediction[metric] = sum(entry['recent']) / len(entry['recent'])
+            else:
+                prediction[metric] = entry['level']
+        return prediction
+
+    def forecast(self, start_date, days=7, method='smoothing'):
+        """Get predictions for consecutive days starting at start_date"""
+        rows = []
+        for offset in range(days):
+            target = start_date + timedelta(days=offset)
+            row = {'date': target.strftime('%Y-%m-%d'), 'day': target.strftime('%A')}
+            row.update({metric: round(value, 2) for metric, value in self.predict(target, method).items()})
+            rows.append(row)
+        return rows
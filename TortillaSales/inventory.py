@@ -0,0 +1,286 @@
+import json
+import os
+import threading
+from collections import Counter
+from datetime import datetime
+from utils import to_number, normalize_date, normalize_time, load_json_file, save_json_file, locked_file
+
+# Same product names as the Register Sale cart, mapped to their sales columns
+INVENTORY_PRODUCTS = {
+    'Tortilla': 'tortilla_qty',
+    'Totopos': 'totopos_qty',
+    'Cacahuates': 'cacahuates_qty',
+    'Mix': 'mix_qty',
+    'Salted Chips': 'salted_chips_qty',
+    'Special': 'special_qty'
+}
+
+PRODUCT_UNITS = {product: ('kg' if product == 'Tortilla' else 'units') for product in INVENTORY_PRODUCTS}
+
+# Stock is shared by every cashier, so all ledgers in this process share one lock
+_ledger_lock = threading.RLock()
+
+class InventoryLedger:
+    """Stock levels for the whole shop, kept as running counters.
+
+    Every movement (stock received, sale, deleted sale, physical count) is
+    one line in the append-only inventory.log, written with a single fsynced
+    append so a sale's decrements land together or not at all. The counters
+    are the sum of the log; a snapshot in inventory.json records the levels
+    and how much of the log they cover, so startup only replays the tail.
+
+    Low-stock thresholds are log entries too, so every ledger sees them.
+    Sales made before the first stock movement are ignored, so importing
+    old workbooks does not drain the stock.
+
+    A failed write raises. When the movements of stored sales could not be
+    logged, the cashier is listed in inventory_unsynced.json; that cashier's
+    next SalesManager sees needs_rebuild() and rebuild() logs what is missing.
+    """
+
+    def __init__(self, log_file="inventory.log", snapshot_file="inventory.json",
+                 unsynced_file="inventory_unsynced.json", username=None):
+        self.log_file = log_file
+        self.snapshot_file = snapshot_file
+        self.unsynced_file = unsynced_file
+        # Whose sales this ledger is notified of; only used for repairs
+        self.username = username
+        snapshot = load_json_file(self.snapshot_file, {})
+        self._reset_memory()
+        if self._snapshot_matches_log(snapshot):
+            self.levels.update(snapshot['levels'])
+            self.thresholds.update(snapshot['thresholds'])
+            self.started_at = snapshot['started_at']
+            self.log_inode = snapshot['log_inode']
+            self.log_offset = snapshot['log_offset']
+        self._read_log()
+
+    def _reset_memory(self):
+        self.levels = {product: 0.0 for product in INVENTORY_PRODUCTS}
+        self.thresholds = {}
+        self.started_at = None
+        self.log_inode = None
+        self.log_offset = 0
+
+    def _snapshot_matches_log(self, snapshot):
+        try:
+            stat = os.stat(self.log_file)
+        except OSError:
+            return False
+        return (snapshot.get('log_inode') == stat.st_ino
+                and snapshot.get('log_offset', 0) <= stat.st_size
+                and 'levels' in snapshot)
+
+    def _apply_entry(self, entry):
+        if entry['op'] == 'threshold':
+            self.thresholds.update(entry['thresholds'])
+            return
+        if self.started_at is None:
+            self.started_at = entry['at']
+        if entry['op'] == 'count':
+            self.levels.update(entry['levels'])
+        else:
+            for product, delta in entry['deltas'].items():
+                self.levels[product] = self.levels.get(product, 0.0) + delta
+
+    def _read_log(self):
+        """Apply log entries written since the last read"""
+        try:
+            stat = os.stat(self.log_file)
+        except OSError:
+            return
+        if stat.st_ino != self.log_inode or stat.st_size < self.log_offset:
+            self._reset_memory()
+            self.log_inode = stat.st_ino
+        if stat.st_size == self.log_offset:
+            return
+        with open(self.log_file, 'rb') as f:
+            f.seek(self.log_offset)
+            data = f.read()
+        # Leave a partially written last line for the next read
+        complete = data.rfind(b"\n") + 1
+        for line in data[:complete].decode('utf-8').splitlines():
+            try:
+                self._apply_entry(json.loads(line))
+            except (ValueError, KeyError):
+                # A line torn by a crash; its movement never completed
+                continue
+        self.log_offset += complete
+
+    def refresh(self):
+        with _ledger_lock:
+            self._read_log()
+
+    def save(self):
+        return save_json_file(self.snapshot_file, {
+            'levels': self.levels,
+            'started_at': self.started_at,
+            'log_inode': self.log_inode,
+            'log_offset': self.log_offset,
+            'thresholds': self.thresholds
+        })
+
+    def _append(self, *entries):
+        """Durably record movements and apply them to the counters; raises OSError if the log cannot be written"""
+        with _ledger_lock:
+            # Catch up with other ledgers first so our offset stays exact
+            self._read_log()
+            with open(self.log_file, 'a+b') as f:
+                f.seek(0, os.SEEK_END)
+                prefix = b""
+                if f.tell() > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        prefix = b"\n"
+                f.write(prefix + "".join(json.dumps(entry) + "\n" for entry in entries).encode('utf-8'))
+                f.flush()
+                os.fsync(f.fileno())
+            self._read_log()
+            self.save()
+            return True
+
+    def _entry(self, op, user="", note="", **fields):
+        entry = {'at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'op': op, 'user': user, 'note': note}
+        entry.update(fields)
+        return entry
+
+    def receive(self, product, quantity, user="", note=""):
+        """Record stock received for a product"""
+        if product not in INVENTORY_PRODUCTS or to_number(quantity) <= 0:
+            return False
+        return self._append(self._entry('receipt', user, note, deltas={product: to_number(quantity)}))
+
+    def count(self, levels, user="", note=""):
+        """Set products to physically counted levels"""
+        levels = {product: to_number(qty) for product, qty in levels.items() if product in INVENTORY_PRODUCTS}
+        if not levels:
+            return False
+        return self._append(self._entry('count', user, note, levels=levels))
+
+    def _sale_deltas(self, sale, sign):
+        deltas = {}
+        for product, column in INVENTORY_PRODUCTS.items():
+            quantity = to_number(sale.get(column, 0))
+            if quantity:
+                deltas[product] = sign * quantity
+        return deltas
+
+    def _tracked(self, sale):
+        if self.started_at is None:
+            return False
+        return f"{normalize_date(sale.get('date'))} {normalize_time(sale.get('time'))}" >= self.started_at
+
+    def _sale_entry(self, op, sale, sign):
+        deltas = self._sale_deltas(sale, sign)
+        if not deltas:
+            return None
+        return self._entry(op, str(sale.get('username', '')),
+                           f"{normalize_date(sale.get('date'))} {normalize_time(sale.get('time'))}", deltas=deltas)
+
+    def _record_sales(self, entries):
+        """Log movements of sales already stored; on failure list the cashier for repair and re-raise"""
+        try:
+            self._append(*entries)
+        except Exception:
+            self._set_unsynced(True)
+            raise
+
+    def sales_added(self, sales):
+        # One line per sale, all written by one append for the whole batch
+        entries = [self._sale_entry('sale', sale, -1) for sale in sales if self._tracked(sale)]
+        entries = [entry for entry in entries if entry is not None]
+        if entries:
+            self._record_sales(entries)
+
+    def sale_removed(self, sale):
+        # A deleted sale record puts its products back on the shelf
+        if self._tracked(sale):
+            entry = self._sale_entry('return', sale, 1)
+            if entry is not None:
+                self._record_sales([entry])
+
+    def _set_unsynced(self, unsynced):
+        with _ledger_lock, locked_file(f"{self.unsynced_file}.lock"):
+            users = set(load_json_file(self.unsynced_file, {}).get('users', []))
+            if unsynced:
+                users.add(self.username)
+            else:
+                users.discard(self.username)
+            if not save_json_file(self.unsynced_file, {'users': sorted(users, key=str)}):
+                raise OSError(f"Could not write {self.unsynced_file}")
+
+    def needs_rebuild(self):
+        """True if movements of this cashier's stored sales failed to reach the log"""
+        return self.username in load_json_file(self.unsynced_file, {}).get('users', [])
+
+    def rebuild(self, sales):
+        """Log the movement of every tracked sale the log is missing.
+
+        sales is every sale of this ledger's cashier. The log stays
+        append-only: a sale counts as logged while its 'sale' entries
+        outnumber its 'return' entries, and only the shortfall is written,
+        so running the repair twice changes nothing.
+        """
+        sales = sales.to_dict('records') if hasattr(sales, 'to_dict') else list(sales)
+        with _ledger_lock:
+            self._read_log()
+            logged = Counter()
+            if os.path.exists(self.log_file):
+                with open(self.log_file, 'r', encoding='utf-8', errors='ignore') as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            continue
+                        if entry.get('op') in ('sale', 'return'):
+                            logged[(entry['user'], entry['note'])] += 1 if entry['op'] == 'sale' else -1
+            missing = []
+            for sale in sales:
+                entry = self._sale_entry('sale', sale, -1) if self._tracked(sale) else None
+                if entry is None:
+                    continue
+                key = (entry['user'], entry['note'])
+                if logged[key] > 0:
+                    logged[key] -= 1
+                else:
+                    entry['repaired'] = True
+                    missing.append(entry)
+            if missing:
+                self._append(*missing)
+        self._set_unsynced(False)
+
+    def sales_cleared(self):
+        # Deleting the sales history does not change what is on the shelf
+        pass
+
+    def set_threshold(self, product, quantity):
+        """Set the level at or below which a product is reported as low"""
+        if product not in INVENTORY_PRODUCTS:
+            return False
+        return self._append(self._entry('threshold', thresholds={product: to_number(quantity)}))
+
+    def low_stock(self):
+        """Products at or below their threshold, with level and threshold"""
+        return {
+            product: {'level': self.levels.get(product, 0.0), 'threshold': threshold}
+            for product, threshold in self.thresholds.items()
+            if threshold > 0 and self.levels.get(product, 0.0) <= threshold
+        }
+
+    def recent_movements(self, limit=20, max_bytes=65536):
+        """Newest movements from the tail of the log"""
+        if not os.path.exists(self.log_file):
+            return []
+        with open(self.log_file, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            f.seek(max(0, size - max_bytes))
+            data = f.read()
+        movements = []
+        for line in data.decode('utf-8', errors='ignore').splitlines():
+            try:
+                movements.append(json.loads(line))
+            except ValueError:
+                continue
+        movements.reverse()
+        return movements[:limit]
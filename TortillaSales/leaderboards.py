@@ -0,0 +1,203 @@
+import heapq
+from itertools import groupby
+from utils import to_number, normalize_date, normalize_time, load_json_file, save_json_file, file_version
+
+# Longest leaderboard that can be asked for; each day keeps this many of its largest sales
+LEADERBOARD_SIZE = 10
+
+def _in_period(date_str, start, end):
+    return (not start or date_str >= start) and (not end or date_str <= end)
+
+class TopSales:
+    """Each day's largest sales by total, kept next to the sales file.
+
+    Only LEADERBOARD_SIZE sales per day are stored, so the largest sales of
+    any period are a bounded-heap merge of a few short lists. Deleting one
+    of a full day's stored sales marks the day for repair, since the next
+    largest sale of that day is not known; repair() reads only that day.
+    """
+
+    def __init__(self, username="default", size=LEADERBOARD_SIZE):
+        self.username = username
+        self.size = size
+        self.top_file = f"top_sales_{username}.json"
+        self.loaded_version = file_version(self.top_file)
+        self.data = load_json_file(self.top_file, None)
+        self.stale = self.data is None or self.data.get('size') != size
+        if self.stale:
+            self.data = {'size': size, 'days': {}, 'dirty': []}
+
+    def refresh(self):
+        """Reload the saved state if another SalesManager changed it"""
+        version = file_version(self.top_file)
+        if version is None or version == self.loaded_version:
+            return
+        data = load_json_file(self.top_file, None)
+        if data is not None:
+            self.data = data
+            self.loaded_version = version
+
+    def needs_rebuild(self):
+        return self.stale
+
+    def save(self):
+        saved = save_json_file(self.top_file, self.data)
+        self.loaded_version = file_version(self.top_file)
+        return saved
+
+    def _entry(self, sale):
+        return [round(to_number(sale.get('total', 0)), 2), normalize_time(sale.get('time')),
+                str(sale.get('username', '')), to_number(sale.get('tortilla_qty', 0))]
+
+    def _add(self, sale):
+        date_str = normalize_date(sale.get('date'))
+        day = self.data['days'].setdefault(date_str, [])
+        entry = self._entry(sale)
+        if len(day) < self.size:
+            day.append(entry)
+        elif entry[0] > day[-1][0]:
+            day[-1] = entry
+        else:
+            return
+        day.sort(key=lambda item: item[0], reverse=True)
+
+    def sales_added(self, sales):
+        for sale in sales:
+            self._add(sale)
+        self.save()
+
+    def sale_removed(self, sale):
+        date_str = normalize_date(sale.get('date'))
+        day = self.data['days'].get(date_str, [])
+        entry = self._entry(sale)
+        if entry in day:
+            # A full list may now be missing the day's next largest sale
+            if len(day) == self.size and date_str not in self.data['dirty']:
+                self.data['dirty'].append(date_str)
+            day.remove(entry)
+            if not day:
+                del self.data['days'][date_str]
+            self.save()
+
+    def sales_cleared(self):
+        self.data['days'] = {}
+        self.data['dirty'] = []
+        self.save()
+
+    def rebuild(self, sales_df):
+        """Recompute every day's largest sales from a full sales DataFrame"""
+        self.data['days'] = {}
+        self.data['dirty'] = []
+        if sales_df is not None and not sales_df.empty:
+            for sale in sales_df.to_dict('records'):
+                self._add(sale)
+        self.stale = False
+        self.save()
+
+    def dirty_days(self):
+        self.refresh()
+        return list(self.data['dirty'])
+
+    def repair(self, date_str, day_sales_df):
+        """Recompute one day's list from that day's sales"""
+        self.data['days'].pop(date_str, None)
+        if day_sales_df is not None and not day_sales_df.empty:
+            for sale in day_sales_df.to_dict('records'):
+                self._add(sale)
+        if date_str in self.data['dirty']:
+            self.data['dirty'].remove(date_str)
+        self.save()
+
+    def iter_sales(self, start=None, end=None):
+        """(total, date, time, username, kg) for each stored sale in the period"""
+        self.refresh()
+        for date_str, day in self.data['days'].items():
+            if _in_period(date_str, start, end):
+                for total, time_str, username, kg in day:
+                    yield total, date_str, time_str, username, kg
+
+def _daily_stream(rollup, start, end):
+    """(date, revenue, sales) per day of one cashier's rollup, in date order"""
+    rollup.refresh()
+    for date_str in sorted(rollup.data['days']):
+        if _in_period(date_str, start, end):
+            day = rollup.data['days'][date_str]
+            yield date_str, day['total'], day['sales']
+
+def _hourly_stream(profile, start, end):
+    """((date, hour), sales, kg) per hour with sales in one cashier's demand profile, in order"""
+    profile.refresh()
+    for date_str in sorted(profile.data['days']):
+        if not _in_period(date_str, start, end):
+            continue
+        hours = {}
+        for bucket, (kg, count) in profile.data['days'][date_str].items():
+            hour = int(bucket) * profile.bucket_minutes // 60
+            current = hours.setdefault(hour, [0, 0.0])
+            current[0] += count
+            current[1] += kg
+        for hour in sorted(hours):
+            yield (date_str, hour), hours[hour][0], hours[hour][1]
+
+def _grouped(merged):
+    for key, group in groupby(merged, key=lambda item: item[0]):
+        yield key, list(group)
+
+def best_days(rollups, start=None, end=None, n=LEADERBOARD_SIZE):
+    """Days with the highest revenue across all cashiers, best first.
+
+    Each cashier's days are streamed in date order and merged, and
+    heapq.nlargest keeps only the n best, so memory is one day per cashier
+    plus the leaderboard however long the history is.
+    """
+    merged = heapq.merge(*(_daily_stream(rollup, start, end) for rollup in rollups))
+    days = ((round(sum(item[1] for item in group), 2), date_str, sum(item[2] for item in group))
+            for date_str, group in _grouped(merged))
+    return [{'date': date_str, 'revenue': revenue, 'sales': sales}
+            for revenue, date_str, sales in heapq.nlargest(n, days)]
+
+def busiest_hours(profiles, start=None, end=None, n=LEADERBOARD_SIZE):
+    """Single hours (date and hour) with the most sales across all cashiers"""
+    merged = heapq.merge(*(_hourly_stream(profile, start, end) for profile in profiles))
+    hours = ((sum(item[1] for item in group), round(sum(item[2] for item in group), 3), key)
+             for key, group in _grouped(merged))
+    return [{'date': date_str, 'hour': f"{hour:02d}:00", 'sales': sales, 'kg': kg}
+            for sales, kg, (date_str, hour) in heapq.nlargest(n, hours)]
+
+def top_cashiers(rollups, start=None, end=None, n=LEADERBOARD_SIZE):
+    """Cashiers ranked by tortilla kg sold in the period"""
+    totals = []
+    for rollup in rollups:
+        kg = 0.0
+        sales = 0
+        for date_str, day in rollup.data['days'].items():
+            if _in_period(date_str, start, end):
+                kg += day['tortilla_qty']
+                sales += day['sales']
+        if sales:
+            totals.append((round(kg, 3), sales, rollup.username))
+    top = heapq.nlargest(n, totals)
+    return [{'username': username, 'kg': kg, 'sales': sales} for kg, sales, username in top]
+
+def largest_sales(top_sales, start=None, end=None, n=LEADERBOARD_SIZE):
+    """The n largest single sales in the period across all cashiers"""
+    top = heapq.nlargest(n, (sale for tracker in top_sales for sale in tracker.iter_sales(start, end)))
+    return [{'date': date_str, 'time': time_str, 'username': username, 'total': total, 'kg': kg}
+            for total, date_str, time_str, username, kg in top]
+
+def leaderboards(managers, start_date=None, end_date=None, n=LEADERBOARD_SIZE):
+    """All four rankings for a period, from the managers' running aggregates"""
+    start = normalize_date(start_date) if start_date else None
+    end = normalize_date(end_date) if end_date else None
+    n = min(n, LEADERBOARD_SIZE)
+    for manager in managers:
+        manager.repair_top_sales()
+    rollups = [manager.daily_rollup for manager in managers]
+    for rollup in rollups:
+        rollup.refresh()
+    return {
+        'best_days': best_days(rollups, start, end, n),
+        'busiest_hours': busiest_hours([manager.demand_profile for manager in managers], start, end, n),
+        'top_cashiers': top_cashiers(rollups, start, end, n),
+        'largest_sales': largest_sales([manager.top_sales for manager in managers], start, end, n)
+    }
@@ -0,0 +1,289 @@
+"""Load test: many cashiers registering sales at once, with readers alongside.
+
+Usage:
+    python loadtest.py [--cashiers 4] [--sales 50] [--rate 5] [--mode thread|process]
+                       [--backend direct|outbox|store] [--readers 2] [--users 1] [--data-dir DIR] [--json]
+
+Each cashier registers --sales sales with exponentially distributed gaps
+averaging 1/--rate seconds, through the chosen backend:
+    direct  SalesManager.add_sale (one workbook rewrite per sale)
+    outbox  SaleOutbox.append, moved into the workbook by the flusher
+    store   StoreClient.add_sale against a store server started for the run
+
+Readers call get_daily_sales and get_all_sales in a loop while the cashiers
+run (through StoreClients with the store backend). Every generated sale has
+its own date and time, so afterwards the stored sales are reconciled against
+the generated ones to count lost and duplicated sales. Runs in a fresh
+temporary directory unless --data-dir is given; never point it at the real
+sales files.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from utils import PRODUCT_PRICES, tortilla_price
+
+BASE_DATE = datetime(2000, 1, 1)
+
+def generated_sale(sale_id, username):
+    """A sale whose date and time are unique to sale_id"""
+    moment = BASE_DATE + timedelta(seconds=sale_id)
+    tortilla_qty = random.choice([0.5, 1.0, 1.5, 2.0])
+    totopos_qty = random.randint(0, 2)
+    total = tortilla_qty * tortilla_price() + totopos_qty * PRODUCT_PRICES['Totopos']
+    return {
+        'date': moment.strftime('%Y-%m-%d'),
+        'time': moment.strftime('%H:%M:%S'),
+        'username': username,
+        'tortilla_qty': tortilla_qty,
+        'totopos_qty': totopos_qty,
+        'cacahuates_qty': 0,
+        'mix_qty': 0,
+        'salted_chips_qty': 0,
+        'special_qty': 0,
+        'special_price': 0.0,
+        'frequent_customer': False,
+        'supplier': False,
+        'total': total,
+        'payment': 100.0,
+        'change': 100.0 - total
+    }
+
+class DirectBackend:
+    def __init__(self, username):
+        from sales_manager import SalesManager
+        self.manager = SalesManager(username)
+
+    def add_sale(self, sale):
+        return self.manager.add_sale(sale)
+
+    def finish(self):
+        pass
+
+class OutboxBackend:
+    def __init__(self, username):
+        from sales_manager import SalesManager
+        from sale_outbox import get_sale_outbox
+        self.outbox = get_sale_outbox(username, SalesManager)
+
+    def add_sale(self, sale):
+        return self.outbox.append(sale)
+
+    def finish(self):
+        # Drain everything this process queued before reporting
+        while self.outbox.pending_count():
+            self.outbox.flush()
+        self.outbox.flush()
+
+class StoreBackend:
+    def __init__(self, username):
+        from store_server import StoreClient
+        self.manager = StoreClient(username, STORE_SOCKET)
+
+    def add_sale(self, sale):
+        return self.manager.add_sale(sale)
+
+    def finish(self):
+        pass
+
+BACKENDS = {
+    'direct': DirectBackend,
+    'outbox': OutboxBackend,
+    'store': StoreBackend
+}
+
+# Socket of the store server run_load_test starts for the store backend
+STORE_SOCKET = "loadtest_store.sock"
+
+def percentile(values, pct):
+    """Nearest-rank percentile in milliseconds, or None without values"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank] * 1000
+
+def run_cashier(backend_name, username, sale_ids, rate, seed):
+    """Register the given sales at the arrival rate; returns (latencies, failures)"""
+    random.seed(seed)
+    backend = BACKENDS[backend_name](username)
+    latencies = []
+    failures = 0
+    next_arrival = time.perf_counter()
+    for sale_id in sale_ids:
+        next_arrival += random.expovariate(rate) if rate > 0 else 0
+        delay = next_arrival - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        sale = generated_sale(sale_id, username)
+        started = time.perf_counter()
+        try:
+            ok = backend.add_sale(sale)
+        except Exception as e:
+            print(f"Error registering sale {sale_id}: {e}")
+            ok = False
+        latencies.append(time.perf_counter() - started)
+        if not ok:
+            failures += 1
+    backend.finish()
+    return latencies, failures
+
+def _process_cashier(data_dir, *args):
+    os.chdir(data_dir)
+    return run_cashier(*args)
+
+def run_reader(backend_name, usernames, stop, latencies):
+    """Alternate daily and full reads until stop is set"""
+    if backend_name == 'store':
+        from store_server import StoreClient
+        managers = [StoreClient(username, STORE_SOCKET) for username in usernames]
+    else:
+        from sales_manager import SalesManager
+        managers = [SalesManager(username) for username in usernames]
+    date_str = BASE_DATE.strftime('%Y-%m-%d')
+    while not stop.is_set():
+        for manager in managers:
+            for name, read in (('get_daily_sales', lambda: manager.get_daily_sales(date_str)),
+                               ('get_all_sales', manager.get_all_sales)):
+                started = time.perf_counter()
+                read()
+                latencies[name].append(time.perf_counter() - started)
+                if stop.is_set():
+                    return
+
+def reconcile(usernames, generated):
+    """Compare stored sales with the generated ones by date, time and cashier"""
+    from sales_manager import SalesManager
+    from fingerprints import sale_identity
+    stored = Counter()
+    for username in usernames:
+        df = SalesManager(username).get_all_sales()
+        stored.update(sale_identity(sale) for sale in df.to_dict('records'))
+    expected = Counter(sale_identity(sale) for sale in generated)
+    return {
+        'expected': sum(expected.values()),
+        'stored': sum(stored.values()),
+        'lost': sum(1 for identity in expected if stored[identity] == 0),
+        'duplicated': sum(count - 1 for identity, count in stored.items() if identity in expected and count > 1),
+        'unexpected': sum(count for identity, count in stored.items() if identity not in expected)
+    }
+
+def run_load_test(cashiers=4, sales=50, rate=5.0, mode='thread', backend='direct', readers=2, users=1, seed=1):
+    """Run one load test in the current directory and return its report"""
+    usernames = [f"loadtest_{i}" for i in range(users)]
+    assignments = []
+    generated = []
+    for cashier in range(cashiers):
+        username = usernames[cashier % users]
+        sale_ids = [cashier * sales + i for i in range(sales)]
+        assignments.append((backend, username, sale_ids, rate, seed + cashier))
+        # Reconciliation only compares date, time and cashier, which depend on sale_id alone
+        generated += [generated_sale(sale_id, username) for sale_id in sale_ids]
+
+    # Create the sales files up front so cashiers do not race on creating them
+    from sales_manager import SalesManager
+    for username in usernames:
+        SalesManager(username)
+
+    store = None
+    if backend == 'store':
+        from store_server import StoreServer
+        store = StoreServer(STORE_SOCKET).start()
+        threading.Thread(target=store.serve_forever, daemon=True).start()
+
+    stop = threading.Event()
+    read_latencies = {'get_daily_sales': [], 'get_all_sales': []}
+    reader_threads = [threading.Thread(target=run_reader, args=(backend, usernames, stop, read_latencies), daemon=True)
+                      for _ in range(readers)]
+    for thread in reader_threads:
+        thread.start()
+
+    started = time.perf_counter()
+    if mode == 'process':
+        with multiprocessing.get_context('spawn').Pool(cashiers) as pool:
+            results = pool.starmap(_process_cashier, [(os.getcwd(),) + assignment for assignment in assignments])
+    else:
+        results = [None] * cashiers
+        def worker(index, assignment):
+            results[index] = run_cashier(*assignment)
+        threads = [threading.Thread(target=worker, args=(i, assignment)) for i, assignment in enumerate(assignments)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    for thread in reader_threads:
+        thread.join()
+    if store is not None:
+        store.close()
+
+    write_latencies = [latency for latencies, _ in results for latency in latencies]
+    failures = sum(failed for _, failed in results)
+    report = {
+        'config': {'cashiers': cashiers, 'sales_per_cashier': sales, 'rate': rate, 'mode': mode,
+                   'backend': backend, 'readers': readers, 'users': users},
+        'elapsed_s': round(elapsed, 3),
+        'sales_per_s': round((len(write_latencies) - failures) / elapsed, 2) if elapsed else None,
+        'write_ms': {'p50': percentile(write_latencies, 50), 'p99': percentile(write_latencies, 99)},
+        'failed_writes': failures,
+        'read_ms': {name: {'count': len(values), 'p50': percentile(values, 50), 'p99': percentile(values, 99)}
+                    for name, values in read_latencies.items()},
+        'reconciliation': reconcile(usernames, generated)
+    }
+    return report
+
+def format_ms(value):
+    return "-" if value is None else f"{value:.1f} ms"
+
+def print_report(report):
+    config = report['config']
+    print(f"{config['cashiers']} cashiers x {config['sales_per_cashier']} sales at {config['rate']}/s each, "
+          f"run as {config['mode']}{'es' if config['mode'] == 'process' else 's'}, {config['backend']} backend, {config['readers']} readers, {config['users']} sales file(s)")
+    print("-" * 60)
+    print(f"Elapsed:          {report['elapsed_s']:.2f} s")
+    print(f"Sustained:        {report['sales_per_s']} sales/s")
+    print(f"Write latency:    p50 {format_ms(report['write_ms']['p50'])}, p99 {format_ms(report['write_ms']['p99'])}")
+    print(f"Failed writes:    {report['failed_writes']}")
+    for name, stats in report['read_ms'].items():
+        print(f"{name + ':':<18}{stats['count']} reads, p50 {format_ms(stats['p50'])}, p99 {format_ms(stats['p99'])}")
+    print("-" * 60)
+    result = report['reconciliation']
+    print(f"Expected {result['expected']}, stored {result['stored']}: "
+          f"LOST {result['lost']}, DUPLICATED {result['duplicated']}, unexpected {result['unexpected']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test concurrent cashiers against the sales store")
+    parser.add_argument('--cashiers', type=int, default=4, help="number of simulated cashiers")
+    parser.add_argument('--sales', type=int, default=50, help="sales registered by each cashier")
+    parser.add_argument('--rate', type=float, default=5.0, help="mean sales per second per cashier (0 = as fast as possible)")
+    parser.add_argument('--mode', choices=['thread', 'process'], default='thread', help="run cashiers as threads or processes")
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='direct', help="how sales are registered")
+    parser.add_argument('--readers', type=int, default=2, help="reader threads running alongside the cashiers")
+    parser.add_argument('--users', type=int, default=1, help="sales files the cashiers are spread over")
+    parser.add_argument('--data-dir', help="directory to run in (default: a new temporary directory)")
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    args = parser.parse_args()
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="tortilla_loadtest_")
+    os.makedirs(data_dir, exist_ok=True)
+    os.chdir(data_dir)
+    report = run_load_test(args.cashiers, args.sales, args.rate, args.mode, args.backend, args.readers, max(1, args.users))
+    report['data_dir'] = data_dir
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+        print(f"Data left in {data_dir}")
+    result = report['reconciliation']
+    return 1 if result['lost'] or result['duplicated'] else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
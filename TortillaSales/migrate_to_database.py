@@ -0,0 +1,183 @@
+"""Bulk migration of the Excel sales and users files into the SQL database.
+
+Usage:
+    python migrate_to_database.py [--chunk-size 2000] [--pattern "sales_data_*.xlsx"]
+
+Every sales workbook is streamed in chunks with openpyxl's read-only mode
+and inserted with one executemany per chunk. The chunk insert and the
+file's checkpoint (worksheet rows already read, blank ones included) are
+committed in the same transaction, so an interrupted run resumes where it
+stopped and a re-run over unchanged files inserts nothing. Each workbook
+is then re-read on its own to check its row count and revenue against
+the database.
+"""
+import argparse
+import glob
+import os
+import time
+from openpyxl import load_workbook
+from sqlalchemy import func, select
+from database import get_engine, init_database, Sale, User, MigrationCheckpoint
+from utils import to_bool
+from schema import SALE_SCHEMA, SCHEMA_BY_NAME, column_converter
+from auth import USERS_FILE
+
+def sale_row_to_record(row, source_file):
+    """Convert one worksheet row (as a column dict) to a sales table record"""
+    record = {column.name: column_converter(column)(row.get(column.name)) for column in SALE_SCHEMA}
+    record['username'] = record['username'] or 'User'
+    record['customer_id'] = record['customer_id'] or None
+    record['source_file'] = source_file
+    return record
+
+def iter_workbook_chunks(path, start_row, chunk_size):
+    """Yield (row dicts, rows read) from a workbook, skipping start_row data rows.
+
+    Rows read counts worksheet rows after the header, blank ones included,
+    up to the end of the chunk; it is the start_row to resume from.
+    """
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        header = [str(name) if name is not None else '' for name in header]
+
+        chunk = []
+        for index, values in enumerate(rows):
+            if index < start_row:
+                continue
+            if all(value is None for value in values):
+                continue
+            chunk.append(dict(zip(header, values)))
+            if len(chunk) >= chunk_size:
+                yield chunk, index + 1
+                chunk = []
+        if chunk:
+            yield chunk, index + 1
+    finally:
+        workbook.close()
+
+def migrate_sales_file(path, chunk_size):
+    """Copy one sales workbook, resuming from its checkpoint.
+
+    Returns the number of rows inserted in this run.
+    """
+    source_file = os.path.basename(path)
+    with get_engine().begin() as conn:
+        checkpoint = conn.execute(
+            select(MigrationCheckpoint.row_offset, MigrationCheckpoint.source_revenue)
+            .where(MigrationCheckpoint.source_file == source_file)
+        ).first()
+        if checkpoint is None:
+            conn.execute(MigrationCheckpoint.__table__.insert(), {
+                'source_file': source_file, 'row_offset': 0, 'source_revenue': 0.0
+            })
+            row_offset, source_revenue = 0, 0.0
+        else:
+            row_offset, source_revenue = checkpoint
+
+    inserted = 0
+    for chunk, rows_read in iter_workbook_chunks(path, row_offset, chunk_size):
+        records = [sale_row_to_record(row, source_file) for row in chunk]
+        chunk_revenue = sum(record['total'] for record in records)
+        # Rows and checkpoint commit together, so a crash never double-inserts
+        with get_engine().begin() as conn:
+            conn.execute(Sale.__table__.insert(), records)
+            conn.execute(
+                MigrationCheckpoint.__table__.update()
+                .where(MigrationCheckpoint.source_file == source_file)
+                .values(row_offset=rows_read,
+                        source_revenue=source_revenue + chunk_revenue)
+            )
+        row_offset = rows_read
+        source_revenue += chunk_revenue
+        inserted += len(records)
+    return inserted
+
+def source_checksum(path, chunk_size):
+    """Row count and revenue of a workbook, read independently of the checkpoint"""
+    rows = 0
+    revenue = 0.0
+    convert_total = column_converter(SCHEMA_BY_NAME['total'])
+    for chunk, _ in iter_workbook_chunks(path, 0, chunk_size):
+        rows += len(chunk)
+        revenue += sum(convert_total(row.get('total')) for row in chunk)
+    return rows, revenue
+
+def migrate_users():
+    """Copy users.xlsx into the users table, updating existing usernames"""
+    if not os.path.exists(USERS_FILE):
+        return 0
+    count = 0
+    with get_engine().begin() as conn:
+        for chunk, _ in iter_workbook_chunks(USERS_FILE, 0, 500):
+            for row in chunk:
+                username = str(row.get('username') or '').strip()
+                if not username:
+                    continue
+                values = {'password': str(row.get('password')), 'is_admin': to_bool(row.get('is_admin'))}
+                updated = conn.execute(
+                    User.__table__.update().where(User.username == username).values(**values)
+                ).rowcount
+                if not updated:
+                    conn.execute(User.__table__.insert(), dict(username=username, **values))
+                count += 1
+    return count
+
+def destination_checksums():
+    """Get row count and revenue per source file from the sales table"""
+    with get_engine().connect() as conn:
+        rows = conn.execute(
+            select(Sale.source_file, func.count(Sale.id), func.coalesce(func.sum(Sale.total), 0.0))
+            .group_by(Sale.source_file)
+        ).all()
+    return {source_file: (count, float(revenue)) for source_file, count, revenue in rows}
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate Excel sales and users into the SQL database")
+    parser.add_argument('--chunk-size', type=int, default=2000, help="rows per insert batch")
+    parser.add_argument('--pattern', default="sales_data_*.xlsx", help="glob of sales workbooks to migrate")
+    args = parser.parse_args()
+
+    if not init_database():
+        print("Could not create database tables")
+        return 1
+
+    started = time.perf_counter()
+    user_count = migrate_users()
+    print(f"Users migrated: {user_count}")
+
+    source_totals = {}
+    inserted_total = 0
+    for path in sorted(glob.glob(args.pattern)):
+        if path.endswith(".tmp.xlsx"):
+            continue
+        file_started = time.perf_counter()
+        inserted = migrate_sales_file(path, args.chunk_size)
+        elapsed = time.perf_counter() - file_started
+        rate = inserted / elapsed if elapsed > 0 else 0
+        print(f"{os.path.basename(path)}: {inserted} new rows ({rate:.0f} rows/sec)")
+        source_totals[os.path.basename(path)] = source_checksum(path, args.chunk_size)
+        inserted_total += inserted
+
+    elapsed = time.perf_counter() - started
+    print("-" * 60)
+    print(f"Inserted {inserted_total} rows in {elapsed:.1f}s ({inserted_total / elapsed if elapsed > 0 else 0:.0f} rows/sec)")
+
+    # Compare what each workbook holds with what the database holds
+    destination = destination_checksums()
+    all_match = True
+    print(f"{'File':<32} {'Source rows':>11} {'DB rows':>8} {'Source $':>12} {'DB $':>12}")
+    for source_file, (source_rows, source_revenue) in source_totals.items():
+        db_rows, db_revenue = destination.get(source_file, (0, 0.0))
+        match = source_rows == db_rows and round(source_revenue, 2) == round(db_revenue, 2)
+        all_match = all_match and match
+        print(f"{source_file:<32} {source_rows:>11} {db_rows:>8} {source_revenue:>12.2f} {db_revenue:>12.2f} {'OK' if match else 'MISMATCH'}")
+
+    print("Checksums match" if all_match else "Checksum mismatch - check the files marked above")
+    return 0 if all_match else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
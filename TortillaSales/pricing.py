@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+from utils import PRODUCT_PRICES, PRODUCT_QUANTITY_COLUMNS, SUPPLIER_TORTILLA_PRICE
+
+# Prices a what-if can change: name -> (daily rollup quantity, current price).
+# Regular tortilla is the rollup's tortilla kg less the supplier kg.
+PRICE_GROUPS = {
+    'Tortilla': ('tortilla_qty', PRODUCT_PRICES['Tortilla']),
+    'Supplier Tortilla': ('supplier_tortilla_qty', SUPPLIER_TORTILLA_PRICE)
+}
+PRICE_GROUPS.update({product: (PRODUCT_QUANTITY_COLUMNS[product], price)
+                     for product, price in PRODUCT_PRICES.items() if product != 'Tortilla'})
+CURRENT_PRICES = {name: price for name, (_, price) in PRICE_GROUPS.items()}
+_TORTILLA_GROUPS = [list(PRICE_GROUPS).index(name) for name in ('Tortilla', 'Supplier Tortilla')]
+
+SIMULATION_PERIODS = ['day', 'week', 'month', 'year']
+
+def _group_quantities(daily_totals):
+    """Days x price groups matrix of the quantities sold"""
+    columns = {name: daily_totals[column].to_numpy(dtype=float) for name, (column, _) in PRICE_GROUPS.items()}
+    columns['Tortilla'] = columns['Tortilla'] - columns['Supplier Tortilla']
+    return np.column_stack([columns[name] for name in PRICE_GROUPS])
+
+def _period_labels(dates, period):
+    if period == 'day':
+        return dates
+    if period == 'week':
+        days = pd.to_datetime(dates)
+        # Weeks start on Monday, as in the weekly summary
+        return (days - pd.to_timedelta(days.dt.weekday, unit='D')).dt.strftime('%Y-%m-%d')
+    if period == 'month':
+        return dates.str[:7]
+    if period == 'year':
+        return dates.str[:4]
+    raise ValueError(f"Unknown period: {period}")
+
+def simulate_prices(daily_totals, prices, elasticity=0.0, period='month'):
+    """Revenue per period had the proposed prices applied to the same sales.
+
+    daily_totals are daily rollup rows (from one cashier or several);
+    prices maps PRICE_GROUPS names to proposed prices, missing ones staying
+    at the current price. With an elasticity, each product's quantity
+    scales by (proposed / current) ** elasticity, so with a non-zero
+    elasticity every proposed price must be above zero (ValueError
+    otherwise). Prices are linear, so a day's repriced revenue is the same
+    whether its sales are repriced one by one or as the day's totals: the
+    whole history is one matrix product over days, however many sales
+    there are. Special products and any amount charged off-list keep their
+    recorded revenue.
+
+    Returns one row per period with the recorded and simulated revenue and
+    tortilla kg, the revenue change and the percentage change.
+    """
+    columns = ['period', 'sales', 'revenue', 'simulated_revenue', 'delta', 'pct_change',
+               'tortilla_kg', 'simulated_tortilla_kg']
+    if daily_totals.empty:
+        return pd.DataFrame(columns=columns)
+    current = np.array([CURRENT_PRICES[name] for name in PRICE_GROUPS])
+    proposed = np.array([float(prices.get(name, CURRENT_PRICES[name])) for name in PRICE_GROUPS])
+    if elasticity and (proposed <= 0).any():
+        free = [name for name, price in zip(PRICE_GROUPS, proposed) if price <= 0]
+        raise ValueError(f"Prices must be above zero with a price elasticity: {', '.join(free)}")
+    ratio = np.divide(proposed, current, out=np.ones_like(current), where=current > 0)
+    volume = ratio ** elasticity
+
+    quantities = _group_quantities(daily_totals)
+    simulated = quantities * volume
+    revenue = daily_totals['total'].to_numpy(dtype=float)
+    days = pd.DataFrame({
+        'period': _period_labels(daily_totals['date'].astype(str).str[:10], period).to_numpy(),
+        'sales': daily_totals['sales'].to_numpy(dtype=int),
+        'revenue': revenue,
+        'simulated_revenue': revenue + simulated @ proposed - quantities @ current,
+        'tortilla_kg': quantities[:, _TORTILLA_GROUPS].sum(axis=1),
+        'simulated_tortilla_kg': simulated[:, _TORTILLA_GROUPS].sum(axis=1)
+    })
+    result = days.groupby('period', sort=True).sum().reset_index()
+    result['delta'] = result['simulated_revenue'] - result['revenue']
+    result['pct_change'] = (result['delta'] / result['revenue'].where(result['revenue'] != 0) * 100).round(1)
+    result[['revenue', 'simulated_revenue', 'delta']] = result[['revenue', 'simulated_revenue', 'delta']].round(2)
+    result[['tortilla_kg', 'simulated_tortilla_kg']] = result[['tortilla_kg', 'simulated_tortilla_kg']].round(3)
+    return result[columns]
@@ -0,0 +1,211 @@
+from datetime import datetime, timedelta
+from utils import get_week_dates, PRODUCT_PRICES, PRODUCT_QUANTITY_COLUMNS, tortilla_price
+
+# Figures compared between two periods, with their labels
+COMPARISON_METRICS = {
+    'total': 'Revenue',
+    'sales': 'Sales',
+    'tortilla_qty': 'Tortilla (kg)',
+    'totopos_qty': 'Totopos',
+    'cacahuates_qty': 'Cacahuates',
+    'mix_qty': 'Mix',
+    'salted_chips_qty': 'Salted Chips',
+    'special_qty': 'Special'
+}
+
+def calculate_subtotals(sales_df):
+    """Split a day's sales into regular tortilla, supplier tortilla and other products"""
+    if sales_df.empty:
+        return 0.0, 0.0, 0.0
+    supplier = sales_df['supplier'].astype(bool)
+    tortilla_subtotal = float((sales_df.loc[~supplier, 'tortilla_qty'] * tortilla_price()).sum())
+    supplier_tortilla_subtotal = float((sales_df.loc[supplier, 'tortilla_qty'] * tortilla_price(True)).sum())
+    other_subtotal = float((sales_df['special_qty'] * sales_df['special_price']).sum())
+    for product, price in PRODUCT_PRICES.items():
+        if product != 'Tortilla':
+            other_subtotal += float((sales_df[PRODUCT_QUANTITY_COLUMNS[product]] * price).sum())
+    return tortilla_subtotal, supplier_tortilla_subtotal, other_subtotal
+
+def daily_report_text(date_str, daily_sales):
+    """Build the TXT daily report for one day's sales"""
+    report_lines = []
+    report_lines.append("=" * 50)
+    report_lines.append("TORTILLA BUSINESS - DAILY SALES REPORT")
+    report_lines.append("=" * 50)
+    report_lines.append(f"Date: {date_str}")
+    report_lines.append(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    report_lines.append("=" * 50)
+
+    if daily_sales.empty:
+        report_lines.append("No sales recorded for this date.")
+    else:
+        # Product summary
+        report_lines.append("PRODUCT SUMMARY:")
+        report_lines.append("-" * 30)
+        report_lines.append(f"Tortillas: {daily_sales['tortilla_qty'].sum()} kg")
+        report_lines.append(f"Totopos: {int(daily_sales['totopos_qty'].sum())} units")
+        report_lines.append(f"Cacahuates: {int(daily_sales['cacahuates_qty'].sum())} units")
+        report_lines.append(f"Mix: {int(daily_sales['mix_qty'].sum())} units")
+        report_lines.append(f"Salted Chips: {int(daily_sales['salted_chips_qty'].sum())} units")
+        report_lines.append(f"Special: {int(daily_sales['special_qty'].sum())} units")
+
+        # Financial summary
+        tortilla_subtotal, supplier_tortilla_subtotal, other_subtotal = calculate_subtotals(daily_sales)
+
+        report_lines.append("")
+        report_lines.append("FINANCIAL SUMMARY:")
+        report_lines.append("-" * 30)
+        report_lines.append(f"Regular Tortilla Subtotal: ${tortilla_subtotal:.2f}")
+        report_lines.append(f"Supplier Tortilla Subtotal: ${supplier_tortilla_subtotal:.2f}")
+        report_lines.append(f"Other Products Subtotal: ${other_subtotal:.2f}")
+        report_lines.append(f"GRAND TOTAL: ${tortilla_subtotal + supplier_tortilla_subtotal + other_subtotal:.2f}")
+        report_lines.append(f"Total Sales Count: {len(daily_sales)}")
+
+        # Individual sales
+        report_lines.append("")
+        report_lines.append("INDIVIDUAL SALES:")
+        report_lines.append("-" * 30)
+        for idx, sale in daily_sales.iterrows():
+            report_lines.append(f"Sale {idx + 1} - {sale['time']} - ${sale['total']:.2f}")
+            if sale['tortilla_qty'] > 0:
+                report_lines.append(f"  Tortillas: {sale['tortilla_qty']} kg")
+            if sale['totopos_qty'] > 0:
+                report_lines.append(f"  Totopos: {int(sale['totopos_qty'])} units")
+            if sale['cacahuates_qty'] > 0:
+                report_lines.append(f"  Cacahuates: {int(sale['cacahuates_qty'])} units")
+            if sale['mix_qty'] > 0:
+                report_lines.append(f"  Mix: {int(sale['mix_qty'])} units")
+            if sale['salted_chips_qty'] > 0:
+                report_lines.append(f"  Salted Chips: {int(sale['salted_chips_qty'])} units")
+            if sale['special_qty'] > 0:
+                report_lines.append(f"  Special: {int(sale['special_qty'])} units @ ${sale['special_price']:.2f}")
+            if sale['frequent_customer']:
+                report_lines.append("  * Frequent Customer")
+            if sale['supplier']:
+                report_lines.append("  * Supplier Discount")
+            report_lines.append("")
+
+    report_lines.append("=" * 50)
+    return "\n".join(report_lines)
+
+def period_dates(period, selected_date):
+    """Get every date in the week or month containing selected_date"""
+    if period == 'weekly':
+        return get_week_dates(selected_date)
+    if period == 'monthly':
+        first = selected_date.replace(day=1)
+        next_month = (first + timedelta(days=32)).replace(day=1)
+        return [first + timedelta(days=offset) for offset in range((next_month - first).days)]
+    return [selected_date]
+
+def period_breakdown(dates, daily_totals):
+    """Get per-day sales count and total for the given dates from daily totals"""
+    by_date = {}
+    if not daily_totals.empty:
+        by_date = daily_totals.set_index('date')[['sales', 'total']].to_dict('index')
+    breakdown = []
+    for date in dates:
+        date_str = date.strftime('%Y-%m-%d')
+        day = by_date.get(date_str, {'sales': 0, 'total': 0.0})
+        breakdown.append({
+            'day': date.strftime('%A'),
+            'date': date_str,
+            'sales_count': int(day['sales']),
+            'total': float(day['total'])
+        })
+    return breakdown
+
+def period_report_text(title, dates, breakdown):
+    """Build the TXT weekly or monthly report from a per-day breakdown"""
+    report_lines = []
+    report_lines.append("=" * 50)
+    report_lines.append(f"TORTILLA BUSINESS - {title} SALES REPORT")
+    report_lines.append("=" * 50)
+    label = "Week" if title == "WEEKLY" else "Period"
+    report_lines.append(f"{label}: {dates[0].strftime('%Y-%m-%d')} to {dates[-1].strftime('%Y-%m-%d')}")
+    report_lines.append(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    report_lines.append("=" * 50)
+
+    # Daily breakdown
+    report_lines.append("DAILY BREAKDOWN:")
+    report_lines.append("-" * 30)
+    for data in breakdown:
+        report_lines.append(f"{data['day']:<10} {data['date']:<12} {data['sales_count']:>3} sales  ${data['total']:>8.2f}")
+
+    total_earnings = sum(data['total'] for data in breakdown)
+    report_lines.append("-" * 30)
+    report_lines.append(f"TOTAL {title} EARNINGS: ${total_earnings:.2f}")
+    total_sales_count = sum(data['sales_count'] for data in breakdown)
+    report_lines.append(f"Total Sales Count: {total_sales_count}")
+    days_with_sales = sum(1 for data in breakdown if data['sales_count'] > 0)
+    report_lines.append(f"Days with Sales: {days_with_sales}/{len(breakdown)}")
+
+    report_lines.append("=" * 50)
+    return "\n".join(report_lines)
+
+def summarize_daily_totals(daily_totals):
+    """Get the same figures as SalesManager.get_sales_summary from daily totals"""
+    if daily_totals.empty:
+        return {}
+    total_sales = int(daily_totals['sales'].sum())
+    total_revenue = float(daily_totals['total'].sum())
+    return {
+        'total_sales': total_sales,
+        'total_revenue': total_revenue,
+        'average_sale': total_revenue / total_sales if total_sales else 0.0,
+        'tortilla_total': float(daily_totals['tortilla_qty'].sum()),
+        'totopos_total': float(daily_totals['totopos_qty'].sum()),
+        'cacahuates_total': float(daily_totals['cacahuates_qty'].sum()),
+        'mix_total': float(daily_totals['mix_qty'].sum()),
+        'salted_chips_total': float(daily_totals['salted_chips_qty'].sum()),
+        'special_total': float(daily_totals['special_qty'].sum()),
+        'frequent_customers': int(daily_totals['frequent_customers'].sum()),
+        'supplier_sales': int(daily_totals['supplier_sales'].sum())
+    }
+
+def comparison_periods(preset, selected_date):
+    """(current, previous) date ranges for a named comparison around selected_date"""
+    if preset == 'week_vs_last_week':
+        week = get_week_dates(selected_date)
+        return (week[0], week[-1]), (week[0] - timedelta(days=7), week[-1] - timedelta(days=7))
+    if preset == 'week_vs_last_year':
+        week = get_week_dates(selected_date)
+        # 52 weeks back lands on the same weekdays
+        return (week[0], week[-1]), (week[0] - timedelta(weeks=52), week[-1] - timedelta(weeks=52))
+    if preset == 'month_vs_last_month':
+        month = period_dates('monthly', selected_date)
+        previous = period_dates('monthly', month[0] - timedelta(days=1))
+        return (month[0], month[-1]), (previous[0], previous[-1])
+    raise ValueError(f"Unknown comparison: {preset}")
+
+def compare_periods(daily_totals, current, previous):
+    """Revenue, sale count and product quantities of two periods side by side.
+
+    daily_totals holds the rollup rows covering both periods; current and
+    previous are (start, end) 'YYYY-MM-DD' pairs. Returns one row per
+    metric with both values, the change and the percentage change (None
+    when the previous value is zero).
+    """
+    metrics = list(COMPARISON_METRICS)
+    sums = {}
+    for name, (start, end) in (('current', current), ('previous', previous)):
+        if daily_totals.empty:
+            sums[name] = {metric: 0.0 for metric in metrics}
+            continue
+        in_period = (daily_totals['date'] >= start) & (daily_totals['date'] <= end)
+        sums[name] = daily_totals.loc[in_period, metrics].sum().to_dict()
+
+    rows = []
+    for metric in metrics:
+        current_value = float(sums['current'][metric])
+        previous_value = float(sums['previous'][metric])
+        change = current_value - previous_value
+        rows.append({
+            'metric': metric,
+            'label': COMPARISON_METRICS[metric],
+            'current': round(current_value, 3),
+            'previous': round(previous_value, 3),
+            'change': round(change, 3),
+            'pct_change': round(change / previous_value * 100, 1) if previous_value else None
+        })
+    return rows
@@ -0,0 +1,147 @@
+import glob
+import json
+import os
+import threading
+from utils import locked_file
+
+OUTBOX_PATTERN = "sale_outbox_{username}.jsonl"
+
+class SaleOutbox:
+    """Durable local queue of registered sales waiting to reach the sales file.
+
+    Registering a sale only appends one JSON line and fsyncs it, so the
+    cashier never waits on the workbook rewrite. A background thread moves
+    the queued sales into the store in batches. Before a batch is written
+    the outbox file is renamed to a ".flushing" file; it is removed only
+    after the store accepted the batch, so a crash at any point leaves the
+    sales on disk to be replayed on the next start. Replayed batches skip
+    sales whose fingerprint is already stored.
+    """
+
+    def __init__(self, username, manager_factory, interval=2.0):
+        self.username = username
+        self.manager_factory = manager_factory
+        self.sales_manager = None
+        self.interval = interval
+        self.outbox_file = OUTBOX_PATTERN.format(username=username)
+        self.flushing_file = f"{self.outbox_file}.flushing"
+        # Several app processes may share an outbox; these lock files order them
+        self.append_lock_file = f"{self.outbox_file}.lock"
+        self.flush_lock_file = f"{self.outbox_file}.flush.lock"
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread = None
+
+    def append(self, sale_data):
+        """Durably queue a sale and wake the flusher"""
+        try:
+            line = (json.dumps(sale_data, default=str) + "\n").encode('utf-8')
+            with self.lock, locked_file(self.append_lock_file):
+                with open(self.outbox_file, 'a+b') as f:
+                    # Never glue a new entry onto a line torn by an earlier crash
+                    if f.seek(0, os.SEEK_END) > 0:
+                        f.seek(-1, os.SEEK_END)
+                        if f.read(1) != b"\n":
+                            line = b"\n" + line
+                    f.write(line)
+                    f.flush()
+                    os.fsync(f.fileno())
+            self.wake.set()
+            return True
+        except Exception as e:
+            print(f"Error queuing sale: {e}")
+            return False
+
+    def _read_entries(self, path):
+        entries = []
+        if not os.path.exists(path):
+            return entries
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    # A torn last line from a crash mid-append was never acknowledged
+                    print(f"Skipping unreadable outbox line in {path}")
+        return entries
+
+    def pending_count(self):
+        """Number of queued sales not yet written to the sales file"""
+        with self.lock, locked_file(self.append_lock_file):
+            return len(self._read_entries(self.outbox_file)) + len(self._read_entries(self.flushing_file))
+
+    def flush(self):
+        """Move every queued sale into the store in one batch.
+
+        Returns the number of sales written.
+        """
+        with self.flush_lock, locked_file(self.flush_lock_file):
+            with self.lock, locked_file(self.append_lock_file):
+                # A leftover batch may already be in the store if we died
+                # between writing it and removing the batch file
+                replaying = os.path.exists(self.flushing_file)
+                if not replaying:
+                    if not os.path.exists(self.outbox_file) or os.path.getsize(self.outbox_file) == 0:
+                        return 0
+                    os.replace(self.outbox_file, self.flushing_file)
+
+            entries = self._read_entries(self.flushing_file)
+            if entries:
+                # One manager serves every flush, so its loaded sales stay warm
+                if self.sales_manager is None:
+                    self.sales_manager = self.manager_factory(self.username)
+                sales_manager = self.sales_manager
+                if replaying:
+                    written = sales_manager.import_sales(entries, include_conflicting=True)['success']
+                else:
+                    written = sales_manager.add_sales(entries)
+                if not written:
+                    # Keep the batch on disk and retry on the next pass
+                    return 0
+            os.remove(self.flushing_file)
+            return len(entries)
+
+    def _run(self):
+        while True:
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error flushing sale outbox: {e}")
+            self.wake.wait(self.interval)
+            self.wake.clear()
+
+    def start(self):
+        """Start the background flusher; the first pass replays leftovers"""
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name=f"sale-outbox-{self.username}", daemon=True)
+            self.thread.start()
+
+_outboxes = {}
+_outboxes_lock = threading.Lock()
+
+def get_sale_outbox(username, manager_factory):
+    """Get the process-wide outbox for a user, starting its flusher once"""
+    with _outboxes_lock:
+        outbox = _outboxes.get(username)
+        if outbox is None:
+            outbox = SaleOutbox(username, manager_factory)
+            outbox.start()
+            _outboxes[username] = outbox
+        return outbox
+
+def replay_pending_outboxes(manager_factory):
+    """Start flushers for every user that has sales left over from a previous run"""
+    prefix, suffix = OUTBOX_PATTERN.split("{username}")
+    usernames = set()
+    for path in glob.glob(f"{prefix}*{suffix}") + glob.glob(f"{prefix}*{suffix}.flushing"):
+        name = os.path.basename(path)
+        if name.endswith(".flushing"):
+            name = name[:-len(".flushing")]
+        usernames.add(name[len(prefix):-len(suffix)])
+    for username in usernames:
+        get_sale_outbox(username, manager_factory)
+    return sorted(usernames)
@@ -1,52 +1,304 @@
 import pandas as pd
 import os
-from datetime import datetime
+import glob
+import threading
+import bisect
+from datetime import datetime, timedelta
+from demand_profile import DemandProfile
+from daily_rollup import DailyRollup
+from forecast import DemandForecaster
+from fingerprints import FingerprintIndex
+from change_feed import ChangeFeed, LiveTotals
+from archive import SalesArchive
+from shifts import ShiftTracker
+from inventory import InventoryLedger
+from audit import SalesAudit
+from customers import CustomerRegistry, CustomerIndex
+from leaderboards import TopSales
+from downsample import downsample_series
+from utils import normalize_date, load_json_file, locked_file
+from schema import empty_sales_frame, read_sales_excel, coerce_sales, project_sales, validate_sale
+
+# Period comparisons kept per SalesManager
+COMPARISON_CACHE_SIZE = 32
+
+# Column summed by get_sales_summary -> summary key
+SUMMARY_SUMS = {
+    'total': 'total_revenue',
+    'tortilla_qty': 'tortilla_total',
+    'totopos_qty': 'totopos_total',
+    'cacahuates_qty': 'cacahuates_total',
+    'mix_qty': 'mix_total',
+    'salted_chips_qty': 'salted_chips_total',
+    'special_qty': 'special_total',
+    'frequent_customer': 'frequent_customers',
+    'supplier': 'supplier_sales'
+}
+
+# Rows per DataFrame yielded by SalesManager.iter_sales
+CHUNK_ROWS = 5000
+
+def rechunk(frames, chunk_rows):
+    """Regroup a stream of DataFrames into frames of exactly chunk_rows rows (the last may be shorter)"""
+    buffered = []
+    count = 0
+    for frame in frames:
+        while len(frame):
+            take = frame.iloc[:chunk_rows - count]
+            frame = frame.iloc[len(take):]
+            buffered.append(take)
+            count += len(take)
+            if count == chunk_rows:
+                yield pd.concat(buffered) if len(buffered) > 1 else buffered[0]
+                buffered = []
+                count = 0
+    if buffered:
+        yield pd.concat(buffered) if len(buffered) > 1 else buffered[0]
+
+class SalesFileLock:
+    """Reentrant write lock on a sales file, held across threads and processes.
+    
+    The thread lock orders SalesManagers within a process; an flock on
+    "<sales file>.lock", taken by the outermost acquire, orders this process
+    against the CLI, other app processes and the store server.
+    """
+    
+    def __init__(self, path):
+        self.lock_file = f"{path}.lock"
+        self.thread_lock = threading.RLock()
+        self.depth = 0
+        self.held = None
+    
+    def __enter__(self):
+        self.thread_lock.acquire()
+        if self.depth == 0:
+            try:
+                held = locked_file(self.lock_file)
+                held.__enter__()
+            except BaseException:
+                self.thread_lock.release()
+                raise
+            self.held = held
+        self.depth += 1
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.depth -= 1
+        try:
+            if self.depth == 0:
+                held, self.held = self.held, None
+                held.__exit__(None, None, None)
+        finally:
+            self.thread_lock.release()
+        return False
+
+# One write lock per sales file, shared by every SalesManager in the process
+_file_locks = {}
+_file_locks_guard = threading.Lock()
+
+def get_file_lock(path):
+    with _file_locks_guard:
+        if path not in _file_locks:
+            _file_locks[path] = SalesFileLock(path)
+        return _file_locks[path]
+
+def list_sales_users():
+    """Get the usernames that have a sales file in the working directory"""
+    usernames = []
+    for path in glob.glob("sales_data_*.xlsx"):
+        name = os.path.basename(path)
+        if name.endswith(".tmp.xlsx"):
+            continue
+        usernames.append(name[len("sales_data_"):-len(".xlsx")])
+    return sorted(usernames)
+
+def get_live_totals(username, date_str, change_feed=None):
+    """Snapshot a user's totals for a day together with the change sequence.
+    
+    Taken under the sales file's write lock so the totals and the sequence
+    describe the same moment; later deltas come from changes_since(seq).
+    """
+    change_feed = change_feed or ChangeFeed(username)
+    with get_file_lock(f"sales_data_{username}.xlsx"):
+        change_feed.refresh()
+        day = DailyRollup(username).get_day(date_str)
+        return LiveTotals(date_str, change_feed.last_seq, day)
+
+def summarize_sales(chunks):
+    """Sale count, revenue and product totals over sales DataFrames; {} if none"""
+    sums = {name: 0 for name in SUMMARY_SUMS.values()}
+    total_sales = 0
+    for chunk in chunks:
+        total_sales += len(chunk)
+        for column, name in SUMMARY_SUMS.items():
+            sums[name] += chunk[column].sum()
+    
+    if not total_sales:
+        return {}
+    
+    summary = {
+        'total_sales': total_sales,
+        'total_revenue': sums['total_revenue'],
+        'average_sale': sums['total_revenue'] / total_sales
+    }
+    summary.update(sums)
+    return summary
 
 class SalesManager:
     def __init__(self, username="default"):
         self.username = username
         self.sales_file = f"sales_data_{username}.xlsx"
+        self.listeners = []
+        self.comparison_cache = {}
+        self.write_lock = get_file_lock(self.sales_file)
+        self.archive = SalesArchive(username)
+        self.audit = SalesAudit(username)
         self.initialize_sales_file()
+        with self.write_lock:
+            self._finish_archive_move()
+        
+        # Running aggregates kept up to date on every write
+        self.demand_profile = DemandProfile(username)
+        self.add_listener(self.demand_profile)
+        self.daily_rollup = DailyRollup(username)
+        self.add_listener(self.daily_rollup)
+        self.fingerprint_index = FingerprintIndex(username)
+        self.add_listener(self.fingerprint_index)
+        self.change_feed = ChangeFeed(username)
+        self.add_listener(self.change_feed)
+        self.shifts = ShiftTracker(username)
+        self.add_listener(self.shifts)
+        self.inventory = InventoryLedger(username=username)
+        self.add_listener(self.inventory)
+        self.customers = CustomerRegistry()
+        self.customer_index = CustomerIndex(username)
+        self.add_listener(self.customer_index)
+        self.top_sales = TopSales(username)
+        self.add_listener(self.top_sales)
+    
+    def add_listener(self, listener):
+        """Register an aggregate that is notified of every sale change.
+        
+        Listeners implement sales_added(sales), sale_removed(sale) and
+        sales_cleared(). A listener that reports needs_rebuild() is rebuilt
+        from the full sales file once, when it is registered.
+        """
+        self.listeners.append(listener)
+        if hasattr(listener, 'needs_rebuild') and listener.needs_rebuild():
+            listener.rebuild(self.get_all_sales())
+    
+    def _notify(self, event, *args):
+        """Forward a sale change to every registered listener"""
+        for listener in self.listeners:
+            try:
+                # Another SalesManager may have updated the listener's file since we loaded it
+                if hasattr(listener, 'refresh'):
+                    listener.refresh()
+                getattr(listener, event)(*args)
+            except Exception as e:
+                print(f"Error updating {type(listener).__name__}: {e}")
     
     def initialize_sales_file(self):
         """Initialize the sales Excel file with proper columns"""
         if not os.path.exists(self.sales_file):
             # Create empty DataFrame with all necessary columns
-            columns = [
-                'date', 'time', 'username', 'tortilla_qty', 'totopos_qty', 
-                'cacahuates_qty', 'mix_qty', 'salted_chips_qty', 'special_qty',
-                'special_price', 'frequent_customer', 'supplier', 'total', 
-                'payment', 'change'
-            ]
-            empty_df = pd.DataFrame(columns=columns)
+            empty_df = empty_sales_frame()
             try:
                 empty_df.to_excel(self.sales_file, index=False, engine='openpyxl')
                 print(f"Created new sales file: {self.sales_file}")
             except Exception as e:
                 print(f"Error creating sales file: {e}")
     
+    def _write_sales(self, df):
+        """Replace the sales file atomically so readers never see a partial workbook.
+        
+        Callers hold write_lock around the whole read-modify-write, so no
+        other thread or process rewrites the file in between.
+        """
+        # One temp file per process, so concurrent writers never share a half-written file
+        temp_file = f"{self.sales_file}.{os.getpid()}.tmp.xlsx"
+        df.to_excel(temp_file, index=False, engine='openpyxl')
+        os.replace(temp_file, self.sales_file)
+    
     def add_sale(self, sale_data):
         """Add a new sale to the Excel file"""
+        return self.add_sales([sale_data])
+    
+    def add_sales(self, sales):
+        """Add several sales with a single read and rewrite of the Excel file"""
+        if not sales:
+            return True
         try:
-            # Read existing data
-            existing_df = pd.read_excel(self.sales_file, engine='openpyxl')
-            
-            # Create new sale DataFrame
-            new_sale_df = pd.DataFrame([sale_data])
-            
-            # Combine and save
-            updated_df = pd.concat([existing_df, new_sale_df], ignore_index=True)
-            updated_df.to_excel(self.sales_file, index=False, engine='openpyxl')
-            
+            # Coerced to the schema once, then appended in one rewrite
+            self.append_sales(coerce_sales(pd.DataFrame(list(sales))))
             return True
         except Exception as e:
             print(f"Error adding sale: {e}")
             return False
     
-    def get_all_sales(self):
-        """Get all sales from the Excel file"""
+    def append_sales(self, new_sales, existing=None):
+        """Append sales already coerced to the schema and notify the aggregates.
+        
+        existing is the active file's sales if the caller already holds
+        them (the store server keeps them in memory); otherwise the file is
+        read. Returns the sales file as written.
+        """
+        with self.write_lock:
+            if existing is None:
+                existing = read_sales_excel(self.sales_file)
+            updated = pd.concat([existing, new_sales], ignore_index=True)
+            self._write_sales(updated)
+            self._notify('sales_added', new_sales.to_dict('records'))
+            return updated
+    
+    def classify_sales(self, sales):
+        """Split incoming sales into new, duplicate and conflicting ones"""
+        with self.write_lock:
+            return self.fingerprint_index.classify(sales)
+    
+    def import_sales(self, sales, include_conflicting=False):
+        """Add only the sales that are not already stored.
+        
+        Returns the new, duplicate, conflicting and invalid counts and
+        whether the write succeeded. Conflicting sales (same date, time and
+        cashier as a stored sale but different content) are imported only on
+        request; sales failing validate_sale never are.
+        """
+        valid = [sale for sale in sales if validate_sale(sale)[0]]
+        with self.write_lock:
+            classified = self.fingerprint_index.classify(valid)
+            to_add = classified['new'] + (classified['conflicting'] if include_conflicting else [])
+            result = {
+                'invalid': len(sales) - len(valid),
+                'new': len(classified['new']),
+                'duplicate': len(classified['duplicate']),
+                'conflicting': len(classified['conflicting']),
+                'imported': len(to_add)
+            }
+            result['success'] = self.add_sales(to_add)
+            if not result['success']:
+                result['imported'] = 0
+            return result
+    
+    def _with_archive(self, df, start_date=None, end_date=None):
+        """Add archived sales in the date range to sales read from the active file"""
+        if not self.archive.covers(start_date):
+            return df
+        archived = self.archive.read_range(start_date, end_date)
+        if archived.empty:
+            return df
+        return pd.concat([archived, df], ignore_index=True)
+    
+    def get_all_sales(self, recent_only=False):
+        """Get all sales from the Excel file.
+        
+        With recent_only the archive is skipped and only the active file is
+        read; its row labels then match delete_sale_by_index positions.
+        """
         try:
-            df = pd.read_excel(self.sales_file, engine='openpyxl')
+            df = read_sales_excel(self.sales_file)
+            if not recent_only:
+                df = self._with_archive(df)
             # Sort by date and time (most recent first)
             df = df.sort_values(['date', 'time'], ascending=[False, False])
             return df
@@ -54,11 +306,59 @@ class SalesManager:
             print(f"Error reading sales: {e}")
             return pd.DataFrame()
     
+    def iter_sales(self, start_date=None, end_date=None, columns=None, chunk_rows=CHUNK_ROWS):
+        """Yield sales between two dates, oldest first, as DataFrames of chunk_rows rows.
+        
+        columns limits what is read and returned. Archived years are
+        streamed a chunk at a time and merged with the active file's sales,
+        so memory depends on chunk_rows and the active file (which archiving
+        keeps short), not on the length of the history.
+        """
+        start = normalize_date(start_date) if start_date else None
+        end = normalize_date(end_date) if end_date else None
+        read_columns = None
+        if columns is not None:
+            read_columns = list(columns) + [name for name in ('date', 'time') if name not in columns]
+        
+        def project(frame):
+            return project_sales(frame, columns) if columns is not None else frame
+        
+        try:
+            active = read_sales_excel(self.sales_file, read_columns)
+        except Exception as e:
+            print(f"Error reading sales: {e}")
+            return
+        dates = active['date'].astype(str).str[:10]
+        mask = pd.Series(True, index=active.index)
+        if start:
+            mask &= dates >= start
+        if end:
+            mask &= dates <= end
+        active = active[mask].sort_values(['date', 'time'], kind='stable')
+        active_keys = (active['date'].astype(str).str[:10] + ' ' + active['time'].astype(str)).tolist()
+        
+        def merged():
+            position = 0
+            if self.archive.covers(start):
+                for chunk in self.archive.iter_range(start, end, read_columns, chunk_rows):
+                    # Active sales up to the end of this chunk are merged into it
+                    last_key = f"{str(chunk['date'].iloc[-1])[:10]} {chunk['time'].iloc[-1]}"
+                    cut = bisect.bisect_right(active_keys, last_key, lo=position)
+                    if cut > position:
+                        chunk = pd.concat([chunk, active.iloc[position:cut]]).sort_values(['date', 'time'], kind='stable')
+                        position = cut
+                    yield project(chunk)
+            if position < len(active):
+                yield project(active.iloc[position:])
+        
+        yield from rechunk(merged(), chunk_rows)
+    
     def get_daily_sales(self, date_str):
         """Get sales for a specific date"""
         try:
-            df = pd.read_excel(self.sales_file, engine='openpyxl')
-            daily_sales = df[df['date'] == date_str]
+            df = read_sales_excel(self.sales_file)
+            df = self._with_archive(df, date_str, date_str)
+            daily_sales = df[df['date'].astype(str).str[:10] == date_str]
             return daily_sales.sort_values('time', ascending=False)
         except Exception as e:
             print(f"Error reading daily sales: {e}")
@@ -67,7 +367,8 @@ class SalesManager:
     def get_weekly_sales(self, start_date, end_date):
         """Get sales for a date range"""
         try:
-            df = pd.read_excel(self.sales_file, engine='openpyxl')
+            df = read_sales_excel(self.sales_file)
+            df = self._with_archive(df, normalize_date(start_date), normalize_date(end_date))
             df['date'] = pd.to_datetime(df['date'])
             start_date = pd.to_datetime(start_date)
             end_date = pd.to_datetime(end_date)
@@ -82,14 +383,11 @@ class SalesManager:
         """Delete all sales records"""
         try:
             # Create empty DataFrame with columns
-            columns = [
-                'date', 'time', 'username', 'tortilla_qty', 'totopos_qty', 
-                'cacahuates_qty', 'mix_qty', 'salted_chips_qty', 'special_qty',
-                'special_price', 'frequent_customer', 'supplier', 'total', 
-                'payment', 'change'
-            ]
-            empty_df = pd.DataFrame(columns=columns)
-            empty_df.to_excel(self.sales_file, index=False, engine='openpyxl')
+            empty_df = empty_sales_frame()
+            with self.write_lock:
+                self._write_sales(empty_df)
+                self.archive.clear()
+                self._notify('sales_cleared')
             return True
         except Exception as e:
             print(f"Error deleting all sales: {e}")
@@ -100,19 +398,22 @@ class SalesManager:
         try:
             # Read existing data
             if os.path.exists(self.sales_file):
-                df = pd.read_excel(self.sales_file, engine='openpyxl')
-                
-                # Check if index is valid
-                if 0 <= index < len(df):
-                    # Remove the row at the specified index
-                    df = df.drop(df.index[index])
+                with self.write_lock:
+                    df = read_sales_excel(self.sales_file)
                     
-                    # Save the updated DataFrame
-                    df.to_excel(self.sales_file, index=False, engine='openpyxl')
-                    return True
-                else:
-                    print(f"Invalid index: {index}")
-                    return False
+                    # Check if index is valid
+                    if 0 <= index < len(df):
+                        # Remove the row at the specified index
+                        removed_sale = df.iloc[index].to_dict()
+                        df = df.drop(df.index[index])
+                        
+                        # Save the updated DataFrame
+                        self._write_sales(df)
+                        self._notify('sale_removed', removed_sale)
+                        return True
+                    else:
+                        print(f"Invalid index: {index}")
+                        return False
             else:
                 print("Sales file not found")
                 return False
@@ -120,32 +421,297 @@ class SalesManager:
             print(f"Error deleting sale: {e}")
             return False
     
+    def archive_old_sales(self, horizon_days=365):
+        """Move sales older than the horizon from the active file to the archive.
+        
+        Aggregates, fingerprints and the change feed are not touched: the
+        sales still exist, they just live in the archive now.
+        Returns the number of sales archived. Once the segments are staged,
+        a failure is raised rather than reported as 0: the move is then
+        finished or undone by _finish_archive_move.
+        """
+        cutoff = (datetime.now() - timedelta(days=horizon_days)).strftime('%Y-%m-%d')
+        with self.write_lock:
+            self._finish_archive_move()
+            try:
+                df = read_sales_excel(self.sales_file)
+                if df.empty:
+                    return 0
+                is_old = df['date'].astype(str).str[:10] < cutoff
+                if not is_old.any():
+                    return 0
+                archived = self.archive.stage(df[is_old], cutoff)
+            except Exception as e:
+                print(f"Error archiving sales: {e}")
+                self.archive.discard_pending()
+                return 0
+            # The active file loses the old sales before the index lists them,
+            # so no reader ever sees a sale in both places
+            try:
+                self._write_sales(df[~is_old])
+            except Exception:
+                # The rewrite is atomic; the old sales are still active
+                self.archive.discard_pending()
+                raise
+            self.archive.commit_pending()
+            return archived
+    
+    def _finish_archive_move(self):
+        """Complete or undo an archiving run that stopped between its steps.
+        
+        Called with write_lock held. If the active file still holds the staged
+        sales it was never rewritten, so the staged segments are dropped;
+        otherwise the rewrite happened and the segments are listed.
+        """
+        pending = self.archive.pending()
+        if pending is None:
+            return
+        df = read_sales_excel(self.sales_file)
+        dates = df['date'].astype(str).str[:10]
+        old = dates < pending['cutoff'] if pending['cutoff'] else pd.Series(True, index=df.index)
+        newest_date, newest_time = pending['newest']
+        still_active = old.sum() >= pending['rows'] and \
+            (old & (dates == newest_date) & (df['time'].astype(str) == newest_time)).any()
+        if still_active:
+            self.archive.discard_pending()
+        else:
+            self.archive.commit_pending()
+    
     def get_sales_summary(self, start_date=None, end_date=None):
         """Get summary statistics for sales"""
         try:
-            if start_date and end_date:
-                df = self.get_weekly_sales(start_date, end_date)
-            else:
-                df = self.get_all_sales()
-            
-            if df.empty:
-                return {}
-            
-            summary = {
-                'total_sales': len(df),
-                'total_revenue': df['total'].sum(),
-                'average_sale': df['total'].mean(),
-                'tortilla_total': df['tortilla_qty'].sum(),
-                'totopos_total': df['totopos_qty'].sum(),
-                'cacahuates_total': df['cacahuates_qty'].sum(),
-                'mix_total': df['mix_qty'].sum(),
-                'salted_chips_total': df['salted_chips_qty'].sum(),
-                'special_total': df['special_qty'].sum(),
-                'frequent_customers': df['frequent_customer'].sum(),
-                'supplier_sales': df['supplier'].sum()
-            }
-            
-            return summary
+            if not (start_date and end_date):
+                start_date = end_date = None
+            # Running sums over chunks, so the whole history is never in memory at once
+            return summarize_sales(self.iter_sales(start_date, end_date, columns=list(SUMMARY_SUMS)))
         except Exception as e:
             print(f"Error generating sales summary: {e}")
             return {}
+    
+    def get_demand_profile(self, start_date=None, end_date=None, hourly=False):
+        """Get weekday x time-of-day demand totals from the running profile"""
+        try:
+            return self.demand_profile.get_profile(start_date, end_date, hourly)
+        except Exception as e:
+            print(f"Error reading demand profile: {e}")
+            return pd.DataFrame()
+    
+    def get_daily_totals(self, start_date=None, end_date=None):
+        """Get pre-aggregated totals per day, oldest first"""
+        try:
+            return self.daily_rollup.get_daily_totals(start_date, end_date)
+        except Exception as e:
+            print(f"Error reading daily totals: {e}")
+            return pd.DataFrame()
+    
+    def compare_periods(self, current, previous):
+        """Compare two (start, end) periods from the daily rollups.
+        
+        Both periods come from one read of the rollup, and results are
+        cached until the rollup changes, so re-opening a comparison is free.
+        """
+        from reports import compare_periods
+        current = tuple(normalize_date(date) for date in current)
+        previous = tuple(normalize_date(date) for date in previous)
+        try:
+            self.daily_rollup.refresh()
+            key = (current, previous, self.daily_rollup.loaded_version)
+            if key not in self.comparison_cache:
+                daily_totals = self.daily_rollup.get_daily_totals(min(current[0], previous[0]), max(current[1], previous[1]))
+                if len(self.comparison_cache) >= COMPARISON_CACHE_SIZE:
+                    # Drop the oldest entry; most belong to rollup versions that are gone
+                    self.comparison_cache.pop(next(iter(self.comparison_cache)))
+                self.comparison_cache[key] = compare_periods(daily_totals, current, previous)
+            return self.comparison_cache[key]
+        except Exception as e:
+            print(f"Error comparing periods: {e}")
+            return []
+    
+    def simulate_prices(self, prices, elasticity=0.0, period='month', start_date=None, end_date=None):
+        """Revenue per period at proposed prices, repriced from the daily rollups.
+        
+        Proposed prices that cannot be simulated raise ValueError, for the
+        caller to show.
+        """
+        from pricing import simulate_prices
+        try:
+            daily_totals = self.daily_rollup.get_daily_totals(start_date, end_date)
+        except Exception as e:
+            print(f"Error simulating prices: {e}")
+            return pd.DataFrame()
+        return simulate_prices(daily_totals, prices, elasticity, period)
+    
+    def get_trend_series(self, start_date, end_date, max_points=300):
+        """Get daily revenue, tortilla kg and sale count for charting.
+        
+        Built from the daily rollups with days without sales filled in as
+        zero, then each series is downsampled to at most max_points.
+        """
+        try:
+            daily_totals = self.daily_rollup.get_daily_totals(start_date, end_date)
+            all_days = pd.date_range(pd.to_datetime(start_date), pd.to_datetime(end_date), freq='D')
+            daily_totals.index = pd.to_datetime(daily_totals['date'])
+            daily_totals = daily_totals.drop(columns='date').astype(float).reindex(all_days, fill_value=0.0)
+            return {
+                'Revenue': downsample_series(daily_totals['total'], max_points),
+                'Tortilla kg': downsample_series(daily_totals['tortilla_qty'], max_points),
+                'Sales': downsample_series(daily_totals['sales'], max_points)
+            }
+        except Exception as e:
+            print(f"Error building trend series: {e}")
+            return {}
+    
+    def get_demand_forecast(self, start_date, days=7, method='smoothing'):
+        """Forecast daily sales and product quantities per weekday"""
+        try:
+            forecaster = DemandForecaster(self.username)
+            self.daily_rollup.refresh()
+            forecaster.update(self.daily_rollup)
+            return pd.DataFrame(forecaster.forecast(start_date, days, method))
+        except Exception as e:
+            print(f"Error generating forecast: {e}")
+            return pd.DataFrame()
+    
+    @property
+    def change_seq(self):
+        """Sequence number of the latest change to this user's sales"""
+        self.change_feed.refresh()
+        return self.change_feed.last_seq
+    
+    def changes_since(self, seq):
+        """Get (latest_seq, changes) for sales added, removed or cleared after seq"""
+        try:
+            return self.change_feed.changes_since(seq)
+        except Exception as e:
+            print(f"Error reading change feed: {e}")
+            return seq, []
+    
+    def get_live_totals(self, date_str):
+        """Snapshot today's running totals at the current change sequence"""
+        return get_live_totals(self.username, date_str, self.change_feed)
+    
+    def run_audit(self, full=False):
+        """Check stored sales for wrong totals, change and quantities.
+        
+        Only sales added since the last audit's change-feed watermark are
+        checked, unless full is set or the watermark no longer applies.
+        """
+        try:
+            with self.write_lock:
+                self.change_feed.refresh()
+                feed_inode = self.change_feed.log_inode
+                seq = self.change_feed.last_seq
+                if full or not self.audit.is_current_for(feed_inode, seq):
+                    return self.audit.run_full(self.iter_sales(), seq, feed_inode)
+                latest, changes = self.change_feed.changes_since(self.audit.watermark)
+                return self.audit.run_incremental(latest, feed_inode, changes)
+        except Exception as e:
+            print(f"Error auditing sales: {e}")
+            return {}
+    
+    def get_open_shift(self):
+        """The cashier's open shift with its running tallies, or None"""
+        return self.shifts.open_shift
+    
+    def open_shift(self, opening_cash):
+        """Start a shift; False if one is already open"""
+        with self.write_lock:
+            return self.shifts.open(opening_cash)
+    
+    def close_shift(self, counted_cash, notes=""):
+        """Close the open shift against the counted cash (corte de caja)"""
+        with self.write_lock:
+            return self.shifts.close(counted_cash, notes)
+    
+    def get_shift_history(self, limit=None):
+        """Closed shifts, newest first"""
+        return self.shifts.history(limit)
+    
+    def get_stock_levels(self):
+        """Current stock per product, from the running counters"""
+        self.inventory.refresh()
+        return dict(self.inventory.levels)
+    
+    def receive_stock(self, product, quantity, note=""):
+        """Record stock received for a product"""
+        return self.inventory.receive(product, quantity, self.username, note)
+    
+    def count_stock(self, levels, note=""):
+        """Set products to physically counted levels"""
+        return self.inventory.count(levels, self.username, note)
+    
+    def get_low_stock(self):
+        """Products at or below their low-stock threshold"""
+        self.inventory.refresh()
+        return self.inventory.low_stock()
+    
+    def register_customer(self, name, phone="", notes=""):
+        """Add a customer to the registry; returns the new record or None"""
+        return self.customers.add(name, phone, notes)
+    
+    def find_customers(self, text, limit=10):
+        """Customers matching a typed ID, name or phone prefix"""
+        return self.customers.search(text, limit)
+    
+    def get_customer(self, customer_id):
+        """A customer's profile with visits, kg bought, spend and last visit"""
+        customer = self.customers.get(customer_id)
+        if customer is None:
+            return None
+        return dict(customer, **self.customer_index.summary(customer_id))
+    
+    def get_customer_history(self, customer_id):
+        """A customer's sales from every cashier, newest first, without reading the sales files"""
+        return self.customer_index.history(customer_id)
+    
+    def repair_top_sales(self):
+        """Re-read the few days whose largest-sales list lost an entry to a deletion"""
+        for date_str in self.top_sales.dirty_days():
+            with self.write_lock:
+                self.top_sales.repair(date_str, self.get_daily_sales(date_str))
+    
+    def get_leaderboards(self, start_date=None, end_date=None, n=10):
+        """Best days, busiest hours, top cashiers and largest sales for this sales file"""
+        from leaderboards import leaderboards
+        try:
+            return leaderboards([self], start_date, end_date, n)
+        except Exception as e:
+            print(f"Error building leaderboards: {e}")
+            return {}
+    
+    def replace_sales(self, df):
+        """Replace the whole sales file (used by restore) and rebuild everything derived from it"""
+        with self.write_lock:
+            self._write_sales(coerce_sales(df) if not df.empty else empty_sales_frame())
+            # The archive may have been replaced alongside the sales file
+            self.archive.index = load_json_file(self.archive.index_file, {'segments': []})
+            self.rebuild_aggregates()
+            # Audit findings describe the sales as they were; start over
+            if os.path.exists(self.audit.audit_file):
+                os.remove(self.audit.audit_file)
+            self.audit.data = {'watermark': None, 'issues': {}}
+        return True
+    
+    def rebuild_aggregates(self):
+        """Recompute every running aggregate from one read of the sales file"""
+        with self.write_lock:
+            all_sales = self.get_all_sales()
+            rebuilt = []
+            for listener in self.listeners:
+                if hasattr(listener, 'rebuild'):
+                    listener.rebuild(all_sales)
+                    rebuilt.append(type(listener).__name__)
+            # The forecast refits itself from the rebuilt daily totals
+            forecaster = DemandForecaster(self.username)
+            if os.path.exists(forecaster.state_file):
+                os.remove(forecaster.state_file)
+            return rebuilt
+    
+    def compact(self):
+        """Shrink append-only side logs without reading the sales file"""
+        with self.write_lock:
+            compacted = {}
+            for listener in self.listeners:
+                if hasattr(listener, 'compact'):
+                    compacted[type(listener).__name__] = listener.compact()
+            return compacted
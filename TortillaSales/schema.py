@@ -0,0 +1,211 @@
+"""The sales table: every column's name, type, unit and validation rule.
+
+Readers load text columns as text and convert each column once, in bulk,
+so no column type is left to pandas' guessing; writers pass new rows
+through coerce_sales before saving. Imported rows are checked with
+validate_sale on their original cells, before any conversion.
+"""
+from collections import namedtuple
+from utils import to_number, to_bool, normalize_date, normalize_time
+
+# Optional columns may be missing from older files; they read as their empty value
+SaleColumn = namedtuple('SaleColumn', ['name', 'dtype', 'unit', 'minimum', 'description', 'required'],
+                        defaults=(True,))
+
+SALE_SCHEMA = [
+    SaleColumn('date', 'str', None, None, "Sale date, YYYY-MM-DD"),
+    SaleColumn('time', 'str', None, None, "Sale time, HH:MM:SS"),
+    SaleColumn('username', 'str', None, None, "Cashier who registered the sale"),
+    SaleColumn('tortilla_qty', 'float', 'kg', 0, "Tortilla sold"),
+    SaleColumn('totopos_qty', 'float', 'units', 0, "Totopos bags sold"),
+    SaleColumn('cacahuates_qty', 'float', 'units', 0, "Cacahuates bags sold"),
+    SaleColumn('mix_qty', 'float', 'units', 0, "Mix bags sold"),
+    SaleColumn('salted_chips_qty', 'float', 'units', 0, "Salted chips bags sold"),
+    SaleColumn('special_qty', 'float', 'units', 0, "Special products sold"),
+    SaleColumn('special_price', 'float', 'MXN', 0, "Unit price of the special product"),
+    SaleColumn('frequent_customer', 'bool', None, None, "Sale to a frequent customer"),
+    SaleColumn('supplier', 'bool', None, None, "Sale to a supplier (tortilla at supplier price)"),
+    SaleColumn('total', 'float', 'MXN', 0, "Amount charged"),
+    SaleColumn('payment', 'float', 'MXN', 0, "Amount paid by the customer"),
+    SaleColumn('change', 'float', 'MXN', None, "Change given back"),
+    SaleColumn('customer_id', 'str', None, None, "Registered customer (see customers.py), '' if none", False)
+]
+
+SALE_COLUMNS = [column.name for column in SALE_SCHEMA]
+REQUIRED_COLUMNS = [column.name for column in SALE_SCHEMA if column.required]
+SCHEMA_BY_NAME = {column.name: column for column in SALE_SCHEMA}
+QUANTITY_COLUMNS = [column.name for column in SALE_SCHEMA if column.name.endswith('_qty')]
+NUMERIC_COLUMNS = [column.name for column in SALE_SCHEMA if column.dtype == 'float']
+BOOL_COLUMNS = [column.name for column in SALE_SCHEMA if column.dtype == 'bool']
+COLUMN_UNITS = {column.name: column.unit for column in SALE_SCHEMA if column.unit}
+
+PANDAS_DTYPES = {'str': object, 'float': 'float64', 'bool': 'bool'}
+
+_CONVERT = {
+    'date': normalize_date,
+    'time': normalize_time,
+    'str': lambda value: '' if value is None or value != value else str(value),
+    'float': to_number,
+    'bool': to_bool
+}
+
+def column_converter(column):
+    return _CONVERT.get(column.name) or _CONVERT[column.dtype]
+
+SALE_DTYPES = {column.name: PANDAS_DTYPES[column.dtype] for column in SALE_SCHEMA}
+# Text columns are read as text (ids and times keep their leading zeros);
+# the rest are converted a column at a time by convert_columns
+READ_DTYPES = {column.name: str for column in SALE_SCHEMA if column.dtype == 'str'}
+_TRUE_STRINGS = ['true', '1', '1.0', 'yes']
+
+def empty_sales_frame():
+    """An empty sales DataFrame with every column and its dtype"""
+    import pandas as pd
+    return pd.DataFrame({name: pd.Series(dtype=dtype) for name, dtype in SALE_DTYPES.items()})
+
+def _usecols(columns):
+    # A callable, so optional columns missing from older files are no error
+    if columns is None:
+        return None
+    wanted = set(columns)
+    return lambda name: name in wanted
+
+def read_sales_excel(path, columns=None):
+    """Read a sales workbook with every column converted per the schema"""
+    import pandas as pd
+    df = pd.read_excel(path, engine='openpyxl', dtype=READ_DTYPES, usecols=_usecols(columns))
+    return _set_dtypes(convert_columns(df))
+
+def read_sales_csv(path, compression='infer', columns=None):
+    """Read a sales CSV (or gzip CSV) with every column converted per the schema"""
+    import pandas as pd
+    df = pd.read_csv(path, compression=compression, dtype=READ_DTYPES, usecols=_usecols(columns))
+    return _set_dtypes(convert_columns(df))
+
+def iter_sales_csv(path, chunk_rows, compression='infer', columns=None):
+    """Read a sales CSV chunk_rows rows at a time, converted per the schema"""
+    import pandas as pd
+    with pd.read_csv(path, compression=compression, dtype=READ_DTYPES,
+                     usecols=_usecols(columns), chunksize=chunk_rows) as reader:
+        for chunk in reader:
+            yield _set_dtypes(convert_columns(chunk))
+
+def read_raw_sales(path, csv=False):
+    """Read an import file with its cells as written, for validate_sale"""
+    import pandas as pd
+    if csv:
+        return pd.read_csv(path, dtype=object)
+    return pd.read_excel(path, engine='openpyxl', dtype=object)
+
+def _cut(text, length):
+    # Slicing is a Python loop per value; skip it when nothing is too long
+    return text.str[:length] if (text.str.len() > length).any() else text
+
+def _convert_series(series, column):
+    """What column_converter does to each cell, for a whole column at once"""
+    import pandas as pd
+    from pandas.api.types import is_bool_dtype, is_datetime64_any_dtype, is_numeric_dtype
+    if column.dtype == 'float':
+        return pd.to_numeric(series, errors='coerce').fillna(0.0).astype('float64')
+    if column.dtype == 'bool':
+        if is_bool_dtype(series.dtype):
+            return series
+        if is_numeric_dtype(series.dtype):
+            return series.fillna(0) != 0
+        if series.map(type).eq(str).all():
+            return series.str.strip().str.lower().isin(_TRUE_STRINGS)
+        return series.map(to_bool)
+    missing = series.isna()
+    if column.name == 'date':
+        if is_datetime64_any_dtype(series.dtype):
+            text = series.dt.strftime('%Y-%m-%d')
+        else:
+            text = _cut(series.astype(str), 10)
+    elif column.name == 'time':
+        if is_datetime64_any_dtype(series.dtype):
+            text = series.dt.strftime('%H:%M:%S')
+        else:
+            text = series.astype(str)
+            if text.str.contains(' ', regex=False).any():
+                text = text.str.split(' ').str[-1]
+            text = _cut(text, 8)
+    else:
+        return series.astype(object).where(~missing, '').astype(str).astype(object)
+    # normalize_date/normalize_time turn an empty cell into 'nan'
+    return text.astype(object).where(~missing, 'nan')
+
+def convert_columns(df):
+    """Convert every schema column present in df, one column at a time"""
+    df = df.copy()
+    for column in SALE_SCHEMA:
+        if column.name in df.columns:
+            df[column.name] = _convert_series(df[column.name], column)
+    return df
+
+def _set_dtypes(df):
+    # Fix the dtypes of converted columns (and of the empty frame a
+    # header-only file gives) without re-parsing
+    present = {name: dtype for name, dtype in SALE_DTYPES.items() if name in df.columns}
+    df = df.astype(present)
+    # Text columns of an empty frame may still hold NaN
+    for column in SALE_SCHEMA:
+        if column.dtype == 'str' and column.name in df.columns and df[column.name].hasnans:
+            df[column.name] = df[column.name].fillna('')
+    return df
+
+def coerce_sales(df):
+    """Bring new rows to the schema before they are written: all columns, right types"""
+    df = convert_columns(df)
+    for column in SALE_SCHEMA:
+        if column.name not in df.columns:
+            df[column.name] = column_converter(column)(None) if column.dtype != 'str' else ''
+    extra = [name for name in df.columns if name not in SALE_DTYPES]
+    return _set_dtypes(df[SALE_COLUMNS + extra])
+
+def project_sales(df, columns):
+    """Select columns, filling optional ones an older file lacks with their empty value"""
+    df = df.copy() if any(name not in df.columns for name in columns) else df
+    for name in columns:
+        if name not in df.columns:
+            column = SCHEMA_BY_NAME[name]
+            df[name] = column_converter(column)(None) if column.dtype != 'str' else ''
+    return df[list(columns)]
+
+def sale_from_row(row):
+    """Build a sale record from an imported spreadsheet row"""
+    return {column.name: column_converter(column)(row.get(column.name)) for column in SALE_SCHEMA}
+
+def validate_sale(sale_data):
+    """Check a sale against the schema; returns (ok, message)"""
+    for column in SALE_SCHEMA:
+        if column.name not in sale_data:
+            if not column.required:
+                continue
+            return False, f"Missing required field: {column.name}"
+        value = sale_data[column.name]
+        if column.dtype == 'float':
+            try:
+                value = float(value)
+            except (ValueError, TypeError):
+                return False, f"Invalid numeric value for field: {column.name}"
+            if column.minimum is not None and value < column.minimum:
+                if column.name in QUANTITY_COLUMNS:
+                    return False, f"Quantity cannot be negative: {column.name}"
+                return False, f"Value cannot be below {column.minimum}: {column.name}"
+    return True, "Valid"
+
+def check_import_rows(df):
+    """Validate raw import rows (from read_raw_sales) and build sales from the good ones.
+
+    Returns (sales, rejected); rejected holds (spreadsheet row, message)
+    pairs, the header being row 1.
+    """
+    sales = []
+    rejected = []
+    for position, row in enumerate(df.to_dict('records')):
+        ok, message = validate_sale(row)
+        if ok:
+            sales.append(sale_from_row(row))
+        else:
+            rejected.append((position + 2, message))
+    return sales, rejected
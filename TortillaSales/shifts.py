@@ -0,0 +1,164 @@
+import json
+import os
+from datetime import datetime
+from daily_rollup import PRODUCT_COLUMNS
+from utils import to_number, normalize_date, normalize_time, load_json_file, save_json_file, file_version
+
+TALLY_COLUMNS = ['sales', 'revenue', 'payments', 'change_given',
+                 'regular_sales', 'regular_revenue', 'supplier_sales', 'supplier_revenue'] + PRODUCT_COLUMNS
+
+class ShiftTracker:
+    """Cashier shifts with running tallies for the end-of-shift cash count.
+
+    The open shift's tallies are updated in O(1) as each sale is stored, so
+    closing a shift never rescans the sales file. Closed shifts are appended
+    to shift_history_{username}.jsonl.
+    """
+
+    def __init__(self, username="default"):
+        self.username = username
+        self.shift_file = f"shift_{username}.json"
+        self.history_file = f"shift_history_{username}.jsonl"
+        self.loaded_version = file_version(self.shift_file)
+        self.data = load_json_file(self.shift_file, {'open': None})
+
+    def refresh(self):
+        """Reload the open shift if another SalesManager changed it"""
+        version = file_version(self.shift_file)
+        if version is not None and version != self.loaded_version:
+            self.data = load_json_file(self.shift_file, self.data)
+            self.loaded_version = version
+
+    def save(self):
+        saved = save_json_file(self.shift_file, self.data)
+        self.loaded_version = file_version(self.shift_file)
+        return saved
+
+    @property
+    def open_shift(self):
+        self.refresh()
+        return self.data['open']
+
+    def open(self, opening_cash):
+        """Start a shift with the cash counted into the drawer"""
+        self.refresh()
+        if self.data['open'] is not None:
+            return False
+        now = datetime.now()
+        self.data['open'] = {
+            'id': now.strftime('%Y%m%d%H%M%S'),
+            'username': self.username,
+            'opened_at': now.strftime('%Y-%m-%d %H:%M:%S'),
+            'opening_cash': float(opening_cash),
+            'tallies': {column: 0 for column in TALLY_COLUMNS}
+        }
+        return self.save()
+
+    def _in_shift(self, sale):
+        sale_moment = f"{normalize_date(sale.get('date'))} {normalize_time(sale.get('time'))}"
+        return sale_moment >= self.data['open']['opened_at']
+
+    def _apply(self, sale, sign):
+        tallies = self.data['open']['tallies']
+        total = to_number(sale.get('total', 0))
+        tallies['sales'] += sign
+        tallies['revenue'] += sign * total
+        tallies['payments'] += sign * to_number(sale.get('payment', 0))
+        tallies['change_given'] += sign * to_number(sale.get('change', 0))
+        kind = 'supplier' if bool(sale.get('supplier')) else 'regular'
+        tallies[f'{kind}_sales'] += sign
+        tallies[f'{kind}_revenue'] += sign * total
+        for column in PRODUCT_COLUMNS:
+            tallies[column] += sign * to_number(sale.get(column, 0))
+
+    def sales_added(self, sales):
+        if self.data['open'] is None:
+            return
+        counted = [sale for sale in sales if self._in_shift(sale)]
+        for sale in counted:
+            self._apply(sale, 1)
+        if counted:
+            self.save()
+
+    def sale_removed(self, sale):
+        if self.data['open'] is not None and self._in_shift(sale):
+            self._apply(sale, -1)
+            self.save()
+
+    def sales_cleared(self):
+        if self.data['open'] is not None:
+            self.data['open']['tallies'] = {column: 0 for column in TALLY_COLUMNS}
+            self.save()
+
+    @staticmethod
+    def expected_cash(shift):
+        """Cash that should be in the drawer: opening cash plus payments minus change"""
+        tallies = shift['tallies']
+        return shift['opening_cash'] + tallies['payments'] - tallies['change_given']
+
+    def close(self, counted_cash, notes=""):
+        """Close the open shift against the counted cash and record it"""
+        self.refresh()
+        shift = self.data['open']
+        if shift is None:
+            return None
+        shift = dict(shift)
+        shift['closed_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        shift['expected_cash'] = round(self.expected_cash(shift), 2)
+        shift['counted_cash'] = float(counted_cash)
+        shift['difference'] = round(shift['counted_cash'] - shift['expected_cash'], 2)
+        shift['notes'] = notes
+        with open(self.history_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(shift) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.data['open'] = None
+        self.save()
+        return shift
+
+    def history(self, limit=None):
+        """Closed shifts, newest first"""
+        if not os.path.exists(self.history_file):
+            return []
+        with open(self.history_file, 'r', encoding='utf-8') as f:
+            shifts = [json.loads(line) for line in f if line.strip()]
+        shifts.reverse()
+        return shifts[:limit] if limit else shifts
+
+def shift_report_text(shift):
+    """Build the printable corte de caja for a shift"""
+    tallies = shift['tallies']
+    expected = shift.get('expected_cash', ShiftTracker.expected_cash(shift))
+    lines = []
+    lines.append("=" * 40)
+    lines.append("TORTILLA BUSINESS - SHIFT CLOSE")
+    lines.append("=" * 40)
+    lines.append(f"Cashier: {shift['username']}")
+    lines.append(f"Opened: {shift['opened_at']}")
+    lines.append(f"Closed: {shift.get('closed_at', 'still open')}")
+    lines.append("-" * 40)
+    lines.append("PRODUCTS:")
+    lines.append(f"Tortillas: {tallies['tortilla_qty']:.2f} kg")
+    lines.append(f"Totopos: {int(tallies['totopos_qty'])} units")
+    lines.append(f"Cacahuates: {int(tallies['cacahuates_qty'])} units")
+    lines.append(f"Mix: {int(tallies['mix_qty'])} units")
+    lines.append(f"Salted Chips: {int(tallies['salted_chips_qty'])} units")
+    lines.append(f"Special: {int(tallies['special_qty'])} units")
+    lines.append("-" * 40)
+    lines.append("SALES:")
+    lines.append(f"Regular: {tallies['regular_sales']} sales - ${tallies['regular_revenue']:.2f}")
+    lines.append(f"Supplier: {tallies['supplier_sales']} sales - ${tallies['supplier_revenue']:.2f}")
+    lines.append(f"Total: {tallies['sales']} sales - ${tallies['revenue']:.2f}")
+    lines.append("-" * 40)
+    lines.append("CASH:")
+    lines.append(f"Opening Cash: ${shift['opening_cash']:.2f}")
+    lines.append(f"Payments Received: ${tallies['payments']:.2f}")
+    lines.append(f"Change Given: ${tallies['change_given']:.2f}")
+    lines.append(f"EXPECTED IN DRAWER: ${expected:.2f}")
+    if 'counted_cash' in shift:
+        lines.append(f"COUNTED: ${shift['counted_cash']:.2f}")
+        lines.append(f"DIFFERENCE: ${shift['difference']:+.2f}")
+    if shift.get('notes'):
+        lines.append(f"Notes: {shift['notes']}")
+    lines.append("=" * 40)
+    return "\n".join(lines)
@@ -0,0 +1,76 @@
+"""Import-time profiling for the app's cold start.
+
+Run `python app.py --profile-startup` to print how long each module takes
+to import on a cold interpreter, split into the modules the login screen
+needs and the heavy ones that are only loaded by the screens that use them.
+"""
+import os
+import subprocess
+import sys
+
+# Modules imported before the login screen is drawn
+STARTUP_MODULES = ['streamlit', 'utils', 'schema', 'auth', 'sale_outbox', 'inventory']
+
+# Modules deferred until a screen needs them
+LAZY_MODULES = ['pandas', 'openpyxl', 'sales_manager', 'altair', 'sqlalchemy', 'database']
+
+# Budget for the app's own login-path imports, excluding streamlit itself
+STARTUP_IMPORT_BUDGET_MS = 150
+
+def measure_imports(modules, preload=()):
+    """Import modules in a fresh interpreter and return [(module, ms)].
+
+    Modules in preload are imported first and not reported, so the figures
+    show only the extra cost of each module on top of them. Modules that
+    are not installed are reported as None.
+    """
+    lines = []
+    for name in list(preload) + list(modules):
+        lines.append(f"try:\n    import {name}\nexcept ImportError:\n    print({name!r})")
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', "\n".join(lines)],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True
+    )
+    missing = set(result.stdout.split())
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, package = line.split('|')
+        # Top-level imports have no indentation in the package column
+        if package.startswith(' ') and not package.startswith('  '):
+            name = package.strip()
+            if name in modules and cumulative.strip().isdigit():
+                timings[name] = int(cumulative.strip()) / 1000
+    return [(name, None if name in missing else timings.get(name, 0.0)) for name in modules]
+
+def format_timing(name, ms):
+    if ms is None:
+        return f"{name:<20} {'not installed':>13}"
+    return f"{name:<20} {ms:>10.1f} ms"
+
+def print_startup_profile():
+    """Print the import-time breakdown and check it against the budget"""
+    print("STARTUP IMPORTS (login screen)")
+    print("-" * 40)
+    startup = measure_imports(STARTUP_MODULES)
+    for name, ms in startup:
+        print(format_timing(name, ms))
+    app_ms = sum(ms or 0.0 for name, ms in startup if name != 'streamlit')
+    total_ms = sum(ms or 0.0 for _, ms in startup)
+    print("-" * 40)
+    print(f"{'total':<20} {total_ms:>10.1f} ms")
+
+    print("")
+    print("LAZY IMPORTS (loaded by the screens that need them)")
+    print("-" * 40)
+    for name, ms in measure_imports(LAZY_MODULES, preload=STARTUP_MODULES):
+        print(format_timing(name, ms))
+
+    print("")
+    within_budget = app_ms <= STARTUP_IMPORT_BUDGET_MS
+    print(f"App imports on the login path: {app_ms:.1f} ms "
+          f"(budget {STARTUP_IMPORT_BUDGET_MS} ms) - {'OK' if within_budget else 'OVER BUDGET'}")
+    return 0 if within_budget else 1
@@ -0,0 +1,813 @@
+"""Local store server: one process owns the sales files, app processes talk to it.
+
+Usage:
+    python store_server.py [--socket store.sock] [--data-dir DIR]
+
+Then start every Streamlit process with TORTILLA_STORE_SOCKET pointing at
+the same socket; create_sales_manager hands out StoreClients instead of
+SalesManagers. The server keeps each cashier's active sales in memory
+(revalidated against the file version, so a CLI run is still picked up)
+and answers sale reads and the sales summary from there. Every write goes
+through one writer thread, which folds consecutive new sales for a cashier
+into a single workbook rewrite. Writers outside the server (the CLI, app
+processes started without the socket) are ordered against it by the sales
+file's lock (see SalesFileLock). Read-only calls run on the requesting
+connection's thread and never wait behind a write.
+
+Only the methods and attributes in READ_ONLY_CALLS, QUEUED_CALLS and
+EXPOSED_ATTRIBUTES can be reached. Every request carries a session token
+(see auth.py): a cashier's token reaches only that cashier's sales, an
+administrator's any cashier's; the app's background work and the tools use
+short-lived service tokens signed with the same secret.
+
+Wire format: every message is a header (one byte opcode or status, four
+byte length, network order) followed by the payload. Requests start with
+the token and the username (each a two byte length and UTF-8). Sales
+travel as packed columns (see pack_frame); other method calls and results
+as JSON with DataFrames, Series and dates tagged. POSIX only (Unix domain
+sockets and flock).
+"""
+import argparse
+import base64
+import fcntl
+import json
+import os
+import queue
+import signal
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import types
+from datetime import date, datetime
+import numpy as np
+import pandas as pd
+from sales_manager import SalesManager, CHUNK_ROWS, summarize_sales, SUMMARY_SUMS
+from schema import read_sales_excel, coerce_sales
+from auth import issue_service_token, verify_service_token, verify_session_token
+from utils import normalize_date, load_json_file, file_version
+
+DEFAULT_SOCKET = "store.sock"
+
+# Everything a StoreClient may reach on the server's SalesManager, by dotted
+# path; sale reads and new sales have messages of their own. Anything not
+# listed (listeners, archive.clear, write_lock, ...) is refused.
+#
+# SalesManager methods that only read. They run on the calling connection's
+# thread, on that thread's own SalesManager.
+READ_ONLY_CALLS = {
+    'get_demand_profile', 'get_daily_totals', 'compare_periods', 'simulate_prices',
+    'get_trend_series', 'get_demand_forecast', 'changes_since', 'get_live_totals',
+    'get_open_shift', 'get_shift_history', 'get_stock_levels', 'get_low_stock',
+    'find_customers', 'get_customer', 'get_customer_history', 'get_leaderboards'
+}
+# Calls queued for the writer thread and run there in arrival order
+QUEUED_CALLS = {
+    'get_sales_summary', 'classify_sales', 'import_sales', 'delete_all_sales', 'delete_sale_by_index',
+    'archive_old_sales', 'run_audit', 'repair_top_sales', 'replace_sales', 'rebuild_aggregates', 'compact',
+    'open_shift', 'close_shift', 'receive_stock', 'count_stock', 'register_customer',
+    'archive.verify', 'inventory.set_threshold', 'inventory.recent_movements', 'inventory.needs_rebuild',
+    'shifts.expected_cash', 'fingerprint_index.day_digests'
+}
+# Attributes that can be read; the objects holding exposed calls are listed
+# so clients can reach their members
+EXPOSED_ATTRIBUTES = {
+    'username', 'change_seq', 'archive', 'archive.segments', 'archive.max_date',
+    'audit', 'audit.watermark', 'audit.issues', 'audit.data',
+    'inventory', 'inventory.thresholds', 'shifts', 'fingerprint_index'
+}
+SOCKET_ENV = "TORTILLA_STORE_SOCKET"
+
+HEADER = struct.Struct('!BI')
+NAME_LENGTH = struct.Struct('!H')
+FRAME_HEADER_LENGTH = struct.Struct('<I')
+
+# Request opcodes
+PING = 1
+ADD_SALES = 2
+READ_ALL = 3
+READ_DAY = 4
+READ_RANGE = 5
+ITER_SALES = 6
+CALL = 7
+ATTR = 8
+
+# Response statuses
+OK = 0
+ERROR = 1
+CHUNK = 2
+END = 3
+
+# Length marking a missing string in a packed column
+_NONE_LENGTH = 0xFFFFFFFF
+
+class StoreError(Exception):
+    """The store server reported an error or could not be reached"""
+
+def _column_kind(series):
+    dtype = series.dtype
+    if pd.api.types.is_bool_dtype(dtype):
+        return 'b1'
+    if pd.api.types.is_integer_dtype(dtype):
+        return 'i8'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'f8'
+    if pd.api.types.is_datetime64_dtype(dtype):
+        return 'M8'
+    return 'U'
+
+def _pack_column(series, kind):
+    if kind == 'b1':
+        return series.to_numpy(dtype='u1').tobytes()
+    if kind == 'i8':
+        return series.to_numpy(dtype='<i8').tobytes()
+    if kind == 'f8':
+        return series.to_numpy(dtype='<f8').tobytes()
+    if kind == 'M8':
+        return series.to_numpy(dtype='datetime64[ns]').view('<i8').tobytes()
+    encoded = [None if value is None or (isinstance(value, float) and value != value) else str(value).encode('utf-8')
+               for value in series.tolist()]
+    lengths = np.array([_NONE_LENGTH if value is None else len(value) for value in encoded], dtype='<u4')
+    return lengths.tobytes() + b"".join(value for value in encoded if value is not None)
+
+def _unpack_column(data, offset, rows, kind):
+    """(values, next offset) for one packed column"""
+    if kind == 'U':
+        lengths = np.frombuffer(data, dtype='<u4', count=rows, offset=offset)
+        position = offset + 4 * rows
+        values = np.empty(rows, dtype=object)
+        for row, length in enumerate(lengths.tolist()):
+            if length == _NONE_LENGTH:
+                values[row] = None
+            else:
+                values[row] = bytes(data[position:position + length]).decode('utf-8')
+                position += length
+        return values, position
+    dtype = {'b1': 'u1', 'i8': '<i8', 'f8': '<f8', 'M8': '<i8'}[kind]
+    values = np.frombuffer(data, dtype=dtype, count=rows, offset=offset).copy()
+    if kind == 'b1':
+        values = values.astype(bool)
+    elif kind == 'M8':
+        values = values.view('datetime64[ns]')
+    return values, offset + values.nbytes
+
+def pack_frame(df):
+    """Encode a DataFrame column by column.
+
+    A small JSON header names the columns and their kinds; each column then
+    follows as one fixed-width array (float64, int64, bool, datetime) or,
+    for text, an array of byte lengths and the UTF-8 bytes. Integer row
+    labels are kept as they are; any other index is sent as leading columns.
+    """
+    columns = [df.iloc[:, position] for position in range(df.shape[1])]
+    names = list(df.columns)
+    index = None
+    if df.index.nlevels == 1 and pd.api.types.is_integer_dtype(df.index.dtype):
+        labels = df.index.to_numpy(dtype='<i8').tobytes()
+    else:
+        index = list(df.index.names)
+        columns = [pd.Series(df.index.get_level_values(level)) for level in range(df.index.nlevels)] + columns
+        names = [f"__index_{level}__" for level in range(df.index.nlevels)] + names
+        labels = b""
+    kinds = [_column_kind(column) for column in columns]
+    # Text columns keep their dtype (object or pandas' string dtype)
+    described = [[name, kind, str(column.dtype) if kind == 'U' else None] for name, kind, column in zip(names, kinds, columns)]
+    header = json.dumps({'rows': len(df), 'columns': described, 'index': index}, default=_encode_default).encode('utf-8')
+    parts = [FRAME_HEADER_LENGTH.pack(len(header)), header, labels]
+    parts += [_pack_column(column, kind) for column, kind in zip(columns, kinds)]
+    return b"".join(parts)
+
+def unpack_frame(data):
+    """Decode a DataFrame encoded by pack_frame"""
+    header_length, = FRAME_HEADER_LENGTH.unpack_from(data)
+    offset = FRAME_HEADER_LENGTH.size + header_length
+    header = json.loads(bytes(data[FRAME_HEADER_LENGTH.size:offset]), object_hook=_decode_hook)
+    rows = header['rows']
+    labels = None
+    if header['index'] is None:
+        labels = np.frombuffer(data, dtype='<i8', count=rows, offset=offset)
+        offset += labels.nbytes
+    values = []
+    for name, kind, dtype in header['columns']:
+        column, offset = _unpack_column(data, offset, rows, kind)
+        values.append(pd.Series(column, dtype=dtype))
+    names = [name for name, _, _ in header['columns']]
+    df = pd.DataFrame({position: column for position, column in enumerate(values)}, index=pd.RangeIndex(rows))
+    df.columns = names
+    if labels is not None:
+        df.index = pd.Index(labels)
+    else:
+        levels = len(header['index'])
+        index = pd.MultiIndex.from_arrays([df.iloc[:, level] for level in range(levels)], names=header['index'])
+        df = df.iloc[:, levels:]
+        df.index = index if levels > 1 else index.get_level_values(0)
+    return df
+
+def _encode_default(value):
+    # Tagged forms of what json cannot encode; TypeError for anything else
+    if isinstance(value, pd.DataFrame):
+        return {'__frame__': base64.b64encode(pack_frame(value)).decode('ascii')}
+    if isinstance(value, pd.Series):
+        return {'__series__': base64.b64encode(pack_frame(pd.DataFrame({'values': value}))).decode('ascii'),
+                'name': value.name}
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if value is pd.NaT:
+        return None
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, date):
+        return {'__date__': value.isoformat()}
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    raise TypeError(f"{type(value).__name__} cannot be sent to the store")
+
+def _decode_hook(obj):
+    if '__frame__' in obj:
+        return unpack_frame(base64.b64decode(obj['__frame__']))
+    if '__series__' in obj:
+        return unpack_frame(base64.b64decode(obj['__series__']))['values'].rename(obj['name'])
+    if '__datetime__' in obj:
+        return pd.Timestamp(obj['__datetime__'])
+    if '__date__' in obj:
+        return date.fromisoformat(obj['__date__'])
+    return obj
+
+def _dumps(value):
+    return json.dumps(value, default=_encode_default).encode('utf-8')
+
+def _loads(data):
+    return json.loads(bytes(data), object_hook=_decode_hook)
+
+def encode_value(value):
+    """A method result: packed columns for a DataFrame, tagged JSON for anything else"""
+    if isinstance(value, pd.DataFrame):
+        return b"F" + pack_frame(value)
+    return b"J" + _dumps(value)
+
+def decode_value(data):
+    if data[:1] == b"F":
+        return unpack_frame(memoryview(data)[1:])
+    return _loads(memoryview(data)[1:])
+
+def _send(sock, code, payload):
+    sock.sendall(HEADER.pack(code, len(payload)) + payload)
+
+def _receive_exactly(sock, size):
+    data = bytearray(size)
+    view = memoryview(data)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if not count:
+            raise ConnectionError("store connection closed")
+        received += count
+    return data
+
+def _receive(sock):
+    code, length = HEADER.unpack(_receive_exactly(sock, HEADER.size))
+    return code, _receive_exactly(sock, length)
+
+def _pack_name(name):
+    name = name.encode('utf-8')
+    return NAME_LENGTH.pack(len(name)) + name
+
+def _unpack_name(payload):
+    length, = NAME_LENGTH.unpack_from(payload)
+    end = NAME_LENGTH.size + length
+    return bytes(payload[NAME_LENGTH.size:end]).decode('utf-8'), memoryview(payload)[end:]
+
+def _pack_caller(token, username):
+    return _pack_name(token) + _pack_name(username)
+
+def _unpack_caller(payload):
+    """(token, username, body) from the start of a request"""
+    token, rest = _unpack_name(payload)
+    username, body = _unpack_name(rest)
+    return token, username, body
+
+class _Job:
+    """A write or method call waiting for the writer thread"""
+
+    def __init__(self, kind, username, payload):
+        self.kind = kind
+        self.username = username
+        self.payload = payload
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class _RequestHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        store = self.server.store
+        while True:
+            try:
+                opcode, payload = _receive(self.request)
+            except OSError:
+                return
+            if store.closed:
+                # Dropping the connection sends the client to the new server, if any
+                return
+            try:
+                store.dispatch(opcode, payload, lambda status, data: _send(self.request, status, data))
+            except Exception as e:
+                try:
+                    _send(self.request, ERROR, f"{type(e).__name__}: {e}".encode('utf-8'))
+                except OSError:
+                    return
+
+class StoreServer:
+    """Owns the sales files of every cashier and serves them over a Unix socket.
+
+    Sale reads come from each cashier's active sales held in memory; the
+    cached frame is reused as long as the sales file and archive index keep
+    the version it was read at. Calls in READ_ONLY_CALLS and attribute
+    reads run on the connection's thread, each thread with its own
+    SalesManager that sees the writer's changes through the files, as a
+    separate app process would. Everything else (new sales, deletes,
+    shifts, stock, customers, audits) runs on one writer thread, in
+    arrival order. Sales queued while a rewrite is in progress are written
+    together by the next one.
+    """
+
+    def __init__(self, socket_path=DEFAULT_SOCKET):
+        self.socket_path = socket_path
+        self.lock_file = f"{socket_path}.lock"
+        self.managers = {}
+        self.managers_lock = threading.Lock()
+        self.states = {}
+        self.states_lock = threading.Lock()
+        self.readers = threading.local()
+        self.jobs = queue.Queue()
+        self.server = None
+        self.lock_handle = None
+        self.writer = None
+        self.closed = False
+
+    def start(self):
+        """Bind the socket and start the writer; serve_forever() then answers clients"""
+        self.lock_handle = open(self.lock_file, 'a')
+        try:
+            fcntl.flock(self.lock_handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self.lock_handle.close()
+            raise StoreError(f"Another store server is using {self.socket_path}")
+        # We hold the lock, so a socket file left behind is from a server that died
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        self.server = socketserver.ThreadingUnixStreamServer(self.socket_path, _RequestHandler)
+        self.server.daemon_threads = True
+        self.server.store = self
+        self.writer = threading.Thread(target=self._write_loop, name="store-writer", daemon=True)
+        self.writer.start()
+        return self
+
+    def serve_forever(self):
+        self.server.serve_forever()
+
+    def close(self):
+        """Stop answering, finish queued writes and release the socket"""
+        self.closed = True
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+        self.jobs.put(None)
+        if self.writer is not None:
+            self.writer.join()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        if self.lock_handle is not None:
+            self.lock_handle.close()
+
+    def _manager(self, username):
+        with self.managers_lock:
+            if username not in self.managers:
+                self.managers[username] = SalesManager(username)
+            return self.managers[username]
+
+    def _reader(self, username):
+        """This connection thread's SalesManager for read-only calls"""
+        managers = getattr(self.readers, 'managers', None)
+        if managers is None:
+            managers = self.readers.managers = {}
+        if username not in managers:
+            managers[username] = SalesManager(username)
+        return managers[username]
+
+    def _version(self, manager):
+        return file_version(manager.sales_file), file_version(manager.archive.index_file)
+
+    def _set_state(self, username, version, active):
+        state = {
+            'version': version,
+            'active': active,
+            'dates': active['date'].astype(str).str[:10],
+            'views': {}
+        }
+        with self.states_lock:
+            self.states[username] = state
+        return state
+
+    def _state(self, username):
+        """The cashier's in-memory sales, re-read only if the files changed"""
+        manager = self._manager(username)
+        version = self._version(manager)
+        with self.states_lock:
+            state = self.states.get(username)
+        if state is not None and state['version'] == version:
+            return state
+        if state is None or state['version'][1] != version[1]:
+            # Archived or restored elsewhere; the manager's index is out of date
+            manager.archive.index = load_json_file(manager.archive.index_file, {'segments': []})
+        return self._set_state(username, version, read_sales_excel(manager.sales_file))
+
+    def read_all(self, username, recent_only=False):
+        """get_all_sales from memory; the sorted result is kept until the next change"""
+        state = self._state(username)
+        key = 'recent' if recent_only else 'all'
+        view = state['views'].get(key)
+        if view is None:
+            df = state['active'] if recent_only else self._manager(username)._with_archive(state['active'])
+            view = df.sort_values(['date', 'time'], ascending=[False, False])
+            state['views'][key] = view
+        return view
+
+    def _with_archive(self, username, start, end):
+        state = self._state(username)
+        manager = self._manager(username)
+        if manager.archive.covers(start):
+            archived = manager.archive.read_range(start, end)
+            if not archived.empty:
+                df = pd.concat([archived, state['active']], ignore_index=True)
+                return df, df['date'].astype(str).str[:10]
+        return state['active'], state['dates']
+
+    def read_day(self, username, date_str):
+        df, dates = self._with_archive(username, date_str, date_str)
+        return df[dates == date_str].sort_values('time', ascending=False)
+
+    def read_range(self, username, start, end):
+        df, dates = self._with_archive(username, start, end)
+        return df[(dates >= start) & (dates <= end)].sort_values(['date', 'time'], ascending=[False, False])
+
+    def sales_summary(self, username, start_date=None, end_date=None):
+        """get_sales_summary from the in-memory sales (and any archived ones in range)"""
+        try:
+            if not (start_date and end_date):
+                start_date = end_date = None
+            df, dates = self._with_archive(username, start_date, end_date)
+            if start_date is not None:
+                df = df[(dates >= start_date) & (dates <= end_date)]
+            return summarize_sales([df[list(SUMMARY_SUMS)]])
+        except Exception as e:
+            print(f"Error generating sales summary: {e}")
+            return {}
+
+    def _submit(self, kind, username, payload):
+        if self.closed:
+            raise StoreError("Store server is shutting down")
+        job = _Job(kind, username, payload)
+        self.jobs.put(job)
+        job.done.wait()
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def _write_loop(self):
+        while True:
+            jobs = [self.jobs.get()]
+            while True:
+                try:
+                    jobs.append(self.jobs.get_nowait())
+                except queue.Empty:
+                    break
+            position = 0
+            while position < len(jobs):
+                job = jobs[position]
+                if job is None:
+                    return
+                end = position + 1
+                if job.kind == 'add':
+                    # Consecutive new sales for the same cashier share one rewrite
+                    while end < len(jobs) and jobs[end] is not None and jobs[end].kind == 'add' \
+                            and jobs[end].username == job.username:
+                        end += 1
+                    self._add_sales(jobs[position:end])
+                else:
+                    self._run(job)
+                position = end
+
+    def _add_sales(self, jobs):
+        username = jobs[0].username
+        try:
+            manager = self._manager(username)
+            new_sales = pd.concat([job.payload for job in jobs], ignore_index=True)
+            with manager.write_lock:
+                updated = manager.append_sales(new_sales, self._state(username)['active'])
+                self._set_state(username, self._version(manager), updated)
+            result = True
+        except Exception as e:
+            print(f"Error adding sales: {e}")
+            result = False
+        for job in jobs:
+            job.result = result
+            job.done.set()
+
+    def _resolve(self, manager, path):
+        target = manager
+        for name in path:
+            target = getattr(target, name)
+        return target
+
+    def _call(self, manager, request):
+        if ".".join(request['path']) not in READ_ONLY_CALLS | QUEUED_CALLS:
+            raise AttributeError(f"{'.'.join(request['path'])} is not exposed by the store")
+        result = self._resolve(manager, request['path'])(*request['args'], **request['kwargs'])
+        if isinstance(result, types.GeneratorType):
+            result = list(result)
+        return result
+
+    def _attribute(self, manager, request):
+        key = ".".join(request['path'])
+        if key in READ_ONLY_CALLS or key in QUEUED_CALLS:
+            return {'kind': 'callable'}
+        if key not in EXPOSED_ATTRIBUTES:
+            return {'kind': 'missing'}
+        try:
+            value = self._resolve(manager, request['path'])
+        except AttributeError:
+            return {'kind': 'missing'}
+        try:
+            _dumps(value)
+        except (TypeError, ValueError):
+            return {'kind': 'object'}
+        return {'kind': 'value', 'value': value}
+
+    def _run(self, job):
+        try:
+            job.result = self._call(self._manager(job.username), job.payload)
+        except Exception as e:
+            job.error = e
+        job.done.set()
+
+    def _authorize(self, token, username):
+        """Refuse a request whose token may not act on username's sales"""
+        if verify_service_token(token):
+            return
+        session = verify_session_token(token)
+        if session is None:
+            raise PermissionError("Not signed in, or the session expired")
+        if not session['is_admin'] and session['username'] != username:
+            raise PermissionError(f"{session['username']} cannot use {username}'s sales")
+
+    def dispatch(self, opcode, payload, send):
+        """Answer one request; send(status, data) writes a response message"""
+        token, username, body = _unpack_caller(payload)
+        self._authorize(token, username)
+        if opcode == PING:
+            send(OK, b"")
+        elif opcode == ADD_SALES:
+            send(OK, b"\x01" if self._submit('add', username, unpack_frame(body)) else b"\x00")
+        elif opcode == READ_ALL:
+            send(OK, pack_frame(self.read_all(username, bytes(body) == b"\x01")))
+        elif opcode == READ_DAY:
+            send(OK, pack_frame(self.read_day(username, bytes(body).decode('utf-8'))))
+        elif opcode == READ_RANGE:
+            start, end = bytes(body).decode('utf-8').split("\0")
+            send(OK, pack_frame(self.read_range(username, start, end)))
+        elif opcode == ITER_SALES:
+            # Streamed from the files on this connection's thread; writes are not held up
+            for chunk in self._manager(username).iter_sales(**_loads(body)):
+                send(CHUNK, pack_frame(chunk))
+            send(END, b"")
+        elif opcode == CALL:
+            request = _loads(body)
+            if request['path'] == ['get_sales_summary']:
+                result = self.sales_summary(username, *request['args'], **request['kwargs'])
+            elif ".".join(request['path']) in READ_ONLY_CALLS:
+                result = self._call(self._reader(username), request)
+            else:
+                result = self._submit('call', username, request)
+            send(OK, encode_value(result))
+        elif opcode == ATTR:
+            send(OK, encode_value(self._attribute(self._reader(username), _loads(body))))
+        else:
+            raise ValueError(f"Unknown opcode {opcode}")
+
+# One write lock per sales file and socket, shared by every StoreClient in the process
+_client_locks = {}
+_client_locks_guard = threading.Lock()
+
+def _client_lock(key):
+    with _client_locks_guard:
+        if key not in _client_locks:
+            _client_locks[key] = threading.RLock()
+        return _client_locks[key]
+
+# Idle connections per socket path, shared by every StoreClient in the process
+_connections = {}
+_connections_lock = threading.Lock()
+
+class _RemoteMethod:
+    def __init__(self, client, path):
+        self.client = client
+        self.path = path
+
+    def __call__(self, *args, **kwargs):
+        return self.client._call(self.path, args, kwargs)
+
+class _RemoteObject:
+    """A SalesManager attribute on the server, such as manager.audit"""
+
+    def __init__(self, client, path):
+        self._client = client
+        self._path = path
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self._client._attribute(self._path + [name])
+
+class StoreClient:
+    """A SalesManager that lives in the store server.
+
+    Adding and reading sales use dedicated messages answered from the
+    server's memory; the exposed SalesManager methods and attributes are
+    looked up and called on the server by name. Requests carry
+    session_token, or a fresh service token without one. write_lock only
+    orders callers within this process; the server orders writes across them.
+    """
+
+    def __init__(self, username="default", socket_path=None, session_token=None):
+        self.username = username
+        self.session_token = session_token
+        self.sales_file = f"sales_data_{username}.xlsx"
+        self.socket_path = socket_path or os.environ.get(SOCKET_ENV, DEFAULT_SOCKET)
+        # Not the server's own lock, should both live in one process (tests, loadtest)
+        self.write_lock = _client_lock(f"{self.socket_path}:{self.sales_file}")
+        self.methods = set()
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.socket_path)
+        except OSError as e:
+            sock.close()
+            raise StoreError(f"Store server not reachable at {self.socket_path}: {e}")
+        return sock
+
+    def _caller(self):
+        return _pack_caller(self.session_token or issue_service_token(), self.username)
+
+    def _request(self, opcode, body=b""):
+        payload = self._caller() + body
+        with _connections_lock:
+            idle = _connections.setdefault(self.socket_path, [])
+            sock = idle.pop() if idle else None
+        if sock is not None:
+            try:
+                _send(sock, opcode, payload)
+                status, data = _receive(sock)
+            except OSError:
+                # The server restarted since this connection was opened
+                sock.close()
+                sock = None
+        if sock is None:
+            sock = self._connect()
+            try:
+                _send(sock, opcode, payload)
+                status, data = _receive(sock)
+            except OSError as e:
+                sock.close()
+                raise StoreError(f"Store server connection lost: {e}")
+        with _connections_lock:
+            _connections[self.socket_path].append(sock)
+        if status == ERROR:
+            raise StoreError(bytes(data).decode('utf-8'))
+        return data
+
+    def ping(self):
+        """True if the server answers"""
+        try:
+            self._request(PING)
+            return True
+        except StoreError:
+            return False
+
+    def add_sale(self, sale_data):
+        """Add a new sale through the server"""
+        return self.add_sales([sale_data])
+
+    def add_sales(self, sales):
+        """Send several sales to the server's writer in one message"""
+        if not sales:
+            return True
+        try:
+            return bytes(self._request(ADD_SALES, pack_frame(coerce_sales(pd.DataFrame(list(sales)))))) == b"\x01"
+        except Exception as e:
+            print(f"Error adding sale: {e}")
+            return False
+
+    def get_all_sales(self, recent_only=False):
+        """Get all sales, most recent first, from the server's memory"""
+        try:
+            return unpack_frame(self._request(READ_ALL, b"\x01" if recent_only else b"\x00"))
+        except Exception as e:
+            print(f"Error reading sales: {e}")
+            return pd.DataFrame()
+
+    def get_daily_sales(self, date_str):
+        """Get sales for a specific date"""
+        try:
+            return unpack_frame(self._request(READ_DAY, str(date_str).encode('utf-8')))
+        except Exception as e:
+            print(f"Error reading daily sales: {e}")
+            return pd.DataFrame()
+
+    def get_weekly_sales(self, start_date, end_date):
+        """Get sales for a date range"""
+        try:
+            body = f"{normalize_date(start_date)}\0{normalize_date(end_date)}".encode('utf-8')
+            df = unpack_frame(self._request(READ_RANGE, body))
+            df['date'] = pd.to_datetime(df['date'])
+            return df
+        except Exception as e:
+            print(f"Error reading weekly sales: {e}")
+            return pd.DataFrame()
+
+    def iter_sales(self, start_date=None, end_date=None, columns=None, chunk_rows=CHUNK_ROWS):
+        """Stream sales between two dates, oldest first, as SalesManager.iter_sales does"""
+        request = {
+            'start_date': normalize_date(start_date) if start_date else None,
+            'end_date': normalize_date(end_date) if end_date else None,
+            'columns': list(columns) if columns is not None else None,
+            'chunk_rows': chunk_rows
+        }
+        # A connection of its own, closed if the caller stops early
+        sock = self._connect()
+        try:
+            _send(sock, ITER_SALES, self._caller() + _dumps(request))
+            while True:
+                status, data = _receive(sock)
+                if status == END:
+                    return
+                if status == ERROR:
+                    raise StoreError(bytes(data).decode('utf-8'))
+                yield unpack_frame(data)
+        finally:
+            sock.close()
+
+    def _call(self, path, args, kwargs):
+        return decode_value(self._request(CALL, _dumps({'path': path, 'args': list(args), 'kwargs': kwargs})))
+
+    def _attribute(self, path):
+        key = ".".join(path)
+        if key in self.methods:
+            return _RemoteMethod(self, path)
+        found = decode_value(self._request(ATTR, _dumps({'path': path})))
+        if found['kind'] == 'missing':
+            raise AttributeError(key)
+        if found['kind'] == 'callable':
+            # Methods stay methods; remember them to skip the lookup next time
+            self.methods.add(key)
+            return _RemoteMethod(self, path)
+        if found['kind'] == 'object':
+            return _RemoteObject(self, path)
+        return found['value']
+
+    def __getattr__(self, name):
+        # Only reached for names not set in __init__ or defined above
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self._attribute([name])
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the sales store to app processes over a Unix socket")
+    parser.add_argument('--socket', default=os.environ.get(SOCKET_ENV, DEFAULT_SOCKET),
+                        help=f"socket path (default: ${SOCKET_ENV} or {DEFAULT_SOCKET})")
+    parser.add_argument('--data-dir', help="directory with the sales files (default: current directory)")
+    args = parser.parse_args()
+
+    if args.data_dir:
+        os.chdir(args.data_dir)
+    try:
+        server = StoreServer(args.socket).start()
+    except StoreError as e:
+        print(f"Error: {e}")
+        return 1
+    print(f"Serving sales store on {args.socket}")
+    # Stop cleanly under a service manager too, finishing queued writes
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,164 @@
+import json
+import os
+import time
+from collections import Counter
+from fingerprints import sale_fingerprint, day_digest
+from utils import normalize_date, plain_record, load_json_file, save_json_file
+
+LOCK_STALE_SECONDS = 600
+
+class SyncFolder:
+    """A shared folder (USB stick, network share) that registers sync through.
+
+    The folder holds the union of every register's sales as one JSON-lines
+    file per cashier and day ({user}/{date}.jsonl) plus manifest.json with
+    each day's digest (see fingerprints.day_digest). A register compares its
+    own per-day digests with the manifest and only reads or appends the days
+    that differ, so a sync moves data in proportion to what changed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.manifest_file = os.path.join(path, "manifest.json")
+        self.lock_file = os.path.join(path, "sync.lock")
+        self.manifest = {}
+
+    def __enter__(self):
+        os.makedirs(self.path, exist_ok=True)
+        while True:
+            try:
+                os.close(os.open(self.lock_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                break
+            except FileExistsError:
+                # A register that died mid-sync leaves its lock behind
+                try:
+                    if time.time() - os.path.getmtime(self.lock_file) > LOCK_STALE_SECONDS:
+                        os.remove(self.lock_file)
+                        continue
+                except OSError:
+                    continue
+                time.sleep(0.2)
+        self.manifest = load_json_file(self.manifest_file, {})
+        return self
+
+    def save_manifest(self):
+        return save_json_file(self.manifest_file, self.manifest)
+
+    def __exit__(self, *exc):
+        self.save_manifest()
+        try:
+            os.remove(self.lock_file)
+        except OSError:
+            pass
+
+    def usernames(self):
+        return list(self.manifest)
+
+    def digests(self, username):
+        return self.manifest.get(username, {})
+
+    def _day_file(self, username, date_str):
+        return os.path.join(self.path, username, f"{date_str}.jsonl")
+
+    def read_day(self, username, date_str):
+        """Sales stored in the folder for one cashier and day, and bytes read"""
+        path = self._day_file(username, date_str)
+        if not os.path.exists(path):
+            return [], 0
+        with open(path, 'rb') as f:
+            data = f.read()
+        sales = [json.loads(line) for line in data.decode('utf-8').splitlines() if line.strip()]
+        return sales, len(data)
+
+    def append_day(self, username, date_str, sales, digest):
+        """Add sales to a day's file and record the day's new digest"""
+        os.makedirs(os.path.join(self.path, username), exist_ok=True)
+        data = "".join(json.dumps(plain_record(sale), default=str) + "\n" for sale in sales).encode('utf-8')
+        with open(self._day_file(username, date_str), 'ab') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self.manifest.setdefault(username, {})[date_str] = digest
+        return len(data)
+
+def _multiset_difference(sales, other_counts):
+    """Sales whose fingerprint occurs more often in sales than in other_counts"""
+    remaining = Counter(other_counts)
+    missing = []
+    for sale in sales:
+        fingerprint = sale_fingerprint(sale)
+        if remaining[fingerprint] > 0:
+            remaining[fingerprint] -= 1
+        else:
+            missing.append(sale)
+    return missing
+
+def sync_user(manager, folder):
+    """Make one cashier's local sales and the folder's copy identical.
+
+    Only days whose digests differ are read; the local store receives the
+    folder's extra sales and the folder receives the local extras. Deletions
+    are not propagated: a sync always produces the union.
+    """
+    username = manager.username
+    result = {'days_compared': 0, 'days_differing': 0, 'received': 0, 'sent': 0, 'bytes_read': 0, 'bytes_written': 0}
+    with manager.write_lock:
+        local_digests = manager.fingerprint_index.day_digests()
+        remote_digests = folder.digests(username)
+        days = set(local_digests) | set(remote_digests)
+        differing = sorted(day for day in days if local_digests.get(day) != remote_digests.get(day))
+        result['days_compared'] = len(days)
+        result['days_differing'] = len(differing)
+        if not differing:
+            return result
+
+        # One range read of the local store covers every differing day
+        differing_days = set(differing)
+        local_by_day = {}
+        local_df = manager.get_weekly_sales(differing[0], differing[-1])
+        if not local_df.empty:
+            for sale in local_df.to_dict('records'):
+                sale = plain_record(sale)
+                sale['date'] = normalize_date(sale['date'])
+                if sale['date'] in differing_days:
+                    local_by_day.setdefault(sale['date'], []).append(sale)
+        for day in differing:
+            local_fingerprints = [sale_fingerprint(sale) for sale in local_by_day.get(day, [])]
+            if local_fingerprints and day_digest(local_fingerprints) != local_digests.get(day) or \
+                    not local_fingerprints and day in local_digests:
+                # Never merge against a partial read; that would duplicate sales
+                raise RuntimeError(f"sales read for {day} do not match the fingerprint index")
+
+        to_local = []
+        for day in differing:
+            remote_sales, bytes_read = folder.read_day(username, day)
+            result['bytes_read'] += bytes_read
+            local_sales = local_by_day.get(day, [])
+            remote_counts = Counter(sale_fingerprint(sale) for sale in remote_sales)
+            local_counts = Counter(sale_fingerprint(sale) for sale in local_sales)
+            to_local += _multiset_difference(remote_sales, local_counts)
+            to_remote = _multiset_difference(local_sales, remote_counts)
+            if to_remote:
+                union = list((remote_counts | local_counts).elements())
+                result['bytes_written'] += folder.append_day(username, day, to_remote, day_digest(union))
+                result['sent'] += len(to_remote)
+
+        if to_local:
+            if not manager.add_sales(to_local):
+                raise RuntimeError(f"could not store synced sales for {username}")
+            result['received'] = len(to_local)
+    return result
+
+def sync_with_folder(path, manager_factory, usernames, include_folder_users=True):
+    """Sync the given cashiers (and by default every cashier the folder knows) with a sync folder"""
+    results = {}
+    with SyncFolder(path) as folder:
+        usernames = set(usernames) | (set(folder.usernames()) if include_folder_users else set())
+        for username in sorted(usernames):
+            try:
+                results[username] = sync_user(manager_factory(username), folder)
+                folder.save_manifest()
+            except Exception as e:
+                print(f"Error syncing {username}: {e}")
+                results[username] = {'error': str(e)}
+    return results
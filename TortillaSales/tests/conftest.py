@@ -0,0 +1,45 @@
+import os
+import sys
+import pytest
+
+# The app's modules import each other by plain name, as under `streamlit run app.py`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def make_sale(date, time, tortilla_qty=1.0, username='ana', **fields):
+    """A complete sale record, priced from the price list unless total is given"""
+    from utils import calculate_product_total, PRODUCT_QUANTITY_COLUMNS
+    sale = {
+        'date': date, 'time': time, 'username': username,
+        'tortilla_qty': tortilla_qty, 'totopos_qty': 0.0, 'cacahuates_qty': 0.0, 'mix_qty': 0.0,
+        'salted_chips_qty': 0.0, 'special_qty': 0.0, 'special_price': 0.0,
+        'frequent_customer': False, 'supplier': False, 'customer_id': ''
+    }
+    sale.update(fields)
+    if 'total' not in fields:
+        quantities = dict({product: sale[column] for product, column in PRODUCT_QUANTITY_COLUMNS.items()},
+                          Special=sale['special_qty'])
+        sale['total'] = sum(calculate_product_total(product, quantity, sale['supplier'], sale['special_price'])
+                            for product, quantity in quantities.items())
+    sale.setdefault('payment', sale['total'])
+    sale.setdefault('change', sale['payment'] - sale['total'])
+    return sale
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    """Every test runs in its own directory: the modules keep their files in the working directory"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+@pytest.fixture
+def sample_sales():
+    """A week of sales over several hours, with supplier, frequent-customer and registered-customer sales"""
+    sales = []
+    for day in range(1, 8):
+        date = f"2024-03-{day:02d}"
+        sales.append(make_sale(date, "07:05:00", 1.5))
+        sales.append(make_sale(date, "07:20:30", 2.0, supplier=True))
+        sales.append(make_sale(date, "12:45:00", 0.5, totopos_qty=2, frequent_customer=True))
+        sales.append(make_sale(date, "18:10:00", 1.0, mix_qty=1, salted_chips_qty=1, customer_id='C0001'))
+        if day % 2:
+            sales.append(make_sale(date, "19:59:59", 3.0, special_qty=1, special_price=12.5, customer_id='C0002'))
+    return sales
@@ -0,0 +1,76 @@
+import os
+from datetime import datetime, timedelta
+import pandas as pd
+import pytest
+from conftest import make_sale
+from sales_manager import SalesManager
+
+def recent_sales():
+    """Sales over the last few days, which a 365-day horizon keeps active"""
+    sales = []
+    for days_ago in range(3):
+        date = (datetime.now() - timedelta(days=days_ago)).strftime('%Y-%m-%d')
+        sales.append(make_sale(date, "08:00:00", 1.0))
+        sales.append(make_sale(date, "17:30:00", 2.5, totopos_qty=1))
+    return sales
+
+def keys(df):
+    return list(df['date'].astype(str).str[:10] + ' ' + df['time'].astype(str))
+
+@pytest.fixture
+def manager(sample_sales):
+    manager = SalesManager('ana')
+    assert manager.add_sales(sample_sales + recent_sales())
+    return manager
+
+def test_archiving_keeps_every_sale_and_summary(manager, sample_sales):
+    before = manager.get_sales_summary()
+    assert manager.archive_old_sales(365) == len(sample_sales)
+    assert len(manager.get_all_sales(recent_only=True)) == 6
+    assert len(manager.get_all_sales()) == len(sample_sales) + 6
+    assert manager.get_sales_summary() == pytest.approx(before)
+    assert all(manager.archive.verify().values())
+    assert manager.archive.pending() is None
+
+@pytest.mark.parametrize('chunk_rows', [1, 4, 5000])
+def test_iter_sales_merges_archive_and_active_in_order(manager, chunk_rows):
+    # A late sale dated inside the archived range stays in the active file
+    manager.archive_old_sales(365)
+    assert manager.add_sale(make_sale('2024-03-04', '09:00:00'))
+    expected = manager.get_all_sales().sort_values(['date', 'time'])
+    chunks = list(manager.iter_sales(chunk_rows=chunk_rows))
+    assert all(len(chunk) == chunk_rows for chunk in chunks[:-1])
+    assert keys(pd.concat(chunks)) == keys(expected)
+    in_range = pd.concat(manager.iter_sales('2024-03-03', '2024-03-05', chunk_rows=chunk_rows))
+    assert keys(in_range) == [key for key in keys(expected) if '2024-03-03' <= key[:10] <= '2024-03-05']
+
+def test_failed_rewrite_leaves_the_sales_active(manager, monkeypatch, sample_sales):
+    def crash(df):
+        raise OSError("disk full")
+    monkeypatch.setattr(manager, '_write_sales', crash)
+    with pytest.raises(OSError):
+        manager.archive_old_sales(365)
+    assert manager.archive.segments == [] and manager.archive.pending() is None
+    assert len(SalesManager('ana').get_all_sales()) == len(sample_sales) + 6
+
+def test_crash_before_the_rewrite_is_undone_on_open(manager, sample_sales):
+    # The process died after staging the segments
+    df = manager.get_all_sales(recent_only=True)
+    old = df[df['date'].astype(str).str[:10] < '2025-01-01']
+    manager.archive.stage(old, '2025-01-01')
+    reopened = SalesManager('ana')
+    assert reopened.archive.pending() is None
+    assert reopened.archive.segments == []
+    assert not [name for name in os.listdir(reopened.archive.archive_dir) if name.endswith('.csv.gz')]
+    assert len(reopened.get_all_sales()) == len(sample_sales) + 6
+
+def test_crash_after_the_rewrite_is_completed_on_open(manager, monkeypatch, sample_sales):
+    monkeypatch.setattr(manager.archive, 'commit_pending', lambda: None)
+    manager.archive_old_sales(365)
+    # Neither listed nor active until the move is completed
+    assert len(manager.get_all_sales()) == 6
+    reopened = SalesManager('ana')
+    assert reopened.archive.pending() is None
+    sales = reopened.get_all_sales()
+    assert len(sales) == len(sample_sales) + 6
+    assert not sales.duplicated(['date', 'time']).any()
@@ -0,0 +1,29 @@
+from conftest import make_sale
+from sales_manager import SalesManager
+
+def findings(manager):
+    return sorted((sale['date'], sale['time'], sale['issues']) for sale in manager.audit.issues)
+
+def test_incremental_audit_matches_a_full_audit(sample_sales):
+    manager = SalesManager('ana')
+    manager.add_sales(sample_sales[:10])
+    manager.run_audit()
+    manager.add_sales([
+        make_sale('2024-03-08', '08:00:00', 1.0, total=99.0),
+        make_sale('2024-03-08', '09:00:00', 1.0, payment=10.0, change=0.0),
+        make_sale('2024-03-08', '09:30:00', 1.0, payment=10.0),
+        make_sale('2024-03-08', '10:00:00', 0.0, totopos_qty=1.5),
+        make_sale('2024-03-08', '11:00:00', 0.0)
+    ])
+    # Drops the first flagged sale, which the next audit must forget
+    manager.delete_sale_by_index(10)
+    manager.add_sales([make_sale('2024-03-09', '08:00:00', 2.0, total=1.0)])
+
+    incremental = manager.run_audit()
+    assert incremental['checked'] == 5
+    result = findings(manager)
+    full = manager.run_audit(full=True)
+    assert full['checked'] == 15
+    assert findings(manager) == result
+    assert [issues for _, _, issues in result] == [
+        'change_mismatch', 'negative_change', 'fractional_units', 'empty_sale', 'total_mismatch']
@@ -0,0 +1,34 @@
+import hashlib
+import pytest
+import auth
+from auth import create_user, change_password, login, verify_session_token
+
+@pytest.fixture
+def pbkdf2_runs(monkeypatch):
+    monkeypatch.setattr(auth, 'PASSWORD_ITERATIONS', 1000)
+    runs = []
+    original = hashlib.pbkdf2_hmac
+    def counted(*args, **kwargs):
+        runs.append(args)
+        return original(*args, **kwargs)
+    monkeypatch.setattr(hashlib, 'pbkdf2_hmac', counted)
+    return runs
+
+def test_change_password_hashes_twice_and_returns_a_working_token(pbkdf2_runs):
+    assert create_user('ana', 'old secret')
+    old_token = login('ana', 'old secret')
+    pbkdf2_runs.clear()
+    token = change_password('ana', 'old secret', 'new secret')
+    # One check of the current password, one hash of the new one
+    assert len(pbkdf2_runs) == 2
+    assert verify_session_token(token)['username'] == 'ana'
+    assert verify_session_token(old_token) is None
+    assert login('ana', 'new secret') is not None
+
+def test_change_password_rejects_a_wrong_current_password(pbkdf2_runs):
+    assert create_user('ana', 'old secret', is_admin=True)
+    assert change_password('ana', 'wrong', 'new secret') is None
+    assert login('ana', 'old secret') is not None
+    token = change_password('ana', 'old secret', 'new secret')
+    # The role is kept
+    assert verify_session_token(token)['is_admin']
@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+import backup
+from backup import BackupStore
+from conftest import make_sale
+from sales_manager import SalesManager
+
+def full_pass_days():
+    """Day objects of a snapshot taken from scratch"""
+    return BackupStore("fresh_backups").create_snapshot(SalesManager, ['ana'])['sales']['ana']['days']
+
+def test_one_sale_serializes_only_its_day(sample_sales, monkeypatch):
+    manager = SalesManager('ana')
+    manager.add_sales(sample_sales)
+    store = BackupStore()
+    first = store.create_snapshot(SalesManager, ['ana'])
+    assert len(first['sales']['ana']['days']) == 7
+
+    serialized = []
+    original = backup.plain_record
+    monkeypatch.setattr(backup, 'plain_record', lambda sale: serialized.append(sale['date']) or original(sale))
+    manager.add_sale(make_sale('2024-03-03', '20:00:00'))
+    second = store.create_snapshot(SalesManager, ['ana'])
+    # Only 2024-03-03's sales were written out again
+    assert {str(date)[:10] for date in serialized} == {'2024-03-03'}
+    changed = [day for day, digest in second['sales']['ana']['days'].items()
+               if digest != first['sales']['ana']['days'][day]]
+    assert changed == ['2024-03-03']
+    assert second['sales']['ana']['days'] == full_pass_days()
+
+def test_deletes_and_archiving_match_a_full_pass(sample_sales):
+    manager = SalesManager('ana')
+    manager.add_sales(sample_sales)
+    store = BackupStore()
+    store.create_snapshot(SalesManager, ['ana'])
+    # Remove every sale of one day, so the day disappears
+    for _ in range(5):
+        sales = manager.get_all_sales(recent_only=True)
+        manager.delete_sale_by_index(int(sales.index[sales['date'].astype(str).str[:10] == '2024-03-07'][0]))
+    assert store.create_snapshot(SalesManager, ['ana'])['sales']['ana']['days'] == full_pass_days()
+    yesterday = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
+    manager.add_sale(make_sale(yesterday, '09:00:00'))
+    manager.archive_old_sales(365)
+    days = store.create_snapshot(SalesManager, ['ana'])['sales']['ana']['days']
+    assert list(days) == [yesterday] and days == full_pass_days()
+
+def test_restore_brings_back_the_snapshot(sample_sales):
+    manager = SalesManager('ana')
+    manager.add_sales(sample_sales[:10])
+    store = BackupStore()
+    store.create_snapshot(SalesManager, ['ana'])
+    manager.add_sales(sample_sales[10:])
+    snapshot = store.create_snapshot(SalesManager, ['ana'])
+    manager.delete_all_sales()
+    assert store.verify() == []
+    store.restore(snapshot['id'], SalesManager)
+    assert len(SalesManager('ana').get_all_sales()) == len(sample_sales)
@@ -0,0 +1,13 @@
+import cli
+from sales_manager import SalesManager
+
+def test_audit_text_output(sample_sales, capsys):
+    SalesManager('ana').add_sales(sample_sales)
+    assert cli.main(['--data-dir', '.', 'audit']) == 0
+    assert capsys.readouterr().out.strip().endswith(f"ana: checked {len(sample_sales)} sales, 0 flagged")
+
+def test_audit_without_a_result_reports_no_sales(monkeypatch, capsys):
+    SalesManager('ana')
+    monkeypatch.setattr(SalesManager, 'run_audit', lambda self, full=False: {})
+    assert cli.main(['--data-dir', '.', 'audit']) == 0
+    assert capsys.readouterr().out.strip().endswith("ana: no sales")
@@ -0,0 +1,57 @@
+import multiprocessing
+from conftest import make_sale
+from customers import CustomerRegistry, CustomerIndex, CUSTOMER_SALES_LOG
+from sales_manager import SalesManager
+
+def _register_many(worker, count):
+    registry = CustomerRegistry()
+    for i in range(count):
+        assert registry.add(f"Customer {worker}-{i}") is not None
+
+def test_processes_never_share_a_customer_id():
+    processes = [multiprocessing.Process(target=_register_many, args=(worker, 10)) for worker in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert all(process.exitcode == 0 for process in processes)
+    registry = CustomerRegistry()
+    assert len(registry.all()) == 40
+    assert registry.data['next_number'] == 41
+
+def log_lines():
+    with open(CUSTOMER_SALES_LOG, encoding='utf-8') as f:
+        return f.read().splitlines()
+
+def snapshot(index, customer_ids):
+    return {customer_id: (index.summary(customer_id), index.history(customer_id)) for customer_id in customer_ids}
+
+def test_incremental_index_matches_rebuild(sample_sales):
+    ana = SalesManager('ana')
+    ana.add_sales(sample_sales)
+    bob = SalesManager('bob')
+    bob.add_sale(make_sale('2024-03-02', '10:00:00', 2.0, username='bob', customer_id='C0001'))
+    sales = ana.get_all_sales(recent_only=True)
+    ana.delete_sale_by_index(int(sales.index[sales['customer_id'] == 'C0002'][0]))
+    ana.delete_sale_by_index(0)
+
+    incremental = snapshot(CustomerIndex('ana'), ['C0001', 'C0002'])
+    assert incremental['C0001'][0]['visits'] == 8
+    for _ in range(3):
+        ana.rebuild_aggregates()
+    rebuilt = snapshot(CustomerIndex('ana'), ['C0001', 'C0002'])
+    assert {customer_id: (summary, sorted(history, key=str)) for customer_id, (summary, history) in rebuilt.items()} == \
+           {customer_id: (summary, sorted(history, key=str)) for customer_id, (summary, history) in incremental.items()}
+    # One line per indexed sale, however many rebuilds ran; bob's sale is kept
+    assert len(log_lines()) == 8 + 3
+    assert any(entry['username'] == 'bob' for entry in rebuilt['C0001'][1])
+
+def test_compact_drops_deleted_sales_and_clears(sample_sales):
+    ana = SalesManager('ana')
+    ana.add_sales(sample_sales)
+    ana.delete_all_sales()
+    ana.add_sale(make_sale('2024-03-09', '10:00:00', customer_id='C0001'))
+    before = snapshot(CustomerIndex('ana'), ['C0001', 'C0002'])
+    assert ana.customer_index.compact() == 1
+    assert len(log_lines()) == 1
+    assert snapshot(CustomerIndex('ana'), ['C0001', 'C0002']) == before
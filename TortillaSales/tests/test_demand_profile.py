@@ -0,0 +1,46 @@
+import pandas as pd
+from conftest import make_sale
+from demand_profile import DemandProfile
+
+def test_incremental_updates_match_rebuild(sample_sales):
+    profile = DemandProfile('ana')
+    profile.sales_added(sample_sales[:10])
+    profile.sales_added(sample_sales[10:])
+    removed = sample_sales[3]
+    profile.sale_removed(removed)
+
+    remaining = [sale for sale in sample_sales if sale is not removed]
+    rebuilt = DemandProfile('rebuilt')
+    rebuilt.rebuild(pd.DataFrame(remaining))
+
+    assert profile.data['days'] == rebuilt.data['days']
+    pd.testing.assert_frame_equal(profile.get_profile(), rebuilt.get_profile())
+    pd.testing.assert_frame_equal(profile.get_profile(hourly=True), rebuilt.get_profile(hourly=True))
+
+def test_buckets_and_weekday_counts():
+    profile = DemandProfile('ana')
+    profile.sales_added([
+        make_sale('2024-03-04', '07:05:00', 1.5),
+        make_sale('2024-03-04', '07:14:59', 0.5),
+        make_sale('2024-03-11', '07:20:00', 2.0),
+    ])
+
+    monday = profile.get_profile().set_index('bucket')
+    assert monday.loc['07:00', 'kg'] == 2.0
+    assert monday.loc['07:00', 'sales'] == 2
+    assert monday.loc['07:15', 'sales'] == 1
+    assert set(monday['days']) == {2}
+    assert profile.get_profile('2024-03-05', '2024-03-31')['sales'].sum() == 1
+
+def test_removing_last_sale_drops_the_day():
+    profile = DemandProfile('ana')
+    sale = make_sale('2024-03-04', '07:05:00')
+    profile.sales_added([sale])
+    profile.sale_removed(sale)
+    assert profile.data['days'] == {}
+
+def test_other_instance_sees_saved_changes(sample_sales):
+    first = DemandProfile('ana')
+    second = DemandProfile('ana')
+    first.sales_added(sample_sales)
+    assert second.get_profile()['sales'].sum() == len(sample_sales)
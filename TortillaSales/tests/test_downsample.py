@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+import pytest
+from downsample import largest_triangle_three_buckets, downsample_series
+
+@pytest.mark.parametrize('n, threshold', [(100, 10), (101, 7), (1000, 3), (37, 36)])
+def test_lttb_keeps_the_endpoints_and_one_point_per_bucket(n, threshold):
+    x = np.arange(n)
+    y = np.sin(x / 5.0)
+    selected = largest_triangle_three_buckets(x, y, threshold)
+    assert len(selected) == threshold
+    assert selected[0] == 0 and selected[-1] == n - 1
+    every = (n - 2) / (threshold - 2)
+    for bucket, index in enumerate(selected[1:-1]):
+        assert int(bucket * every) + 1 <= index < int((bucket + 1) * every) + 1
+
+def test_lttb_keeps_a_spike():
+    y = np.zeros(200)
+    y[123] = 50.0
+    assert 123 in largest_triangle_three_buckets(np.arange(200), y, 20)
+
+@pytest.mark.parametrize('threshold', [2, 50, 60])
+def test_lttb_returns_every_point_when_it_cannot_reduce(threshold):
+    assert list(largest_triangle_three_buckets(np.arange(50), np.ones(50), threshold)) == list(range(50))
+
+def test_downsample_series_keeps_dates_and_values():
+    dates = pd.date_range('2023-01-01', periods=400, freq='D')
+    series = pd.Series(np.arange(400.0) % 17, index=dates)
+    sampled = downsample_series(series, 40)
+    assert len(sampled) == 40
+    assert sampled.index[0] == dates[0] and sampled.index[-1] == dates[-1]
+    assert sampled.index.is_monotonic_increasing
+    assert (sampled == series.loc[sampled.index]).all()
+    assert downsample_series(series.head(30), 40).equals(series.head(30))
@@ -0,0 +1,44 @@
+from conftest import make_sale
+from fingerprints import FingerprintIndex, day_digest, sale_fingerprint
+from sales_manager import SalesManager
+
+def state(index):
+    index.refresh()
+    return dict(index.fingerprints), dict(index.identities), index.day_digests()
+
+def test_incremental_index_matches_rebuild(sample_sales):
+    manager = SalesManager('ana')
+    manager.add_sales(sample_sales)
+    manager.delete_sale_by_index(3)
+    manager.add_sale(make_sale('2024-03-02', '07:05:00', 4.0))
+    incremental = state(FingerprintIndex('ana'))
+
+    rebuilt = FingerprintIndex('rebuilt')
+    rebuilt.rebuild(manager.get_all_sales())
+    assert state(rebuilt) == incremental
+    index = FingerprintIndex('ana')
+    index.compact()
+    assert state(FingerprintIndex('ana')) == incremental
+
+def test_day_digest_is_the_sum_of_the_days_fingerprints(sample_sales):
+    manager = SalesManager('ana')
+    manager.add_sales(sample_sales)
+    day = [sale for sale in sample_sales if sale['date'] == '2024-03-03']
+    assert manager.fingerprint_index.day_digests()['2024-03-03'] == day_digest(sale_fingerprint(sale) for sale in day)
+
+def test_classify_and_import_are_idempotent(sample_sales):
+    manager = SalesManager('ana')
+    manager.add_sales(sample_sales[:10])
+    changed = dict(sample_sales[0], tortilla_qty=9.0, total=9.0 * 23)
+    batch = sample_sales[5:15] + [sample_sales[12], changed]
+    classified = manager.classify_sales(batch)
+    assert len(classified['new']) == 5
+    # Stored ones plus the batch's repeat of one of its own sales
+    assert len(classified['duplicate']) == 6
+    assert classified['conflicting'] == [changed]
+
+    first = manager.import_sales(sample_sales)
+    assert (first['new'], first['duplicate'], first['imported']) == (len(sample_sales) - 10, 10, len(sample_sales) - 10)
+    second = manager.import_sales(sample_sales)
+    assert second['imported'] == 0 and second['duplicate'] == len(sample_sales)
+    assert len(manager.get_all_sales()) == len(sample_sales)
@@ -0,0 +1,63 @@
+from datetime import datetime
+import pandas as pd
+from conftest import make_sale
+from daily_rollup import DailyRollup
+from forecast import DemandForecaster
+
+def test_rollup_incremental_updates_match_rebuild(sample_sales):
+    rollup = DailyRollup('ana')
+    rollup.sales_added(sample_sales[:12])
+    rollup.sales_added(sample_sales[12:])
+    for removed in (sample_sales[0], sample_sales[5]):
+        rollup.sale_removed(removed)
+
+    remaining = [sale for sale in sample_sales if sale is not sample_sales[0] and sale is not sample_sales[5]]
+    rebuilt = DailyRollup('rebuilt')
+    rebuilt.rebuild(pd.DataFrame(remaining))
+
+    assert rollup.data['days'] == rebuilt.data['days']
+    day = rollup.get_day('2024-03-02')
+    sales = [sale for sale in remaining if sale['date'] == '2024-03-02']
+    assert day['sales'] == len(sales)
+    assert day['total'] == round(sum(sale['total'] for sale in sales), 4)
+    assert day['supplier_sales'] == sum(sale['supplier'] for sale in sales)
+    assert day['supplier_tortilla_qty'] == sum(sale['tortilla_qty'] for sale in sales if sale['supplier'])
+
+def test_rollup_totals_filter_by_date(sample_sales):
+    rollup = DailyRollup('ana')
+    rollup.sales_added(sample_sales)
+    totals = rollup.get_daily_totals('2024-03-03', '2024-03-05')
+    assert list(totals['date']) == ['2024-03-03', '2024-03-04', '2024-03-05']
+
+def test_forecast_fitted_in_steps_matches_one_fit(sample_sales):
+    rollup = DailyRollup('ana')
+    rollup.sales_added(sample_sales)
+    today = datetime(2024, 3, 8)
+
+    stepwise = DemandForecaster('ana')
+    assert stepwise.update(rollup, today=datetime(2024, 3, 4)) == 3
+    assert stepwise.update(rollup, today=today) == 4
+    assert stepwise.update(rollup, today=today) == 0
+
+    rollup_copy = DailyRollup('other')
+    rollup_copy.data = rollup.data
+    whole = DemandForecaster('other')
+    whole.update(rollup_copy, today=today)
+
+    assert stepwise.state['weekdays'] == whole.state['weekdays']
+    assert stepwise.forecast(today, 7) == whole.forecast(today, 7)
+
+def test_forecast_refits_after_a_closed_day_changes(sample_sales):
+    rollup = DailyRollup('ana')
+    rollup.sales_added(sample_sales)
+    forecaster = DemandForecaster('ana')
+    forecaster.update(rollup, today=datetime(2024, 3, 8))
+
+    backdated = make_sale('2024-03-01', '09:00:00', 10.0)
+    rollup.sales_added([backdated])
+    assert forecaster.update(rollup, today=datetime(2024, 3, 8)) == 7
+
+    # 2024-03-01 is a Friday, the only Friday in the fixture
+    friday = forecaster.predict(datetime(2024, 3, 15))
+    assert friday['sales'] == rollup.get_day('2024-03-01')['sales']
+    assert friday['tortilla_qty'] == rollup.get_day('2024-03-01')['tortilla_qty']
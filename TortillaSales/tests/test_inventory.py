@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+import pytest
+from conftest import make_sale
+from inventory import InventoryLedger
+from sales_manager import SalesManager
+
+def expected_levels(received, sales):
+    levels = dict(received)
+    for sale in sales:
+        levels['Tortilla'] -= sale['tortilla_qty']
+        levels['Totopos'] -= sale['totopos_qty']
+        levels['Special'] -= sale['special_qty']
+    return levels
+
+@pytest.fixture
+def manager():
+    manager = SalesManager('ana')
+    manager.inventory.count({'Tortilla': 100, 'Totopos': 50, 'Special': 10})
+    return manager
+
+@pytest.fixture
+def sample_sales():
+    """Sales after the first stock movement, which are the ones stock is tracked for"""
+    date = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
+    return [make_sale(date, "07:05:00", 1.5),
+            make_sale(date, "09:20:30", 2.0, supplier=True),
+            make_sale(date, "12:45:00", 0.5, totopos_qty=2),
+            make_sale(date, "19:59:59", 3.0, special_qty=1, special_price=12.5)]
+
+def test_sales_and_deletions_move_the_stock(manager, sample_sales):
+    assert manager.add_sales(sample_sales)
+    levels = manager.get_stock_levels()
+    expected = expected_levels({'Tortilla': 100, 'Totopos': 50, 'Special': 10}, sample_sales)
+    assert levels['Tortilla'] == pytest.approx(expected['Tortilla'])
+    assert levels['Totopos'] == pytest.approx(expected['Totopos'])
+    assert levels['Special'] == pytest.approx(expected['Special'])
+    sales = manager.get_all_sales(recent_only=True)
+    # Row labels of the active file are delete_sale_by_index positions
+    assert manager.delete_sale_by_index(sales['tortilla_qty'].idxmax())
+    assert manager.get_stock_levels()['Tortilla'] == pytest.approx(expected['Tortilla'] + 3.0)
+    # A ledger in sync needs no repair, and a rebuild writes nothing
+    assert not manager.inventory.needs_rebuild()
+    before = manager.get_stock_levels()
+    manager.inventory.rebuild(manager.get_all_sales())
+    assert manager.get_stock_levels() == before
+
+def test_failed_ledger_write_is_repaired_by_the_next_manager(manager, monkeypatch, sample_sales):
+    def fail(self, *entries):
+        raise OSError("disk full")
+    with monkeypatch.context() as patch:
+        patch.setattr(InventoryLedger, '_append', fail)
+        # The sales are stored even though their stock movements are not
+        assert manager.add_sales(sample_sales)
+    assert manager.get_stock_levels()['Tortilla'] == 100
+    assert manager.inventory.needs_rebuild()
+
+    repaired = SalesManager('ana')
+    assert not repaired.inventory.needs_rebuild()
+    expected = expected_levels({'Tortilla': 100, 'Totopos': 50, 'Special': 10}, sample_sales)
+    assert repaired.get_stock_levels()['Tortilla'] == pytest.approx(expected['Tortilla'])
+    assert repaired.get_stock_levels()['Totopos'] == pytest.approx(expected['Totopos'])
+    # Running the repair again changes nothing
+    repaired.inventory.rebuild(repaired.get_all_sales())
+    assert repaired.get_stock_levels()['Tortilla'] == pytest.approx(expected['Tortilla'])
+
+def test_failed_receipt_raises(manager, monkeypatch):
+    monkeypatch.setattr(InventoryLedger, '_append', lambda self, *entries: (_ for _ in ()).throw(OSError("disk full")))
+    with pytest.raises(OSError):
+        manager.receive_stock('Tortilla', 5)
@@ -0,0 +1,42 @@
+import pandas as pd
+from conftest import make_sale
+from leaderboards import TopSales, largest_sales, leaderboards
+from sales_manager import SalesManager
+
+def test_repair_after_deleting_a_full_days_top_sale_matches_rebuild(sample_sales):
+    # Two sales per day, so every odd day's list is full
+    top = TopSales('ana', size=2)
+    top.sales_added(sample_sales)
+    day_sales = [sale for sale in sample_sales if sale['date'] == '2024-03-03']
+    largest = max(day_sales, key=lambda sale: sale['total'])
+    remaining = [sale for sale in sample_sales if sale is not largest]
+    top.sale_removed(largest)
+    assert top.dirty_days() == ['2024-03-03']
+
+    top.repair('2024-03-03', pd.DataFrame([sale for sale in remaining if sale['date'] == '2024-03-03']))
+    rebuilt = TopSales('rebuilt', size=2)
+    rebuilt.rebuild(pd.DataFrame(remaining))
+    assert top.dirty_days() == []
+    assert top.data['days'] == rebuilt.data['days']
+
+def test_leaderboards_match_a_full_scan(sample_sales):
+    ana = SalesManager('ana')
+    ana.add_sales(sample_sales)
+    bob = SalesManager('bob')
+    bob_sales = [make_sale(f"2024-03-0{day}", "09:30:00", 5.0, username='bob') for day in (2, 4)]
+    bob.add_sales(bob_sales)
+    ana.delete_sale_by_index(0)
+    sales = pd.concat([ana.get_all_sales(), bob.get_all_sales()], ignore_index=True)
+    sales['day'] = sales['date'].astype(str).str[:10]
+    in_period = sales[(sales['day'] >= '2024-03-02') & (sales['day'] <= '2024-03-06')]
+
+    boards = leaderboards([ana, bob], '2024-03-02', '2024-03-06', n=3)
+    # Equal revenue is broken by the later date, as heapq.nlargest does on the tuples
+    days = sorted(((round(revenue, 2), day) for day, revenue in in_period.groupby('day')['total'].sum().items()),
+                  reverse=True)
+    assert [(board['revenue'], board['date']) for board in boards['best_days']] == days[:3]
+    kg = in_period.groupby('username')['tortilla_qty'].sum().round(3).sort_values(ascending=False)
+    assert [(board['username'], board['kg']) for board in boards['top_cashiers']] == list(kg.items())
+    largest = in_period.sort_values('total', ascending=False)['total'].head(3).round(2).tolist()
+    assert [board['total'] for board in boards['largest_sales']] == largest
+    assert largest_sales([ana.top_sales], '2024-03-07', '2024-03-07', n=1)[0]['date'] == '2024-03-07'
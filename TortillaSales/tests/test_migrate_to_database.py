@@ -0,0 +1,57 @@
+import pytest
+from sqlalchemy import inspect, text
+from conftest import make_sale
+
+# The sales table as the first release of database.py created it
+BASELINE_SALES_TABLE = """
+CREATE TABLE sales (
+    id INTEGER PRIMARY KEY, date VARCHAR NOT NULL, time VARCHAR NOT NULL, username VARCHAR NOT NULL,
+    tortilla_qty FLOAT NOT NULL, totopos_qty FLOAT NOT NULL, cacahuates_qty FLOAT NOT NULL,
+    mix_qty FLOAT NOT NULL, salted_chips_qty FLOAT NOT NULL, special_qty FLOAT NOT NULL,
+    special_price FLOAT NOT NULL, frequent_customer BOOLEAN NOT NULL, supplier BOOLEAN NOT NULL,
+    total FLOAT NOT NULL, payment FLOAT NOT NULL, change FLOAT NOT NULL, created_at DATETIME
+)
+"""
+
+@pytest.fixture
+def database(workdir, monkeypatch):
+    import database
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{workdir / 'sales.db'}")
+    monkeypatch.setattr(database, '_engine', None)
+    monkeypatch.setattr(database, '_session_factory', None)
+    yield database
+    database.get_engine().dispose()
+
+@pytest.fixture
+def workbook(sample_sales):
+    from sales_manager import SalesManager
+    SalesManager('ana').add_sales(sample_sales)
+    return 'sales_data_ana.xlsx'
+
+def test_init_database_upgrades_a_baseline_sales_table(database):
+    with database.get_engine().begin() as connection:
+        connection.execute(text(BASELINE_SALES_TABLE))
+
+    assert database.init_database()
+
+    inspector = inspect(database.get_engine())
+    columns = {column['name'] for column in inspector.get_columns('sales')}
+    assert {'customer_id', 'source_file'} <= columns
+    indexed = {tuple(index['column_names']) for index in inspector.get_indexes('sales')}
+    assert {('customer_id',), ('source_file',)} <= indexed
+
+def test_migration_into_a_baseline_table_matches_the_workbook(database, workbook, sample_sales):
+    from migrate_to_database import migrate_sales_file, source_checksum, destination_checksums
+    with database.get_engine().begin() as connection:
+        connection.execute(text(BASELINE_SALES_TABLE))
+    assert database.init_database()
+
+    assert migrate_sales_file(workbook, chunk_size=4) == len(sample_sales)
+    rows, revenue = source_checksum(workbook, chunk_size=4)
+    assert (rows, round(revenue, 2)) == (len(sample_sales), round(sum(sale['total'] for sale in sample_sales), 2))
+    db_rows, db_revenue = destination_checksums()[workbook]
+    assert (db_rows, round(db_revenue, 2)) == (rows, round(revenue, 2))
+
+    # A re-run over the unchanged workbook resumes past every row
+    assert migrate_sales_file(workbook, chunk_size=4) == 0
+    assert destination_checksums()[workbook][0] == rows
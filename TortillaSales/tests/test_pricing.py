@@ -0,0 +1,48 @@
+import pandas as pd
+import pytest
+from conftest import make_sale
+from pricing import CURRENT_PRICES
+from sales_manager import SalesManager
+from utils import PRODUCT_QUANTITY_COLUMNS
+
+PROPOSED = {'Tortilla': 26.0, 'Supplier Tortilla': 19.0, 'Totopos': 30.0, 'Mix': 12.0}
+
+def reprice_sale(sale, prices, elasticity):
+    """One sale's revenue at the proposed prices, repriced on its own"""
+    groups = {name: sale[column] for name, column in PRODUCT_QUANTITY_COLUMNS.items()}
+    tortilla = groups.pop('Tortilla')
+    groups['Supplier Tortilla' if sale['supplier'] else 'Tortilla'] = tortilla
+    revenue = sale['total']
+    for name, quantity in groups.items():
+        proposed = prices.get(name, CURRENT_PRICES[name])
+        revenue += quantity * (proposed / CURRENT_PRICES[name]) ** elasticity * proposed - quantity * CURRENT_PRICES[name]
+    return revenue
+
+@pytest.mark.parametrize('elasticity', [0.0, -0.8])
+def test_simulation_matches_repricing_each_sale(sample_sales, elasticity):
+    # A sale with an off-list total keeps the difference
+    sales = sample_sales + [make_sale('2024-04-02', '10:00:00', 2.0, totopos_qty=1, total=70.0, payment=70.0)]
+    manager = SalesManager('ana')
+    manager.add_sales(sales)
+    result = manager.simulate_prices(PROPOSED, elasticity, 'month').set_index('period')
+
+    expected = pd.DataFrame({'period': [sale['date'][:7] for sale in sales],
+                             'revenue': [sale['total'] for sale in sales],
+                             'simulated': [reprice_sale(sale, PROPOSED, elasticity) for sale in sales]})
+    expected = expected.groupby('period').sum()
+    assert list(result.index) == ['2024-03', '2024-04']
+    assert result['revenue'].to_numpy() == pytest.approx(expected['revenue'].to_numpy(), abs=0.01)
+    assert result['simulated_revenue'].to_numpy() == pytest.approx(expected['simulated'].to_numpy(), abs=0.01)
+
+def test_current_prices_change_nothing(sample_sales):
+    manager = SalesManager('ana')
+    manager.add_sales(sample_sales)
+    result = manager.simulate_prices({}, -0.5, 'week')
+    assert (result['delta'] == 0).all()
+    assert result['sales'].sum() == len(sample_sales)
+
+def test_free_prices_with_an_elasticity_raise(sample_sales):
+    manager = SalesManager('ana')
+    manager.add_sales(sample_sales)
+    with pytest.raises(ValueError, match="Totopos"):
+        manager.simulate_prices({'Totopos': 0}, -0.5)
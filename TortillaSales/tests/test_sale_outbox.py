@@ -0,0 +1,60 @@
+import json
+import os
+from conftest import make_sale
+from sale_outbox import SaleOutbox
+from sales_manager import SalesManager
+
+def write_lines(path, entries, torn=""):
+    with open(path, 'w', encoding='utf-8') as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+        f.write(torn)
+
+def test_flush_moves_queued_sales_into_the_store(sample_sales):
+    outbox = SaleOutbox('ana', SalesManager)
+    for sale in sample_sales[:5]:
+        assert outbox.append(sale)
+    assert outbox.pending_count() == 5
+    assert outbox.flush() == 5
+    assert outbox.pending_count() == 0
+    assert not os.path.exists(outbox.flushing_file)
+    assert len(SalesManager('ana').get_all_sales()) == 5
+
+def test_flush_reuses_one_manager(sample_sales):
+    created = []
+    def factory(username):
+        created.append(username)
+        return SalesManager(username)
+    outbox = SaleOutbox('ana', factory)
+    for sale in sample_sales[:3]:
+        outbox.append(sale)
+        outbox.flush()
+    assert created == ['ana']
+    assert len(SalesManager('ana').get_all_sales()) == 3
+
+def test_replay_after_crash_past_the_store_write_adds_no_duplicates(sample_sales):
+    # The batch reached the store, then the process died before removing the batch file
+    batch = sample_sales[:6]
+    assert SalesManager('ana').add_sales(batch)
+    outbox = SaleOutbox('ana', SalesManager)
+    write_lines(outbox.flushing_file, batch)
+    assert outbox.flush() == 6
+    assert not os.path.exists(outbox.flushing_file)
+    assert len(SalesManager('ana').get_all_sales()) == 6
+
+def test_replay_after_crash_before_the_store_write_imports_the_batch(sample_sales):
+    outbox = SaleOutbox('ana', SalesManager)
+    write_lines(outbox.flushing_file, sample_sales[:4])
+    # Sales queued after the crash wait for the next pass
+    outbox.append(sample_sales[4])
+    assert outbox.flush() == 4
+    assert outbox.flush() == 1
+    assert len(SalesManager('ana').get_all_sales()) == 5
+
+def test_torn_last_line_is_skipped_and_not_glued_to_the_next_sale(sample_sales):
+    outbox = SaleOutbox('ana', SalesManager)
+    write_lines(outbox.outbox_file, sample_sales[:2], torn='{"date": "2024-03-0')
+    outbox.append(sample_sales[2])
+    assert outbox.pending_count() == 3
+    assert outbox.flush() == 3
+    assert len(SalesManager('ana').get_all_sales()) == 3
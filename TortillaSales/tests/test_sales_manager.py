@@ -0,0 +1,27 @@
+import multiprocessing
+from conftest import make_sale
+from sales_manager import SalesManager, get_file_lock
+
+def _add_many(worker, count):
+    manager = SalesManager('ana')
+    for i in range(count):
+        assert manager.add_sale(make_sale('2024-03-01', f"{worker:02d}:{i // 60:02d}:{i % 60:02d}"))
+
+def test_writers_in_separate_processes_lose_no_sales():
+    SalesManager('ana')
+    processes = [multiprocessing.Process(target=_add_many, args=(worker, 15)) for worker in range(3)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert all(process.exitcode == 0 for process in processes)
+    sales = SalesManager('ana').get_all_sales()
+    assert len(sales) == 45
+    assert sales['time'].nunique() == 45
+
+def test_file_lock_is_reentrant():
+    lock = get_file_lock('sales_data_ana.xlsx')
+    with lock:
+        with lock:
+            assert lock.depth == 2
+    assert lock.depth == 0 and lock.held is None
@@ -0,0 +1,42 @@
+import pytest
+from daily_rollup import PRODUCT_COLUMNS
+from sales_manager import SalesManager
+from shifts import TALLY_COLUMNS
+
+def recount(sales, opened_at):
+    """The shift tallies recomputed from the sales kept since the shift opened"""
+    tallies = {column: 0 for column in TALLY_COLUMNS}
+    for sale in sales:
+        if f"{sale['date']} {sale['time']}" < opened_at:
+            continue
+        kind = 'supplier' if sale['supplier'] else 'regular'
+        tallies['sales'] += 1
+        tallies['revenue'] += sale['total']
+        tallies['payments'] += sale['payment']
+        tallies['change_given'] += sale['change']
+        tallies[f'{kind}_sales'] += 1
+        tallies[f'{kind}_revenue'] += sale['total']
+        for column in PRODUCT_COLUMNS:
+            tallies[column] += sale[column]
+    return tallies
+
+def test_open_shift_tallies_match_a_recount(sample_sales):
+    manager = SalesManager('ana')
+    manager.open_shift(500)
+    # Open the shift mid-week so the earlier sales fall outside it
+    manager.shifts.data['open']['opened_at'] = '2024-03-04 00:00:00'
+    manager.shifts.save()
+    manager.add_sales(sample_sales)
+    kept = list(sample_sales)
+    for index in (30, 20, 2):
+        manager.delete_sale_by_index(index)
+        del kept[index]
+
+    shift = SalesManager('ana').get_open_shift()
+    expected = recount(kept, '2024-03-04 00:00:00')
+    assert shift['tallies'] == pytest.approx(expected)
+
+    closed = manager.close_shift(900)
+    assert closed['expected_cash'] == round(500 + expected['payments'] - expected['change_given'], 2)
+    assert manager.get_open_shift() is None
+    assert manager.get_shift_history() == [closed]
@@ -0,0 +1,56 @@
+import threading
+import pytest
+import auth
+from auth import create_user, issue_session_token, get_user_record
+from conftest import make_sale
+from store_server import StoreServer, StoreClient, StoreError
+
+@pytest.fixture
+def store(monkeypatch):
+    # Fast hashes; the iteration count is read when a password is hashed
+    monkeypatch.setattr(auth, 'PASSWORD_ITERATIONS', 1000)
+    server = StoreServer("store.sock").start()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.close()
+
+def session_token(username, is_admin=False):
+    assert create_user(username, 'secret', is_admin)
+    return issue_session_token(username, get_user_record(username)['password'])
+
+def test_service_client_adds_and_reads(store, sample_sales):
+    client = StoreClient('ana', "store.sock")
+    assert client.add_sales(sample_sales)
+    assert len(client.get_all_sales()) == len(sample_sales)
+    assert len(client.get_daily_sales('2024-03-01')) == 5
+
+def test_cashier_token_reaches_only_its_own_sales(store, sample_sales):
+    token = session_token('ana')
+    ana = StoreClient('ana', "store.sock", token)
+    assert ana.add_sales(sample_sales[:3])
+    assert len(ana.get_daily_totals('2024-03-01', '2024-03-07')) == 1
+    with pytest.raises(StoreError, match="PermissionError"):
+        StoreClient('bob', "store.sock", token).get_daily_totals('2024-03-01', '2024-03-07')
+
+def test_administrator_token_reaches_every_cashier(store, sample_sales):
+    StoreClient('bob', "store.sock").add_sales(sample_sales[:3])
+    admin = StoreClient('bob', "store.sock", session_token('boss', is_admin=True))
+    assert len(admin.get_daily_totals('2024-03-01', '2024-03-07')) == 1
+
+def test_forged_or_stale_tokens_are_refused(store):
+    with pytest.raises(StoreError, match="PermissionError"):
+        StoreClient('ana', "store.sock", "not.a-token").get_stock_levels()
+    token = session_token('ana')
+    # Changing the password retires the old token
+    create_user('ana', 'another secret')
+    with pytest.raises(StoreError, match="PermissionError"):
+        StoreClient('ana', "store.sock", token).get_stock_levels()
+
+def test_only_exposed_members_are_reachable(store):
+    client = StoreClient('ana', "store.sock")
+    assert client.archive.segments == []
+    for reach in (lambda: client.listeners, lambda: client.archive.clear, lambda: client.write_lock_file):
+        with pytest.raises(AttributeError):
+            reach()
+    with pytest.raises(StoreError, match="not exposed"):
+        client._call(['archive', 'clear'], (), {})
@@ -0,0 +1,42 @@
+from collections import defaultdict
+from fingerprints import sale_fingerprint, day_digest
+from sales_manager import SalesManager
+from sync import sync_with_folder
+
+def register(workdir, monkeypatch, name):
+    """Switch to a register's own data directory"""
+    path = workdir / name
+    path.mkdir(exist_ok=True)
+    monkeypatch.chdir(path)
+
+def sync(workdir, monkeypatch, name):
+    register(workdir, monkeypatch, name)
+    return sync_with_folder(str(workdir / "shared"), SalesManager, ['ana'])['ana']
+
+def test_two_registers_converge_on_the_union(workdir, monkeypatch, sample_sales):
+    # The 2024-03-02 07:05 sale was rung up twice on register A and never on B
+    register_a = sample_sales[:20] + [sample_sales[5]]
+    register_b = sample_sales[12:]
+    register(workdir, monkeypatch, "a")
+    SalesManager('ana').add_sales(register_a)
+    register(workdir, monkeypatch, "b")
+    SalesManager('ana').add_sales(register_b)
+
+    assert sync(workdir, monkeypatch, "a")['sent'] == len(register_a)
+    received_b = sync(workdir, monkeypatch, "b")
+    assert received_b['received'] == 12 + 1
+    assert received_b['sent'] == len(register_b) - 8
+    received_a = sync(workdir, monkeypatch, "a")
+    assert received_a['received'] == len(register_b) - 8
+
+    by_day = defaultdict(list)
+    for sale in sample_sales + [sample_sales[5]]:
+        by_day[sale['date']].append(sale_fingerprint(sale))
+    union = {day: day_digest(fingerprints) for day, fingerprints in by_day.items()}
+    for name in ("a", "b"):
+        register(workdir, monkeypatch, name)
+        manager = SalesManager('ana')
+        assert len(manager.get_all_sales()) == len(sample_sales) + 1
+        assert manager.fingerprint_index.day_digests() == union
+        # Nothing left to move once both sides hold the union
+        assert sync(workdir, monkeypatch, name)['days_differing'] == 0
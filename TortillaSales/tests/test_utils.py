@@ -0,0 +1,27 @@
+import json
+import multiprocessing
+import os
+from utils import save_json_file, load_json_file, temp_path_for
+
+def _save_many(path, worker, count):
+    for i in range(count):
+        assert save_json_file(path, {'worker': worker, 'i': i, 'padding': 'x' * 20000})
+
+def test_temp_path_is_unique_per_process_and_thread():
+    assert temp_path_for('side.json') != 'side.json.tmp'
+    assert str(os.getpid()) in temp_path_for('side.json')
+
+def test_concurrent_saves_always_leave_a_whole_file():
+    processes = [multiprocessing.Process(target=_save_many, args=('side.json', worker, 50)) for worker in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert all(process.exitcode == 0 for process in processes)
+    with open('side.json', encoding='utf-8') as f:
+        data = json.load(f)
+    assert data['i'] == 49
+    assert not [name for name in os.listdir('.') if name.endswith('.tmp')]
+
+def test_load_json_file_default_when_missing():
+    assert load_json_file('missing.json', {'days': {}}) == {'days': {}}
@@ -1,5 +1,39 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 
+try:
+    import fcntl
+except ImportError:
+    # No cross-process locking where fcntl is missing (Windows); one process is assumed there
+    fcntl = None
+
+# The price list, used by the register, receipts, reports, the audit and
+# the price what-if: tortilla per kg, the rest per unit. Special products
+# are priced at the register.
+PRODUCT_PRICES = {
+    'Tortilla': 25.0,
+    'Totopos': 25.0,
+    'Cacahuates': 10.0,
+    'Mix': 10.0,
+    'Salted Chips': 15.0
+}
+SUPPLIER_TORTILLA_PRICE = 22.0
+# Sales table column holding each listed product's quantity
+PRODUCT_QUANTITY_COLUMNS = {
+    'Tortilla': 'tortilla_qty',
+    'Totopos': 'totopos_qty',
+    'Cacahuates': 'cacahuates_qty',
+    'Mix': 'mix_qty',
+    'Salted Chips': 'salted_chips_qty'
+}
+
+def tortilla_price(is_supplier=False):
+    """Price per kg of tortilla, lower for suppliers"""
+    return SUPPLIER_TORTILLA_PRICE if is_supplier else PRODUCT_PRICES['Tortilla']
+
 def format_currency(amount):
     """Format amount as currency"""
     return f"${amount:.2f}"
@@ -19,52 +53,12 @@ def get_week_dates(selected_date):
 
 def validate_sale_data(sale_data):
     """Validate sale data before saving"""
-    required_fields = [
-        'date', 'time', 'username', 'tortilla_qty', 'totopos_qty', 
-        'cacahuates_qty', 'mix_qty', 'salted_chips_qty', 'special_qty',
-        'special_price', 'frequent_customer', 'supplier', 'total', 
-        'payment', 'change'
-    ]
-    
-    for field in required_fields:
-        if field not in sale_data:
-            return False, f"Missing required field: {field}"
-    
-    # Validate numeric fields
-    numeric_fields = [
-        'tortilla_qty', 'totopos_qty', 'cacahuates_qty', 'mix_qty', 
-        'salted_chips_qty', 'special_qty', 'special_price', 'total', 
-        'payment', 'change'
-    ]
-    
-    for field in numeric_fields:
-        try:
-            float(sale_data[field])
-        except (ValueError, TypeError):
-            return False, f"Invalid numeric value for field: {field}"
-    
-    # Validate quantities are non-negative
-    quantity_fields = [
-        'tortilla_qty', 'totopos_qty', 'cacahuates_qty', 'mix_qty', 
-        'salted_chips_qty', 'special_qty'
-    ]
-    
-    for field in quantity_fields:
-        if float(sale_data[field]) < 0:
-            return False, f"Quantity cannot be negative: {field}"
-    
-    return True, "Valid"
+    from schema import validate_sale
+    return validate_sale(sale_data)
 
 def calculate_product_total(product, quantity, is_supplier=False, special_price=0):
     """Calculate total for a specific product"""
-    prices = {
-        'Tortilla': 22.0 if is_supplier else 25.0,
-        'Totopos': 25.0,
-        'Cacahuates': 10.0,
-        'Mix': 10.0,
-        'Salted Chips': 15.0,
-        'Special': special_price
-    }
+    prices = dict(PRODUCT_PRICES, Tortilla=tortilla_price(is_supplier), Special=special_price)
     
     return quantity * prices.get(product, 0)
 
@@ -92,14 +86,13 @@ def generate_receipt_text(sale_data):
     for product, qty, unit in products:
         if qty > 0:
             if product == 'Tortillas':
-                price = 22.0 if sale_data['supplier'] else 25.0
+                price = tortilla_price(sale_data['supplier'])
                 total = qty * price
             elif product == 'Special':
                 price = sale_data['special_price']
                 total = qty * price
             else:
-                prices = {'Totopos': 25.0, 'Cacahuates': 10.0, 'Mix': 10.0, 'Salted Chips': 15.0}
-                price = prices[product]
+                price = PRODUCT_PRICES[product]
                 total = qty * price
             
             receipt_lines.append(f"{product}: {qty} {unit} @ ${price:.2f} = ${total:.2f}")
@@ -119,3 +112,105 @@ def generate_receipt_text(sale_data):
     receipt_lines.append("=" * 30)
     
     return "\n".join(receipt_lines)
+
+def to_number(value):
+    """Convert a cell value to float, treating empty and NaN cells as zero"""
+    try:
+        number = float(value)
+    except (ValueError, TypeError):
+        return 0.0
+    if number != number:
+        return 0.0
+    return number
+
+def to_bool(value):
+    """Convert a cell value to bool, including 'True'/'False' text cells"""
+    if isinstance(value, str):
+        return value.strip().lower() in ('true', '1', '1.0', 'yes')
+    if value is None or value != value:
+        return False
+    return bool(value)
+
+def normalize_date(value):
+    """Return a date cell as a 'YYYY-MM-DD' string"""
+    if hasattr(value, 'strftime'):
+        return value.strftime('%Y-%m-%d')
+    return str(value)[:10]
+
+def normalize_time(value):
+    """Return a time cell as a 'HH:MM:SS' string"""
+    if hasattr(value, 'strftime'):
+        return value.strftime('%H:%M:%S')
+    text = str(value)
+    if ' ' in text:
+        text = text.split(' ')[-1]
+    return text[:8]
+
+def plain_record(record):
+    """Convert a sale row (dict or pandas row) to plain JSON-friendly values"""
+    plain = {}
+    for key, value in dict(record).items():
+        if hasattr(value, 'item'):
+            value = value.item()
+        if isinstance(value, float) and value != value:
+            value = None
+        elif hasattr(value, 'isoformat'):
+            value = str(value)
+        plain[str(key)] = value
+    return plain
+
+def file_version(path):
+    """Get a token that changes whenever a file is replaced or modified.
+
+    Side files are written with os.replace, which always gives a new inode,
+    so this catches rewrites even within the filesystem's mtime resolution.
+    Returns None if the file does not exist.
+    """
+    try:
+        stat = os.stat(path)
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return None
+
+def load_json_file(path, default):
+    """Load a JSON side file, returning default if it is missing or unreadable"""
+    if not os.path.exists(path):
+        return default
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Error reading {path}: {e}")
+        return default
+
+def temp_path_for(path):
+    """A temp file next to path for an atomic replace, unique to this process and thread.
+
+    Two writers sharing one temp name would overwrite each other's half-written file.
+    """
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+def save_json_file(path, data):
+    """Write a JSON side file atomically so readers never see half a file"""
+    temp_path = temp_path_for(path)
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(temp_path, path)
+        return True
+    except Exception as e:
+        print(f"Error writing {path}: {e}")
+        return False
+
+@contextmanager
+def locked_file(path):
+    """Hold an exclusive lock on path (created if needed) across processes"""
+    if fcntl is None:
+        yield
+        return
+    with open(path, 'a') as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)